@@ -1,7 +1,111 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import psycopg2
+import psycopg2.extras
 import xml.etree.ElementTree as ET
 
-import psycopg2
+from connection_pool import get_pool
+from metrics import XML_PARSE_DURATION, XML_RENDER_DURATION, timed_iter
+
+SYSTEM_DOCUMENT_QUERY = '''
+SELECT {distinct}
+    sys."Name" AS system_name,
+    json_build_array(
+        json_build_object(
+            'system_name', sys."Name",
+            'network_address', sys."NetworkAdress",
+            'variables', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'variable_name', var."Name",
+                    'domain_left', var."Domainleft",
+                    'domain_right', var."Domainright",
+                    'scale', var."Scale",
+                    'default_value', var."DefaultValue",
+                    'accumulation', var."Accumulation",
+                    'defuzzifier', var."Defuzzifier",
+                    'type', var."Type",
+                    'terms', ter.terms
+                ) ORDER BY var."ID")
+                FROM "Fuzzy variables" AS var
+                JOIN LATERAL (
+                    SELECT json_agg(json_build_object(
+                        'term_name', t."Name",
+                        'complement', t."Complament",
+                        'param1', t."Param1",
+                        'param2', t."Param2",
+                        'param3', t."Param3",
+                        'param4', t."Param4",
+                        'shape', t."Shape"
+                    ) ORDER BY t."ID") AS terms
+                    FROM "Fuzzy terms" AS t
+                    WHERE t."Variables_ID" = var."ID"
+                ) AS ter ON ter.terms IS NOT NULL
+                WHERE var."System_ID" = sys."ID"
+            ), '[]'::json)
+        ),
+        COALESCE((
+            SELECT json_build_object(
+                'mrb_name', mrb."Name",
+                'and_method', mrb."andMethod",
+                'or_method', mrb."orMethod",
+                'activation_method', mrb."activationMethod",
+                'rules', COALESCE((
+                    SELECT json_agg(json_build_object(
+                        'rule_name', rul."Name",
+                        'connector', rul."Connector",
+                        'rule_or_method', rul."orMethod",
+                        'rule_and_method', rul."andMethod",
+                        'weight', rul."Weight",
+                        'antecedent_terms', rul."Antecedent terms",
+                        'antecedent_variables', rul."Antecedent variables",
+                        'antecedent_modifiers', CASE
+                            WHEN cardinality(rul."Antecedent modifiers") > 0 THEN rul."Antecedent modifiers"
+                            ELSE ARRAY[NULL]::text[]
+                        END,
+                        'consequent_terms', rul."Consequent Terms",
+                        'consequent_variables', rul."Consequent Variables"
+                    ) ORDER BY rul."ID")
+                    FROM "Mamdani Rules Base" AS base
+                    JOIN "Rules" AS rul ON base."ID" = rul."MRB_ID"
+                    WHERE base."System_ID" = sys."ID"
+                ), '[]'::json)
+            )
+            FROM "Mamdani Rules Base" AS mrb
+            WHERE mrb."System_ID" = sys."ID"
+            ORDER BY mrb."ID"
+            LIMIT 1
+        ), json_build_object(
+            'mrb_name', '',
+            'and_method', '',
+            'or_method', '',
+            'activation_method', '',
+            'rules', '[]'::json
+        ))
+    )::text AS document
+FROM
+    "Fuzzy systems" AS sys
+WHERE
+    {condition}
+'''
+
+def latest_system_query(condition):
+    # A name uploaded more than once resolves to its newest row, the same one the control surface queries pick.
+    return SYSTEM_DOCUMENT_QUERY.format(distinct="", condition=condition) + 'ORDER BY sys."ID" DESC LIMIT 1'
+
+def latest_systems_query(condition):
+    return SYSTEM_DOCUMENT_QUERY.format(distinct='DISTINCT ON (sys."Name")', condition=condition) + 'ORDER BY sys."Name", sys."ID" DESC'
+
+class IngestError(Exception):
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+def like_prefix(prefix):
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def load_system_document(document):
+    return json.loads(document, parse_int=float)
 
 class FuzzySystemDatabase:
     def __init__(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
@@ -11,34 +115,156 @@ class FuzzySystemDatabase:
         self.DB_HOST = DB_HOST
         self.DB_PORT = DB_PORT
 
-    def Get_file(self, system_name):
-        data = []
+    def get_pool(self):
+        return get_pool(self.DB_NAME, self.DB_USER, self.DB_PASSWORD, self.DB_HOST, self.DB_PORT)
 
-        knowledge_base = self.Get_knowledge_base(system_name)
-        mamdani_rule_base = self.Get_mamdani_rule_base(system_name)
+    def Get_file(self, system_name):
+        data = self.Get_system(system_name)
 
-        data.append(knowledge_base)
-        data.append(mamdani_rule_base)
+        if data is None:
+            return None
 
         return self.Create_fuzzy_system_xml(data)
 
+    def Get_system(self, system_name):
+        pool = self.get_pool()
+        connection = None
+        cursor = None
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor()
+
+            cursor.execute(latest_system_query('sys."Name" = %s'), (system_name,))
+            row = cursor.fetchone()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
+
+        if row is None:
+            return None
+
+        return load_system_document(row[1])
+
+    def Get_systems(self, system_names):
+        pool = self.get_pool()
+        connection = None
+        cursor = None
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor()
+
+            cursor.execute(latest_systems_query('sys."Name" = ANY(%s)'), (list(system_names),))
+            rows = cursor.fetchall()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
+
+        return {system_name: load_system_document(document) for system_name, document in rows}
+
+    def Get_files(self, system_names):
+        return {system_name: self.Create_fuzzy_system_xml(data) for system_name, data in self.Get_systems(system_names).items()}
+
+    def Put_control_surface(self, system_name, resolution, max_error, data):
+        pool = self.get_pool()
+        connection = None
+        cursor = None
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor()
+
+            cursor.execute('''
+            INSERT INTO public."Control surfaces" ("System_ID", "Resolution", "Max error", "Data")
+            SELECT "ID", %s, %s, %s FROM public."Fuzzy systems" WHERE "Name" = %s ORDER BY "ID" DESC LIMIT 1
+            ON CONFLICT ("System_ID") DO UPDATE
+            SET "Resolution" = EXCLUDED."Resolution", "Max error" = EXCLUDED."Max error",
+                "Data" = EXCLUDED."Data", "Created" = now();
+            ''', (list(resolution), max_error, psycopg2.Binary(data), system_name))
+            stored = cursor.rowcount > 0
+
+            connection.commit()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
+
+        return stored
+
+    def Get_control_surface(self, system_name):
+        pool = self.get_pool()
+        connection = None
+        cursor = None
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor()
+
+            cursor.execute('''
+            SELECT "Data" FROM public."Control surfaces"
+            WHERE "System_ID" = (SELECT "ID" FROM public."Fuzzy systems" WHERE "Name" = %s ORDER BY "ID" DESC LIMIT 1);
+            ''', (system_name,))
+            row = cursor.fetchone()
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
+
+        if row is None:
+            return None
+
+        return bytes(row[0])
+
+    def Iter_systems(self, names=None, prefix=None, itersize=100):
+        conditions = []
+        params = []
+
+        if names is not None:
+            conditions.append('sys."Name" = ANY(%s)')
+            params.append(list(names))
+        if prefix:
+            conditions.append('sys."Name" LIKE %s')
+            params.append(like_prefix(prefix))
+
+        query = latest_systems_query(" AND ".join(conditions) or "TRUE")
+
+        pool = self.get_pool()
+        connection = None
+        cursor = None
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor(name="fuzzy_systems_export")
+            cursor.itersize = itersize
+
+            cursor.execute(query, params)
+            for system_name, document in cursor:
+                yield system_name, load_system_document(document)
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
+
     def Get_knowledge_base(self, system_name):
         results = {
             "system_name": system_name,
             "network_address": "",
             "variables": []
         }
+        pool = self.get_pool()
         connection = None
         cursor = None
 
         try:
-            connection = psycopg2.connect(
-                dbname=self.DB_NAME,
-                user=self.DB_USER,
-                password=self.DB_PASSWORD,
-                host=self.DB_HOST,
-                port=self.DB_PORT
-            )
+            connection = pool.getconn()
 
             cursor = connection.cursor()
 
@@ -72,7 +298,7 @@ class FuzzySystemDatabase:
             ON 
                 var."ID" = ter."Variables_ID"
             WHERE
-                sys."Name" = %s;
+                sys."ID" = (SELECT "ID" FROM "Fuzzy systems" WHERE "Name" = %s ORDER BY "ID" DESC LIMIT 1);
             '''
 
             cursor.execute(query, (system_name,))
@@ -124,7 +350,7 @@ class FuzzySystemDatabase:
             if cursor:
                 cursor.close()
             if connection:
-                connection.close()
+                pool.putconn(connection)
 
         return results
 
@@ -136,17 +362,12 @@ class FuzzySystemDatabase:
             "activation_method": "",
             "rules": []
         }
+        pool = self.get_pool()
         connection = None
         cursor = None
 
         try:
-            connection = psycopg2.connect(
-                dbname=self.DB_NAME,
-                user=self.DB_USER,
-                password=self.DB_PASSWORD,
-                host=self.DB_HOST,
-                port=self.DB_PORT
-            )
+            connection = pool.getconn()
 
             cursor = connection.cursor()
 
@@ -177,7 +398,7 @@ class FuzzySystemDatabase:
             ON 
                 mrb."ID" = rul."MRB_ID"
             WHERE
-                sys."Name" = %s;
+                sys."ID" = (SELECT "ID" FROM "Fuzzy systems" WHERE "Name" = %s ORDER BY "ID" DESC LIMIT 1);
             '''
 
             cursor.execute(query, (system_name,))
@@ -208,11 +429,15 @@ class FuzzySystemDatabase:
             if cursor:
                 cursor.close()
             if connection:
-                connection.close()
+                pool.putconn(connection)
 
         return results
 
     def Create_fuzzy_system_xml(self, data):
+        with XML_RENDER_DURATION.time():
+            return self._render_fuzzy_system_xml(data)
+
+    def _render_fuzzy_system_xml(self, data):
         if not isinstance(data, list) or len(data) != 2:
             raise ValueError("data must be a list containing two dictionaries")
 
@@ -298,17 +523,12 @@ class FuzzySystemDatabase:
 def Get_List(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
     names_list = []
 
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
     connection = None
     cursor = None
 
     try:
-        connection = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
+        connection = pool.getconn()
 
         cursor = connection.cursor()
 
@@ -326,19 +546,315 @@ def Get_List(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
         if cursor:
             cursor.close()
         if connection:
-            connection.close()
+            pool.putconn(connection)
 
     return names_list
 
+def Get_page(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, limit=100, after=None, prefix=None, descending=False, count=None):
+    conditions = []
+    params = []
+
+    if after is not None:
+        cursor_key = parse_page_cursor(after)
+        if cursor_key is None:
+            raise ValueError(f"Invalid page cursor '{after}'")
+        conditions.append('("Name" COLLATE "C", "ID") < (%s, %s)' if descending else '("Name" COLLATE "C", "ID") > (%s, %s)')
+        params.extend(cursor_key)
+    if prefix:
+        conditions.append('"Name" COLLATE "C" LIKE %s')
+        params.append(like_prefix(prefix))
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    order = "DESC" if descending else "ASC"
+
+    page = {"systems": [], "next_cursor": None}
+
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+
+        cursor.execute(f'''
+        SELECT "Name", "ID" FROM "Fuzzy systems"
+        {where}
+        ORDER BY "Name" COLLATE "C" {order}, "ID" {order}
+        LIMIT %s;
+        ''', params + [limit + 1])
+        rows = cursor.fetchall()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            page["next_cursor"] = page_cursor(*rows[-1])
+        page["systems"] = [row[0] for row in rows]
+
+        if count == "estimate" and not prefix:
+            cursor.execute('''SELECT reltuples::bigint FROM pg_class WHERE oid = 'public."Fuzzy systems"'::regclass;''')
+            estimate = cursor.fetchone()[0]
+            if estimate >= 0:
+                page["total"] = estimate
+                page["total_is_estimate"] = True
+
+        if count in ("exact", "estimate") and "total" not in page:
+            prefix_filter = 'WHERE "Name" COLLATE "C" LIKE %s' if prefix else ""
+            cursor.execute(f'SELECT count(*) FROM "Fuzzy systems" {prefix_filter};', [like_prefix(prefix)] if prefix else [])
+            page["total"] = cursor.fetchone()[0]
+            page["total_is_estimate"] = False
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return page
+
+def page_cursor(name, system_id):
+    # Names are not unique, so the cursor carries the row ID as a tie-breaker.
+    return f"{system_id}:{name}"
+
+def parse_page_cursor(after):
+    # Returns (name, ID), or None when `after` is not a cursor made by page_cursor.
+    system_id, separator, name = after.partition(":")
+    if not separator or not (system_id.isascii() and system_id.isdigit()):
+        return None
+    return name, int(system_id)
+
+def Create_indexes(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS "Fuzzy systems_Name_ID_idx" ON public."Fuzzy systems" ("Name" COLLATE "C", "ID");
+        DROP INDEX IF EXISTS public."Fuzzy systems_Name_idx";
+        CREATE INDEX IF NOT EXISTS "Fuzzy variables_System_ID_idx" ON public."Fuzzy variables" ("System_ID");
+        CREATE INDEX IF NOT EXISTS "Fuzzy terms_Variables_ID_idx" ON public."Fuzzy terms" ("Variables_ID");
+        CREATE INDEX IF NOT EXISTS "Mamdani Rules Base_System_ID_idx" ON public."Mamdani Rules Base" ("System_ID");
+        CREATE INDEX IF NOT EXISTS "Rules_MRB_ID_idx" ON public."Rules" ("MRB_ID");
+        ''')
+
+        connection.commit()
+
+    except Exception as e:
+        print(f"Error occurred while creating indexes: {e}")
+        return False
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return True
+
+def Create_control_surfaces_table(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS public."Control surfaces" (
+            "System_ID" integer PRIMARY KEY REFERENCES public."Fuzzy systems" ("ID") ON DELETE CASCADE,
+            "Resolution" integer[] NOT NULL,
+            "Max error" double precision[],
+            "Data" bytea NOT NULL,
+            "Created" timestamptz NOT NULL DEFAULT now()
+        );
+        ''')
+
+        connection.commit()
+
+    except Exception as e:
+        print(f"Error occurred while creating the control surfaces table: {e}")
+        return False
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return True
+
+
+CHANGE_CHANNEL = "fuzzy_system_changes"
+
+def Create_change_log(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS public."Change log" (
+            "Seq" bigserial PRIMARY KEY,
+            "Operation" text NOT NULL,
+            "Name" text NOT NULL,
+            "Changed" timestamptz NOT NULL DEFAULT now()
+        );
+        ''')
+
+        # The trigger is deferred to commit and serialized on an advisory lock, so sequence numbers are
+        # handed out in commit order and a reader that has seen change N has also seen every change before it.
+        cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION public.log_fuzzy_system_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            seq bigint;
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('{CHANGE_CHANNEL}'));
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO public."Change log" ("Operation", "Name") VALUES ('delete', OLD."Name") RETURNING "Seq" INTO seq;
+            ELSE
+                INSERT INTO public."Change log" ("Operation", "Name") VALUES ('insert', NEW."Name") RETURNING "Seq" INTO seq;
+            END IF;
+            PERFORM pg_notify('{CHANGE_CHANNEL}', seq::text);
+            RETURN NULL;
+        END;
+        $$;
+        ''')
+        cursor.execute('DROP TRIGGER IF EXISTS fuzzy_system_changes ON public."Fuzzy systems";')
+        cursor.execute('''
+        CREATE CONSTRAINT TRIGGER fuzzy_system_changes
+        AFTER INSERT OR DELETE ON public."Fuzzy systems"
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION public.log_fuzzy_system_change();
+        ''')
+
+        # A rebuilt control surface is logged as well, so every process drops the copy it has cached. Surfaces
+        # removed along with their system are already covered by the system's own delete entry.
+        cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION public.log_control_surface_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            seq bigint;
+            system_name text;
+        BEGIN
+            SELECT "Name" INTO system_name FROM public."Fuzzy systems" WHERE "ID" = NEW."System_ID";
+            IF system_name IS NULL THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_advisory_xact_lock(hashtext('{CHANGE_CHANNEL}'));
+            INSERT INTO public."Change log" ("Operation", "Name") VALUES ('surface', system_name) RETURNING "Seq" INTO seq;
+            PERFORM pg_notify('{CHANGE_CHANNEL}', seq::text);
+            RETURN NULL;
+        END;
+        $$;
+        ''')
+        cursor.execute('DROP TRIGGER IF EXISTS control_surface_changes ON public."Control surfaces";')
+        cursor.execute('''
+        CREATE CONSTRAINT TRIGGER control_surface_changes
+        AFTER INSERT OR UPDATE ON public."Control surfaces"
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION public.log_control_surface_change();
+        ''')
+
+        connection.commit()
+
+    except Exception as e:
+        print(f"Error occurred while creating the change log: {e}")
+        return False
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return True
+
+def Trim_change_log(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, keep=100000):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+        # The newest entry always stays, so the latest sequence number never goes backwards.
+        cursor.execute('DELETE FROM public."Change log" WHERE "Seq" <= (SELECT max("Seq") FROM public."Change log") - %s;', (max(keep, 1),))
+        deleted = cursor.rowcount
+        connection.commit()
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return deleted
+
+def Get_change_seq(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+        cursor.execute('SELECT coalesce(max("Seq"), 0) FROM public."Change log";')
+        seq = cursor.fetchone()[0]
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return seq
+
+def changes_page(rows, oldest, after):
+    changes = [{"seq": seq, "operation": operation, "system_name": name, "changed": changed} for seq, operation, name, changed in rows]
+    return {
+        "changes": changes,
+        "last": changes[-1]["seq"] if changes else after,
+        # The client is further behind than the trimmed log reaches and has to reload the full list.
+        "reset": oldest is not None and after < oldest - 1,
+    }
+
+def Get_changes(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, after=0, limit=1000):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
+    try:
+        connection = pool.getconn()
+        cursor = connection.cursor()
+        cursor.execute('''
+        SELECT "Seq", "Operation", "Name", extract(epoch FROM "Changed")::float8 FROM public."Change log"
+        WHERE "Seq" > %s ORDER BY "Seq" LIMIT %s;
+        ''', (after, limit))
+        rows = cursor.fetchall()
+        cursor.execute('SELECT min("Seq") FROM public."Change log";')
+        oldest = cursor.fetchone()[0]
+
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
+
+    return changes_page(rows, oldest, after)
+
 def Delete_all_data(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
     try:
-        connection = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
+        connection = pool.getconn()
 
         cursor = connection.cursor()
 
@@ -347,27 +863,26 @@ def Delete_all_data(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
         cursor.execute(delete_fuzzy_systems_query)
         
         connection.commit()
-        print("All data deleted successfully!")
 
     except Exception as e:
         print(f"Error occurred while deleting data: {e}")
         return False
 
     finally:
-        cursor.close()
-        connection.close()
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.putconn(connection)
 
     return True
 
 def Delete_one_data(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name):
+    pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+    connection = None
+    cursor = None
+
     try:
-        connection = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
+        connection = pool.getconn()
 
         cursor = connection.cursor()
 
@@ -375,7 +890,6 @@ def Delete_one_data(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name
         cursor.execute(delete_fuzzy_systems_query, (system_name,))
 
         connection.commit()
-        print(f"Record '{system_name}' deleted successfully!")
 
     except Exception as e:
         print(f"Error occurred while deleting data: {e}")
@@ -385,286 +899,643 @@ def Delete_one_data(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name
         if cursor:
             cursor.close()
         if connection:
-            connection.close()
+            pool.putconn(connection)
 
     return True
 
+FUZZY_TERM_SHAPES = {
+    'leftLinearShape': ('param1', 'param2'),
+    'triangularShape': ('param1', 'param2', 'param3'),
+    'leftGaussianShape': ('param1', 'param2'),
+    'piShape': ('param1', 'param2'),
+    'rightGaussianShape': ('param1', 'param2'),
+    'trapezoidShape': ('Param1', 'Param2', 'Param3', 'Param4'),
+}
+
 class FuzzySystemParser:
     def __init__(self, xml_file):
         self.xml_file = xml_file
+        self.report = None
 
     def parse_xml(self):
-        tree = ET.parse(self.xml_file)
-        root = tree.getroot()
+        items = self.iter_fml()
+        try:
+            _, system = next(items)
+        finally:
+            items.close()
+
+        return system['name'], system['network_address']
 
-        system_name = root.attrib['name']
-        network_address = root.attrib['networkAddress']
+    def iter_fml(self):
+        return timed_iter(self._iter_fml(), XML_PARSE_DURATION)
 
-        return system_name, network_address
+    def _iter_fml(self):
+        if isinstance(self.xml_file, (str, bytes, os.PathLike)):
+            source = open(self.xml_file, 'rb')
+            owns_source = True
+        else:
+            source = self.xml_file
+            owns_source = False
+
+        try:
+            stack = []
+
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if not stack:
+                        if element.tag != 'fuzzySystem':
+                            raise ValueError(f"Expected a fuzzySystem root element, found '{element.tag}'")
+                        yield 'system', {
+                            "name": element.attrib['name'],
+                            "network_address": element.attrib['networkAddress']
+                        }
+                    elif element.tag == 'mamdaniRuleBase':
+                        yield 'mrb', self.parse_mamdani_rule_base(element)
+                    stack.append(element)
+                    continue
+
+                stack.pop()
+
+                if element.tag == 'fuzzyVariable':
+                    yield 'variable', self.parse_fuzzy_variable(element)
+                elif element.tag == 'rule':
+                    yield 'rule', self.parse_rule(element)
+                else:
+                    continue
+
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+        finally:
+            if owns_source:
+                source.close()
 
     def get_fuzzy_variables(self, root):
-        fuzzy_variables = []
         knowledge_base = root.find('knowledgeBase')
 
-        for fuzzy_variable in knowledge_base.findall('fuzzyVariable'):
-            var_name = fuzzy_variable.attrib['name']
-            domain_left = float(fuzzy_variable.attrib['domainleft'])
-            domain_right = float(fuzzy_variable.attrib['domainright'])
-            scale = fuzzy_variable.attrib.get('scale', '')
-            default_value = float(fuzzy_variable.attrib.get('defaultValue', 0.0))
-            accumulation = fuzzy_variable.attrib.get('accumulation', '')
-            defuzzifier = fuzzy_variable.attrib.get('defuzzifier', '')
-            var_type = fuzzy_variable.attrib['type']
-
-            fuzzy_variables.append({
-                "name": var_name, 
-                "domain_left": domain_left, 
-                "domain_right": domain_right, 
-                "scale": scale, 
-                "default_value": default_value, 
-                "accumulation": accumulation, 
-                "defuzzifier": defuzzifier, 
-                "type": var_type, 
-                "terms": self.get_fuzzy_terms(root),
-                "MRB": self.get_mamdani_rules_base(root),
-                "Rule": self.get_rules(root)
-            })
+        return [self.parse_fuzzy_variable(fuzzy_variable) for fuzzy_variable in knowledge_base.findall('fuzzyVariable')]
+
+    def parse_fuzzy_variable(self, fuzzy_variable):
+        return {
+            "name": fuzzy_variable.attrib['name'],
+            "domain_left": float(fuzzy_variable.attrib['domainleft']),
+            "domain_right": float(fuzzy_variable.attrib['domainright']),
+            "scale": fuzzy_variable.attrib.get('scale', ''),
+            "default_value": float(fuzzy_variable.attrib.get('defaultValue', 0.0)),
+            "accumulation": fuzzy_variable.attrib.get('accumulation', ''),
+            "defuzzifier": fuzzy_variable.attrib.get('defuzzifier', ''),
+            "type": fuzzy_variable.attrib['type'],
+            "terms": self.get_fuzzy_terms(fuzzy_variable)
+        }
 
-        return fuzzy_variables
-
-    def get_fuzzy_terms(self, root):
-        fuzzy_terms = []
-
-        for fuzzy_term in root.findall('.//fuzzyTerm'):
-            term_name = fuzzy_term.attrib['name']
-            complement = fuzzy_term.attrib['complement'] == 'true'
-
-            shape = None
-            params = [None, None, None, None]
-
-            if fuzzy_term.find('leftLinearShape') is not None:
-                shape = 'leftLinearShape'
-                shape_element = fuzzy_term.find('leftLinearShape')
-                params[0] = shape_element.attrib['param1']
-                params[1] = shape_element.attrib['param2']
-
-            elif fuzzy_term.find('triangularShape') is not None:
-                shape = 'triangularShape'
-                shape_element = fuzzy_term.find('triangularShape')
-                params[0] = shape_element.attrib['param1']
-                params[1] = shape_element.attrib['param2']
-                params[2] = shape_element.attrib['param3']
-
-            elif fuzzy_term.find('leftGaussianShape') is not None:
-                shape = 'leftGaussianShape'
-                shape_element = fuzzy_term.find('leftGaussianShape')
-                params[0] = shape_element.attrib['param1']
-                params[1] = shape_element.attrib['param2']
-
-            elif fuzzy_term.find('piShape') is not None:
-                shape = 'piShape'
-                shape_element = fuzzy_term.find('piShape')
-                params[0] = shape_element.attrib['param1']
-                params[1] = shape_element.attrib['param2']
-
-            elif fuzzy_term.find('rightGaussianShape') is not None:
-                shape = 'rightGaussianShape'
-                shape_element = fuzzy_term.find('rightGaussianShape')
-                params[0] = shape_element.attrib['param1']
-                params[1] = shape_element.attrib['param2']
-
-            elif fuzzy_term.find('trapezoidShape') is not None:
-                shape = 'trapezoidShape'
-                shape_element = fuzzy_term.find('trapezoidShape')
-                params[0] = shape_element.attrib['Param1']
-                params[1] = shape_element.attrib['Param2']
-                params[2] = shape_element.attrib['Param3']
-                params[3] = shape_element.attrib['Param4']
-
-            fuzzy_terms.append({
-                "name": term_name,
-                "complement": complement,
-                "shape": shape,
-                "params": params
-            })
+    def get_fuzzy_terms(self, element):
+        return [self.parse_fuzzy_term(fuzzy_term) for fuzzy_term in element.iter('fuzzyTerm')]
+
+    def parse_fuzzy_term(self, fuzzy_term):
+        shape = None
+        params = [None, None, None, None]
+
+        for shape_name, attributes in FUZZY_TERM_SHAPES.items():
+            shape_element = fuzzy_term.find(shape_name)
+            if shape_element is not None:
+                shape = shape_name
+                for idx, attribute in enumerate(attributes):
+                    params[idx] = shape_element.attrib[attribute]
+                break
+
+        return {
+            "name": fuzzy_term.attrib['name'],
+            "complement": fuzzy_term.attrib['complement'] == 'true',
+            "shape": shape,
+            "params": params
+        }
 
-        return fuzzy_terms
+    def insert_into_db(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name, network_address, fml_items, bulk=False, batch_size=1000,
+                       optimize=False):
+        pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+        conn = None
+        cursor = None
+        report = None
 
-    def insert_into_db(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name, network_address, fuzzy_variables):
         try:
-            conn = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
+            conn = pool.getconn()
             cursor = conn.cursor()
 
-            insert_system_query = '''
-            INSERT INTO public."Fuzzy systems" ("Name", "NetworkAdress")
-            VALUES (%s, %s) RETURNING "ID"
-            '''
-            cursor.execute(insert_system_query, (system_name, network_address))
-            system_id = cursor.fetchone()[0]
+            report = self.write_system(cursor, system_name, network_address, fml_items, bulk, batch_size, optimize)
 
-            insert_variable_query = '''
-            INSERT INTO public."Fuzzy variables" ("Name", "Domainleft", "Domainright", "Scale", "DefaultValue", "Accumulation", "Defuzzifier", "Type", "System_ID")
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING "ID"
-            '''
-            insert_terms_query = '''
-            INSERT INTO public."Fuzzy terms" ("Name", "Complament", "Param1", "Param2", "Param3", "Param4", "Variables_ID", "Shape")
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            '''
-            insert_MRB_query = '''
-            INSERT INTO public."Mamdani Rules Base" ("Name", "andMethod", "orMethod", "activationMethod", "System_ID")
-            VALUES (%s, %s, %s, %s, %s) RETURNING "ID"
-            '''
-            insert_rule_query = '''
-            INSERT INTO public."Rules" ("Name", "Connector", "orMethod", "Weight", "andMethod", "MRB_ID", "Antecedent terms", "Antecedent variables", "Antecedent modifiers", "Consequent Variables", "Consequent Terms")
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            '''
+            conn.commit()
+
+        except Exception as e:
+            print(f"Error occurred: {e}")
+            raise
 
-            for variable in fuzzy_variables:
-                cursor.execute(insert_variable_query, (
-                    variable['name'], 
-                    variable['domain_left'], 
-                    variable['domain_right'], 
-                    variable['scale'], 
-                    variable['default_value'], 
-                    variable['accumulation'], 
-                    variable['defuzzifier'], 
-                    variable['type'], 
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                pool.putconn(conn)
+
+        return report
+
+    def write_system(self, cursor, system_name, network_address, fml_items, bulk=False, batch_size=1000, optimize=False):
+        optimization = None
+        if optimize:
+            fml_items, optimization = self.optimize_items(fml_items)
+
+        insert_system_query = '''
+        INSERT INTO public."Fuzzy systems" ("Name", "NetworkAdress")
+        VALUES (%s, %s) RETURNING "ID"
+        '''
+        cursor.execute(insert_system_query, (system_name, network_address))
+        system_id = cursor.fetchone()[0]
+
+        insert_variable_query = '''
+        INSERT INTO public."Fuzzy variables" ("Name", "Domainleft", "Domainright", "Scale", "DefaultValue", "Accumulation", "Defuzzifier", "Type", "System_ID")
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING "ID"
+        '''
+        insert_terms_query = '''
+        INSERT INTO public."Fuzzy terms" ("Name", "Complament", "Param1", "Param2", "Param3", "Param4", "Variables_ID", "Shape")
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        '''
+        insert_MRB_query = '''
+        INSERT INTO public."Mamdani Rules Base" ("Name", "andMethod", "orMethod", "activationMethod", "System_ID")
+        VALUES (%s, %s, %s, %s, %s) RETURNING "ID"
+        '''
+        insert_rule_query = '''
+        INSERT INTO public."Rules" ("Name", "Connector", "orMethod", "Weight", "andMethod", "MRB_ID", "Antecedent terms", "Antecedent variables", "Antecedent modifiers", "Consequent Variables", "Consequent Terms")
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        '''
+
+        report = None
+
+        if bulk:
+            report = self.bulk_insert_items(cursor, system_id, fml_items, batch_size)
+        else:
+            MRB_id = None
+
+            for kind, item in fml_items:
+                if kind == 'variable':
+                    cursor.execute(insert_variable_query, (
+                        item['name'], 
+                        item['domain_left'], 
+                        item['domain_right'], 
+                        item['scale'], 
+                        item['default_value'], 
+                        item['accumulation'], 
+                        item['defuzzifier'], 
+                        item['type'], 
+                        system_id
+                    ))
+                    variable_id = cursor.fetchone()[0]
+
+                    for term in item['terms']:
+                        cursor.execute(insert_terms_query, (
+                            term['name'], 
+                            term['complement'], 
+                            term['params'][0], 
+                            term['params'][1], 
+                            term['params'][2], 
+                            term['params'][3], 
+                            variable_id, 
+                            term['shape']
+                        ))
+
+                elif kind == 'mrb':
+                    cursor.execute(insert_MRB_query, (
+                        item['name'], 
+                        item['andMethod'], 
+                        item['orMethod'], 
+                        item['activationMethod'], 
+                        system_id
+                    ))
+                    MRB_id = cursor.fetchone()[0]
+
+                elif kind == 'rule':
+                    if MRB_id is None:
+                        raise ValueError(f"Rule '{item['name']}' is not inside a mamdaniRuleBase")
+
+                    cursor.execute(insert_rule_query, (
+                        item['name'], 
+                        item['connector'], 
+                        item['orMethod'], 
+                        item['weight'], 
+                        item['andMethod'], 
+                        MRB_id,
+                        item['antecedent terms'],
+                        item['antecedent variables'],
+                        item['antecedent modifiers'],
+                        item['consequent variables'],
+                        item['consequent terms']
+                    ))
+
+        if optimization is not None:
+            report = dict(report or {}, optimization=optimization)
+
+        return report
+
+    def optimize_items(self, fml_items, limit=50):
+        items = list(fml_items)
+        report = {"rules_in": 0, "rules_out": 0, "merged_rules": [], "invalid_rules": [], "removed_terms": [], "unused_variables": []}
+
+        variables = {item['name']: item for kind, item in items if kind == 'variable'}
+        known_terms = {(variable['name'], term['name']) for variable in variables.values() for term in variable['terms']}
+
+        def note(key, entry):
+            if len(report[key]) < limit:
+                report[key].append(entry)
+
+        def clause_error(names, terms):
+            for variable, term in zip(names, terms):
+                if variable not in variables:
+                    return f"unknown variable '{variable}'"
+                if (variable, term) not in known_terms:
+                    return f"unknown term '{variable}.{term}'"
+            return None
+
+        kept = []
+        equivalent = {}
+        rule_base = -1
+        merged = 0
+        invalid = 0
+
+        for kind, item in items:
+            if kind == 'mrb':
+                rule_base += 1
+            elif kind == 'rule':
+                report["rules_in"] += 1
+                reason = (clause_error(item['antecedent variables'], item['antecedent terms'])
+                          or clause_error(item['consequent variables'], item['consequent terms']))
+                if reason:
+                    invalid += 1
+                    note("invalid_rules", {"rule": item['name'], "reason": reason})
+                    continue
+
+                # Rules that differ only in clause order or weight are merged when every consequent variable
+                # accumulates with MAX; the surviving rule keeps the largest weight, so inference is unchanged.
+                if all((variables[variable]['accumulation'] or 'MAX').upper() == 'MAX' for variable in item['consequent variables']):
+                    key = (
+                        rule_base,
+                        (item['connector'] or 'and').lower(),
+                        (item['andMethod'] or '').upper(),
+                        (item['orMethod'] or '').upper(),
+                        tuple(sorted(zip(item['antecedent variables'], item['antecedent terms'], [m or '' for m in item['antecedent modifiers']]))),
+                        tuple(sorted(zip(item['consequent variables'], item['consequent terms'])))
+                    )
+                    survivor = equivalent.get(key)
+                    if survivor is not None:
+                        survivor['weight'] = max(survivor['weight'], item['weight'])
+                        merged += 1
+                        note("merged_rules", {"rule": item['name'], "merged_into": survivor['name']})
+                        continue
+                    item = equivalent[key] = dict(item)
+
+            kept.append((kind, item))
+
+        used_terms = set()
+        for kind, item in kept:
+            if kind == 'rule':
+                used_terms.update(zip(item['antecedent variables'], item['antecedent terms']))
+                used_terms.update(zip(item['consequent variables'], item['consequent terms']))
+
+        # A variable no rule mentions keeps its terms: dropping them all would drop the variable itself.
+        removed = 0
+        for idx, (kind, item) in enumerate(kept):
+            if kind != 'variable':
+                continue
+            terms = [term for term in item['terms'] if (item['name'], term['name']) in used_terms]
+            if not terms:
+                note("unused_variables", item['name'])
+            elif len(terms) < len(item['terms']):
+                for term in item['terms']:
+                    if (item['name'], term['name']) not in used_terms:
+                        removed += 1
+                        note("removed_terms", f"{item['name']}.{term['name']}")
+                kept[idx] = (kind, dict(item, terms=terms))
+
+        report["rules_out"] = report["rules_in"] - merged - invalid
+        report["rules_merged"] = merged
+        report["rules_invalid"] = invalid
+        report["terms_removed"] = removed
+
+        return kept, report
+
+    def bulk_insert_items(self, cursor, system_id, fml_items, batch_size=1000):
+        insert_MRB_query = '''
+        INSERT INTO public."Mamdani Rules Base" ("Name", "andMethod", "orMethod", "activationMethod", "System_ID")
+        VALUES (%s, %s, %s, %s, %s) RETURNING "ID"
+        '''
+
+        report = {"variables": 0, "terms": 0, "rule_bases": 0, "rules": 0, "batches": 0}
+        variables = []
+        rules = []
+        MRB_id = None
+
+        for kind, item in fml_items:
+            if kind == 'variable':
+                variables.append(item)
+                if len(variables) >= batch_size:
+                    self._flush_variables(cursor, system_id, variables, batch_size, report)
+
+            elif kind == 'mrb':
+                cursor.execute(insert_MRB_query, (
+                    item['name'], 
+                    item['andMethod'], 
+                    item['orMethod'], 
+                    item['activationMethod'], 
                     system_id
                 ))
-                variable_id = cursor.fetchone()[0]  ##
-
+                MRB_id = cursor.fetchone()[0]
+                report["rule_bases"] += 1
+
+            elif kind == 'rule':
+                if MRB_id is None:
+                    raise ValueError(f"Rule '{item['name']}' is not inside a mamdaniRuleBase")
+
+                rules.append((MRB_id, item))
+                if len(rules) >= batch_size:
+                    self._flush_rules(cursor, rules, batch_size, report)
+
+        self._flush_variables(cursor, system_id, variables, batch_size, report)
+        self._flush_rules(cursor, rules, batch_size, report)
+
+        return report
+
+    def _flush_variables(self, cursor, system_id, variables, batch_size, report):
+        if not variables:
+            return
+
+        insert_variables_query = '''
+        INSERT INTO public."Fuzzy variables" ("Name", "Domainleft", "Domainright", "Scale", "DefaultValue", "Accumulation", "Defuzzifier", "Type", "System_ID")
+        VALUES %s RETURNING "ID"
+        '''
+        insert_terms_query = '''
+        INSERT INTO public."Fuzzy terms" ("Name", "Complament", "Param1", "Param2", "Param3", "Param4", "Variables_ID", "Shape")
+        VALUES %s
+        '''
+
+        variable_rows = [(
+            variable['name'],
+            variable['domain_left'],
+            variable['domain_right'],
+            variable['scale'],
+            variable['default_value'],
+            variable['accumulation'],
+            variable['defuzzifier'],
+            variable['type'],
+            system_id
+        ) for variable in variables]
+        variable_ids = self._execute_batch(cursor, "variables", insert_variables_query, variable_rows,
+                                           [variable['name'] for variable in variables], batch_size, fetch=True)
+
+        term_rows = []
+        term_labels = []
+        for variable, variable_id in zip(variables, variable_ids):
             for term in variable['terms']:
-                cursor.execute(insert_terms_query, (
-                    term['name'], 
-                    term['complement'], 
-                    term['params'][0], 
-                    term['params'][1], 
-                    term['params'][2], 
-                    term['params'][3], 
-                    variable_id, 
+                term_rows.append((
+                    term['name'],
+                    term['complement'],
+                    term['params'][0],
+                    term['params'][1],
+                    term['params'][2],
+                    term['params'][3],
+                    variable_id,
                     term['shape']
                 ))
+                term_labels.append(f"{variable['name']}.{term['name']}")
+        if term_rows:
+            self._execute_batch(cursor, "terms", insert_terms_query, term_rows, term_labels, batch_size)
+
+        report["variables"] += len(variable_rows)
+        report["terms"] += len(term_rows)
+        report["batches"] += 1
+        variables.clear()
+
+    def _flush_rules(self, cursor, rules, batch_size, report):
+        if not rules:
+            return
+
+        insert_rules_query = '''
+        INSERT INTO public."Rules" ("Name", "Connector", "orMethod", "Weight", "andMethod", "MRB_ID", "Antecedent terms", "Antecedent variables", "Antecedent modifiers", "Consequent Variables", "Consequent Terms")
+        VALUES %s
+        '''
+
+        rule_rows = [(
+            rule['name'],
+            rule['connector'],
+            rule['orMethod'],
+            rule['weight'],
+            rule['andMethod'],
+            MRB_id,
+            rule['antecedent terms'],
+            rule['antecedent variables'],
+            rule['antecedent modifiers'],
+            rule['consequent variables'],
+            rule['consequent terms']
+        ) for MRB_id, rule in rules]
+        self._execute_batch(cursor, "rules", insert_rules_query, rule_rows, [rule['name'] for _, rule in rules], batch_size)
+
+        report["rules"] += len(rule_rows)
+        report["batches"] += 1
+        rules.clear()
+
+    def _execute_batch(self, cursor, stage, query, rows, labels, batch_size, fetch=False):
+        cursor.execute("SAVEPOINT fml_bulk_batch")
+        try:
+            result = psycopg2.extras.execute_values(cursor, query, rows, page_size=batch_size, fetch=fetch)
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT fml_bulk_batch")
+            failed_rows = self._locate_failed_rows(cursor, query, rows, labels)
+            error = e.diag.message_primary or str(e).strip()
+            raise IngestError(f"Bulk insert of {stage} failed: {error}", {
+                "stage": stage,
+                "batch_rows": len(rows),
+                "error": error,
+                "failed_rows": failed_rows
+            }) from e
+        cursor.execute("RELEASE SAVEPOINT fml_bulk_batch")
+
+        return [row[0] for row in result] if fetch else None
+
+    def _locate_failed_rows(self, cursor, query, rows, labels, limit=20):
+        failed_rows = []
+
+        for row, label in zip(rows, labels):
+            cursor.execute("SAVEPOINT fml_bulk_row")
+            try:
+                psycopg2.extras.execute_values(cursor, query, [row])
+                cursor.execute("RELEASE SAVEPOINT fml_bulk_row")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT fml_bulk_row")
+                failed_rows.append({"item": label, "error": e.diag.message_primary or str(e).strip()})
+                if len(failed_rows) >= limit:
+                    break
+
+        cursor.execute("ROLLBACK TO SAVEPOINT fml_bulk_batch")
+
+        return failed_rows
 
+    def get_mamdani_rules_base(self, root):
+        return [self.parse_mamdani_rule_base(mamdani_rule_base) for mamdani_rule_base in root.findall('mamdaniRuleBase')]
+
+    def parse_mamdani_rule_base(self, mamdani_rule_base):
+        return {
+            "name": mamdani_rule_base.attrib['name'],
+            "andMethod": mamdani_rule_base.attrib['andMethod'],
+            "orMethod": mamdani_rule_base.attrib['orMethod'],
+            "activationMethod": mamdani_rule_base.attrib['activationMethod']
+        }
 
-            for MRB in variable['MRB']:
-                cursor.execute(insert_MRB_query, (
-                    MRB['name'], 
-                    MRB['andMethod'], 
-                    MRB['orMethod'], 
-                    MRB['activationMethod'], 
-                    system_id
-                ))
-                MRB_id = cursor.fetchone()[0]
+    def get_rules(self, root):
+        return [self.parse_rule(rule) for rule in root.iter('rule')]
+
+    def parse_rule(self, rule):
+        antecedent_terms = []
+        antecedent_variables = []
+        antecedent_modifiers = []
+        consequent_variables = []
+        consequent_terms = []
+
+        antecedent = rule.find('antecedent')
+        if antecedent is not None:
+            for clause in antecedent.findall('clause'):
+                variable = clause.find('variable').text
+                term = clause.find('term').text
+                antecedent_variables.append(variable)
+                antecedent_terms.append(term)
+
+                modifier = clause.attrib.get('modifier')
+                antecedent_modifiers.append(modifier if modifier else None)
+
+        consequent = rule.find('consequent')
+        if consequent is not None:
+            for then_clause in consequent.find('then').findall('clause'):
+                variable = then_clause.find('variable').text
+                term = then_clause.find('term').text
+                consequent_variables.append(variable)
+                consequent_terms.append(term)
+
+        return {
+            "name": rule.attrib.get('name'),
+            "connector": rule.attrib.get('connector'),
+            "orMethod": rule.attrib.get('orMethod'),
+            "weight": float(rule.attrib.get('weight')),
+            "andMethod": rule.attrib.get('andMethod'),
+            "antecedent terms": antecedent_terms,
+            "antecedent variables": antecedent_variables,
+            "antecedent modifiers": antecedent_modifiers,
+            "consequent variables": consequent_variables,
+            "consequent terms": consequent_terms
+        }
 
-            for Rule in variable['Rule']:
-                cursor.execute(insert_rule_query, (
-                    Rule['name'], 
-                    Rule['connector'], 
-                    Rule['orMethod'], 
-                    Rule['weight'], 
-                    Rule['andMethod'], 
-                    MRB_id,
-                    Rule['antecedent terms'],
-                    Rule['antecedent variables'],
-                    Rule['antecedent modifiers'],
-                    Rule['consequent variables'],
-                    Rule['consequent terms']
-                ))
+    def Put_fml_file(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, bulk=False, batch_size=1000, optimize=False):
+        fml_items = self.iter_fml()
 
-            conn.commit()
-            print("Data inserted successfully!")
+        try:
+            _, system = next(fml_items)
+            self.report = self.insert_into_db(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system['name'], system['network_address'], fml_items,
+                                              bulk=bulk, batch_size=batch_size, optimize=optimize)
+        finally:
+            fml_items.close()
 
-        except Exception as e:
-            print(f"Error occurred: {e}")
+        return system['name']
+
+def parse_fml_file(file_path):
+    fml_items = FuzzySystemParser(file_path).iter_fml()
+    _, system = next(fml_items)
+
+    return system['name'], system['network_address'], list(fml_items)
+
+def _iter_parsed_files(file_paths, executor):
+    if executor is None:
+        for idx, file_path in enumerate(file_paths):
+            try:
+                yield idx, parse_fml_file(file_path), None
+            except Exception as e:
+                yield idx, None, e
+        return
+
+    futures = {executor.submit(parse_fml_file, file_path): idx for idx, file_path in enumerate(file_paths)}
+    try:
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _failure(result, error):
+    result["status"] = "failed"
+    result["error"] = str(error)
+    if isinstance(error, IngestError):
+        result["report"] = error.report
+
+def Put_fml_files(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, file_paths, atomic=False, executor=None,
+                  insert_workers=4, bulk=True, batch_size=1000, optimize=False):
+    results = [{"file": file_path, "status": "pending"} for file_path in file_paths]
+
+    if atomic:
+        pool = get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+        connection = None
+        cursor = None
+        failed = False
+
+        try:
+            connection = pool.getconn()
+            cursor = connection.cursor()
+
+            for idx, parsed, error in _iter_parsed_files(file_paths, executor):
+                result = results[idx]
+                if error is None:
+                    system_name, network_address, fml_items = parsed
+                    result["system_name"] = system_name
+                    try:
+                        result["report"] = FuzzySystemParser(file_paths[idx]).write_system(
+                            cursor, system_name, network_address, fml_items, bulk, batch_size, optimize)
+                        result["status"] = "inserted"
+                        continue
+                    except Exception as e:
+                        error = e
+
+                _failure(result, error)
+                failed = True
+                break
+
+            if failed:
+                connection.rollback()
+            else:
+                connection.commit()
 
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if connection:
+                pool.putconn(connection)
 
-    def get_mamdani_rules_base(self, root):
-        mamdani_rules_base = []
-
-        for mamdani_rule_base in root.findall('mamdaniRuleBase'):
-            name = mamdani_rule_base.attrib['name']
-            and_method = mamdani_rule_base.attrib['andMethod']
-            or_method = mamdani_rule_base.attrib['orMethod']
-            activation_method = mamdani_rule_base.attrib['activationMethod']
-
-            mamdani_rules_base.append({
-                "name": name,
-                "andMethod": and_method,
-                "orMethod": or_method,
-                "activationMethod": activation_method
-            })
-        
-        return mamdani_rules_base
+        if failed:
+            for result in results:
+                if result["status"] == "inserted":
+                    result["status"] = "rolled_back"
+                elif result["status"] == "pending":
+                    result["status"] = "skipped"
 
-    def get_rules(self, root):
-        rules_data = []
-
-        for rule in root.findall('.//rule'):
-            rule_name = rule.attrib.get('name')
-            connector = rule.attrib.get('connector')
-            or_method = rule.attrib.get('orMethod')
-            weight = float(rule.attrib.get('weight'))
-            and_method = rule.attrib.get('andMethod')
-
-            antecedent_terms = []
-            antecedent_variables = []
-            antecedent_modifiers = []
-            consequent_variables = []
-            consequent_terms = []
-
-            antecedent = rule.find('antecedent')
-            if antecedent is not None:
-                for clause in antecedent.findall('clause'):
-                    variable = clause.find('variable').text
-                    term = clause.find('term').text
-                    antecedent_variables.append(variable)
-                    antecedent_terms.append(term)
-
-                    modifier = clause.attrib.get('modifier')
-                    antecedent_modifiers.append(modifier if modifier else None)
-
-            consequent = rule.find('consequent')
-            if consequent is not None:
-                for then_clause in consequent.find('then').findall('clause'):
-                    variable = then_clause.find('variable').text
-                    term = then_clause.find('term').text
-                    consequent_variables.append(variable)
-                    consequent_terms.append(term)
-
-            rule_info = {
-                "name": rule_name,
-                "connector": connector,
-                "orMethod": or_method,
-                "weight": weight,
-                "andMethod": and_method,
-                "antecedent terms": antecedent_terms,
-                "antecedent variables": antecedent_variables,
-                "antecedent modifiers": antecedent_modifiers,
-                "consequent variables": consequent_variables,
-                "consequent terms": consequent_terms
-            }
-
-            rules_data.append(rule_info)
-
-        return rules_data
-
-
-    def Put_fml_file(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
-        system_name, network_address = self.parse_xml()
-        tree = ET.parse(self.xml_file)
-        root = tree.getroot()
-
-        fuzzy_variables = self.get_fuzzy_variables(root)
-
-        self.insert_into_db(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name, network_address, fuzzy_variables)
+        return results
+
+    def insert(idx, parsed):
+        system_name, network_address, fml_items = parsed
+        results[idx]["system_name"] = system_name
+        try:
+            results[idx]["report"] = FuzzySystemParser(file_paths[idx]).insert_into_db(
+                DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name, network_address, fml_items,
+                bulk=bulk, batch_size=batch_size, optimize=optimize)
+            results[idx]["status"] = "inserted"
+        except Exception as e:
+            _failure(results[idx], e)
 
+    with ThreadPoolExecutor(max_workers=insert_workers) as inserters:
+        for idx, parsed, error in _iter_parsed_files(file_paths, executor):
+            if error is None:
+                inserters.submit(insert, idx, parsed)
+            else:
+                _failure(results[idx], error)
 
+    return results
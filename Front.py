@@ -1,82 +1,233 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 from tkinter import ttk, filedialog, Frame
-import subprocess
 import json
-import urllib.parse
+import os
 import shutil
+import xml.etree.ElementTree as ET
 from ttkthemes import ThemedTk
+from fml_client import FmlClient, ClientCache, RequestWorker, RequestCancelled
+from fml_viewer import ChunkedTextLoader, LazyTree
 
 systems_data = []
 selected_file_path = ""
+client = FmlClient("127.0.0.1", 5000)
+# The change feed long-polls, so it gets its own connection and worker instead of blocking the buttons.
+feed_client = FmlClient("127.0.0.1", 5000)
+cache = ClientCache(os.environ.get("FML_MANAGER_CACHE", os.path.join(os.path.expanduser("~"), ".fml_manager_cache")))
+current_document = None
+text_loader = None
+feed_version = None
+feed_running = False
 
-def run_curl():
-    global systems_data 
-    try:
-        curl_path = shutil.which("curl")
-        if curl_path is None:
-            messagebox.showerror("Error", "CURL не встановлено або не знайдено.")
-            return
+def show_output(text):
+    discard_document()
+    show_text_view()
+    output_display.delete(1.0, tk.END)
+    output_display.insert(tk.END, text)
 
-        result = subprocess.run([curl_path, "http://127.0.0.1:5000/get_systems_list"], capture_output=True, text=True)
+def show_text_view():
+    tree_frame.pack_forget()
+    output_display.pack(padx=10, pady=10, fill="both", expand=True)
 
-        output_display.delete(1.0, tk.END)
-        if result.stdout:
-            output_display.insert(tk.END, result.stdout)
-            
-            try:
-                response_data = json.loads(result.stdout)
-                if isinstance(response_data, dict) and "systems" in response_data:
-                    systems_data = response_data["systems"]
-                    systems_combobox['values'] = systems_data
-                    if systems_data:
-                        systems_combobox.current(0)
-                else:
-                    messagebox.showerror("Error", "Неправильний формат даних. Очікувався словник із ключем 'systems'.")
-            except json.JSONDecodeError:
-                messagebox.showerror("Error", "Неможливо розпізнати відповідь як JSON.")
+def show_tree_view():
+    output_display.pack_forget()
+    tree_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+def stop_text_loader():
+    if text_loader is not None:
+        text_loader.cancel()
+
+def discard_document():
+    global current_document
+    stop_text_loader()
+    current_document = None
+
+def submit(call, on_done, message="Виконується запит..."):
+    status_label.config(text=message)
+    cancel_button.state(["!disabled"])
+    worker.submit(call, lambda reply: finish(on_done, reply), request_failed)
+
+def finish(on_done, reply):
+    update_status()
+    on_done(reply)
+
+def update_status():
+    if not worker.busy and text_loader is None:
+        status_label.config(text="")
+        cancel_button.state(["disabled"])
+
+def request_failed(error):
+    update_status()
+    if isinstance(error, RequestCancelled):
+        show_output("Запит скасовано.")
+    else:
+        messagebox.showerror("Error", f"Помилка під час виконання запиту: {error}")
+
+def cancel_requests():
+    worker.cancel_all()
+    stop_text_loader()
+
+def show_systems():
+    cached = cache.get_list()
+    etag = cached["etag"] if cached else None
+    submit(lambda client: client.get_systems_list(etag), systems_received, "Завантаження списку систем...")
+
+def systems_received(reply):
+    if reply.status == 304:
+        cached = cache.get_list()
+        show_list(cached["systems"], cached["version"])
+        return
+
+    if not reply.body or reply.status == 204:
+        cache.put_list([], None, reply.headers.get("etag"))
+        show_list([], None)
+        return
+
+    try:
+        response_data = reply.json()
+        if isinstance(response_data, dict) and "systems" in response_data:
+            cache.put_list(response_data["systems"], response_data.get("version"), reply.headers.get("etag"))
+            show_list(response_data["systems"], response_data.get("version"))
         else:
-            output_display.insert(tk.END, "Систем з нечіткою логікою у базі даних не знайдено")
-    except Exception as e:
-        messagebox.showerror("Error", f"Помилка під час виконання запиту CURL: {e}")
+            show_output(reply.text())
+            messagebox.showerror("Error", "Неправильний формат даних. Очікувався словник із ключем 'systems'.")
+    except json.JSONDecodeError:
+        show_output(reply.text())
+        messagebox.showerror("Error", "Неможливо розпізнати відповідь як JSON.")
+
+def show_list(systems, version):
+    if systems:
+        show_output(json.dumps({"systems": systems, "count": len(systems)}, ensure_ascii=False))
+    else:
+        show_output("Систем з нечіткою логікою у базі даних не знайдено")
+    update_systems(systems)
+    start_change_feed(version)
+
+def update_systems(systems):
+    global systems_data
+    selected_system = systems_combobox.get()
+    systems_data = systems
+    systems_combobox['values'] = systems_data
+    if selected_system in systems_data:
+        systems_combobox.set(selected_system)
+    elif systems_data:
+        systems_combobox.current(0)
+    else:
+        systems_combobox.set("")
+
+def start_change_feed(version):
+    global feed_version, feed_running
+    feed_version = version
+    if not feed_running:
+        feed_running = True
+        poll_changes()
+
+def poll_changes():
+    if feed_version is None:
+        feed.submit(lambda client: client.request("GET", "/changes"), feed_started, feed_failed)
+    else:
+        after = feed_version
+        feed.submit(lambda client: client.get_changes(after), changes_received, feed_failed)
+
+def feed_started(reply):
+    global feed_version
+    if not reply.ok:
+        feed_failed(reply.text())
+        return
+    feed_version = reply.json()["last"]
+    poll_changes()
+
+def changes_received(reply):
+    global feed_version, feed_running
+    if not reply.ok:
+        feed_failed(reply.text())
+        return
+
+    page = reply.json()
+    systems = cache.apply_changes(page)
+    if systems is None:
+        # Too far behind the server's change log: reload the whole list, which restarts the feed.
+        feed_running = False
+        show_systems()
+        return
+
+    feed_version = page["last"]
+    if page["changes"]:
+        update_systems(systems)
+    poll_changes()
+
+def feed_failed(error):
+    root.after(5000, poll_changes)
 
 
 def get_fml_file():
     selected_system = systems_combobox.get()  
     if selected_system:
-        encoded_system = urllib.parse.quote(selected_system)  
-        try:
+        parse = view_mode.get() == "tree"
+        submit(lambda client: download_document(client, selected_system, parse), document_received, f"Завантаження системи {selected_system}...")
+    else:
+        messagebox.showwarning("Warning", "Будь ласка, виберіть систему.")
 
-            url = f"http://127.0.0.1:5000/get_fml_file/{encoded_system}"
 
-            result = subprocess.run(["curl", url], capture_output=True, text=True)
-            
-            output_display.delete(1.0, tk.END)
-            if result.stdout:
-                output_display.insert(tk.END, result.stdout)
-            else:
-                output_display.insert(tk.END, "Систем з нечіткою логікою у базі даних не знайдено")
-        except Exception as e:
-            messagebox.showerror("Error", f"Помилка під час виконання запиту CURL: {e}")
+def download_document(client, system_name, parse):
+    # Runs on the worker thread: the document goes straight to disk and is parsed there, never through Tk.
+    path, etag = cache.document(system_name)
+    sink = cache.new_download()
+    try:
+        with sink:
+            reply = client.download_fml_file(system_name, sink, etag)
+    except BaseException:
+        os.remove(sink.name)
+        raise
+
+    if reply.status == 304 and path is not None:
+        os.remove(sink.name)
+    elif reply.ok:
+        path = cache.put_document(system_name, sink.name, reply.headers.get("etag"))
     else:
-        messagebox.showwarning("Warning", "Будь ласка, виберіть систему.")
+        os.remove(sink.name)
+        return reply, None, None
+
+    return reply, path, ET.parse(path).getroot() if parse else None
+
+
+def document_received(result):
+    global current_document, text_loader
+    reply, path, root_element = result
+    if path is None:
+        show_output("Систем з нечіткою логікою у базі даних не знайдено")
+        return
+
+    discard_document()
+    current_document = path
+    if root_element is not None:
+        show_tree_view()
+        lazy_tree.load(root_element)
+    else:
+        show_text_view()
+        status_label.config(text="Відображення документа...")
+        cancel_button.state(["!disabled"])
+        text_loader = ChunkedTextLoader(output_display, path, on_finish=text_loaded)
+        text_loader.start()
+
+def text_loaded():
+    global text_loader
+    text_loader = None
+    update_status()
+
+
+def show_reply(reply):
+    if reply.body:
+        show_output(reply.text())
+    else:
+        show_output("Помилка: Немає відповіді сервера.")
 
 
 def delete_one_system():
     selected_system = systems_combobox.get()  
     if selected_system:
-        encoded_system = urllib.parse.quote(selected_system)  
-        try:
-            url = f"http://127.0.0.1:5000/delete_one_system/{encoded_system}"
-            result = subprocess.run(["curl", "-X", "DELETE", url], capture_output=True, text=True)
-
-            output_display.delete(1.0, tk.END)
-            if result.stdout:
-                output_display.insert(tk.END, result.stdout)
-            else:
-                output_display.insert(tk.END, "Error: No response from server.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Помилка під час виконання запиту CURL: {e}")
+        submit(lambda client: client.delete_one_system(selected_system), show_reply, f"Видалення системи {selected_system}...")
     else:
         messagebox.showwarning("Warning", "Будь ласка, виберіть систему.")
 
@@ -91,37 +242,41 @@ def select_file():
         output_display.insert(tk.END, f"обраний файл {selected_file_path}")
 
 def save_to_file():
-    file_path = filedialog.asksaveasfilename(
-        title="Зберегти як",
-        defaultextension=".txt",
-        filetypes=(("Text files", "*.txt"), ("All files", "*.*"))
-    )
+    if current_document is not None:
+        file_path = filedialog.asksaveasfilename(
+            title="Зберегти як",
+            defaultextension=".xml",
+            filetypes=(("XML files", "*.xml"), ("All files", "*.*"))
+        )
+    else:
+        file_path = filedialog.asksaveasfilename(
+            title="Зберегти як",
+            defaultextension=".txt",
+            filetypes=(("Text files", "*.txt"), ("All files", "*.*"))
+        )
     if file_path:
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(output_display.get(1.0, tk.END)) 
+            if current_document is not None:
+                shutil.copyfile(current_document, file_path)
+            else:
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(output_display.get(1.0, tk.END)) 
             messagebox.showinfo("Saving", "Файл успішно збережено.")
         except Exception as e:
             messagebox.showerror("Error", f"Не вдалось зберегти файл: {e}")
 
 def upload_fml_file():
     if selected_file_path:
-        try:
-            url = "http://127.0.0.1:5000/put_fml_file"
-            data = json.dumps({"file_path": selected_file_path})
-            result = subprocess.run(
-                ["curl", "-X", "PUT", "-H", "Content-Type: application/json", "-d", data, url],
-                capture_output=True,
-                text=True
-            )
-            output_display.delete(1.0, tk.END)
-            output_display.insert(tk.END, f"завантажено файл {selected_file_path}")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Помилка під час виконання запиту CURL: {e}")
+        file_path = selected_file_path
+        submit(lambda client: client.put_fml_file(file_path), lambda reply: upload_finished(file_path, reply), f"Завантаження файлу {file_path}...")
     else:
         messagebox.showwarning("Warning", "Виберіть файл.")
 
+def upload_finished(file_path, reply):
+    show_output(f"завантажено файл {file_path}\n")
+    if reply.body:
+        output_display.insert(tk.END, reply.text())
+
 def delete_systems():
     selected_system = systems_combobox.get()
     
@@ -129,19 +284,7 @@ def delete_systems():
         confirm = messagebox.askyesno("Підтвердження видалення", "Ви впевнені, що хочете видалити всі системи?")
         
         if confirm:
-            encoded_system = urllib.parse.quote(selected_system)
-            try:
-                url = f"http://127.0.0.1:5000/delete_systems_list"
-                
-                result = subprocess.run(["curl", "-X", "DELETE", url], capture_output=True, text=True)
-                
-                output_display.delete(1.0, tk.END)
-                if result.stdout:
-                    output_display.insert(tk.END, result.stdout)
-                else:
-                    output_display.insert(tk.END, "Помилка: Немає відповіді сервера.")
-            except Exception as e:
-                messagebox.showerror("Error", f"Помилка під час виконання CURL запиту: {e}")
+            submit(lambda client: client.delete_systems_list(), show_reply, "Видалення всіх систем...")
     else:
         messagebox.showwarning("Warning", "Будь ласка, виберіть систему.")
 
@@ -158,11 +301,25 @@ right_frame = Frame(root, bg="#2b2b2b")
 output_display = scrolledtext.ScrolledText(left_frame, width=60, height=15)
 output_display.pack(padx=10, pady=10, fill="both", expand=True)
 
+tree_frame = Frame(left_frame, bg="#2b2b2b")
+document_tree = ttk.Treeview(tree_frame, columns=("value",))
+document_tree.heading("#0", text="Елемент")
+document_tree.heading("value", text="Значення")
+tree_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=document_tree.yview)
+document_tree.configure(yscrollcommand=tree_scrollbar.set)
+tree_scrollbar.pack(side="right", fill="y")
+document_tree.pack(side="left", fill="both", expand=True)
+lazy_tree = LazyTree(document_tree)
+
 systems_combobox = ttk.Combobox(right_frame, state="readonly", width=50)
 systems_combobox.pack(pady=25, padx=10)
 
-curl_button = ttk.Button(right_frame, text="Show systems", command=run_curl, width=button_width)
-curl_button.pack(pady=button_pady, padx=10)
+view_mode = tk.StringVar(value="text")
+ttk.Radiobutton(right_frame, text="Text view", variable=view_mode, value="text").pack(padx=10)
+ttk.Radiobutton(right_frame, text="Tree view", variable=view_mode, value="tree").pack(padx=10)
+
+systems_button = ttk.Button(right_frame, text="Show systems", command=show_systems, width=button_width)
+systems_button.pack(pady=button_pady, padx=10)
 
 get_fml_button = ttk.Button(right_frame, text="Show current system", command=get_fml_file, width=button_width)
 get_fml_button.pack(pady=button_pady, padx=10)
@@ -182,9 +339,24 @@ select_file_button.pack(pady=button_pady, padx=10)
 save_button = ttk.Button(right_frame, text="Download file", command=save_to_file, width=button_width)
 save_button.pack(pady=button_pady, padx=10)
 
+cancel_button = ttk.Button(right_frame, text="Cancel request", command=cancel_requests, width=button_width)
+cancel_button.pack(pady=button_pady, padx=10)
+cancel_button.state(["disabled"])
+
+status_label = ttk.Label(right_frame, text="")
+status_label.pack(pady=button_pady, padx=10)
+
 left_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
 right_frame.pack(side="right", fill="both", expand=True, padx=10, pady=10)
 
-run_curl()
+worker = RequestWorker(root, client)
+feed = RequestWorker(root, feed_client)
+
+cached_list = cache.get_list()
+if cached_list is not None:
+    update_systems(cached_list["systems"])
+show_systems()
 
-root.mainloop()
\ No newline at end of file
+root.mainloop()
+client.close()
+feed_client.close()
\ No newline at end of file
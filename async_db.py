@@ -0,0 +1,244 @@
+import asyncio
+import time
+
+import asyncpg
+
+from API_list import CHANGE_CHANNEL, FuzzySystemDatabase, changes_page, latest_system_query, latest_systems_query, like_prefix, load_system_document, page_cursor, parse_page_cursor
+
+
+async def create_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, min_size=2, max_size=20, max_inactive_lifetime=300.0,
+                      command_timeout=None):
+    return await asyncpg.create_pool(
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=int(DB_PORT),
+        min_size=min_size,
+        max_size=max_size,
+        max_inactive_connection_lifetime=max_inactive_lifetime,
+        command_timeout=command_timeout
+    )
+
+
+def pool_stats(pool):
+    return {
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "in_use": pool.get_size() - pool.get_idle_size(),
+        "minconn": pool.get_min_size(),
+        "maxconn": pool.get_max_size(),
+    }
+
+
+class AsyncFuzzySystemDatabase:
+    def __init__(self, pool, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+        self.pool = pool
+        # Rendering and the ingest path are shared with the synchronous service.
+        self.sync_db = FuzzySystemDatabase(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+
+    def Create_fuzzy_system_xml(self, data):
+        return self.sync_db.Create_fuzzy_system_xml(data)
+
+    async def Get_system(self, system_name):
+        async with self.pool.acquire() as connection:
+            row = await connection.fetchrow(latest_system_query('sys."Name" = $1'), system_name)
+
+        if row is None:
+            return None
+
+        return load_system_document(row["document"])
+
+    async def Get_systems(self, system_names):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(latest_systems_query('sys."Name" = ANY($1::text[])'), list(system_names))
+
+        return {system_name: load_system_document(document) for system_name, document in rows}
+
+    async def Iter_systems(self, names=None, prefix=None, itersize=100):
+        conditions = []
+        params = []
+
+        if names is not None:
+            params.append(list(names))
+            conditions.append(f'sys."Name" = ANY(${len(params)}::text[])')
+        if prefix:
+            params.append(like_prefix(prefix))
+            conditions.append(f'sys."Name" LIKE ${len(params)}')
+
+        query = latest_systems_query(" AND ".join(conditions) or "TRUE")
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                async for system_name, document in connection.cursor(query, *params, prefetch=itersize):
+                    yield system_name, load_system_document(document)
+
+    async def Get_List(self):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch('SELECT "Name" FROM "Fuzzy systems";')
+
+        return [row[0] for row in rows]
+
+    async def Get_page(self, limit=100, after=None, prefix=None, descending=False, count=None):
+        conditions = []
+        params = []
+
+        if after is not None:
+            cursor_key = parse_page_cursor(after)
+            if cursor_key is None:
+                raise ValueError(f"Invalid page cursor '{after}'")
+            params.extend(cursor_key)
+            conditions.append(f'("Name" COLLATE "C", "ID") {"<" if descending else ">"} (${len(params) - 1}, ${len(params)})')
+        if prefix:
+            params.append(like_prefix(prefix))
+            conditions.append(f'"Name" COLLATE "C" LIKE ${len(params)}')
+
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        order = "DESC" if descending else "ASC"
+        params.append(limit + 1)
+
+        page = {"systems": [], "next_cursor": None}
+
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(f'''
+            SELECT "Name", "ID" FROM "Fuzzy systems"
+            {where}
+            ORDER BY "Name" COLLATE "C" {order}, "ID" {order}
+            LIMIT ${len(params)};
+            ''', *params)
+
+            if len(rows) > limit:
+                rows = rows[:limit]
+                page["next_cursor"] = page_cursor(*rows[-1])
+            page["systems"] = [row[0] for row in rows]
+
+            if count == "estimate" and not prefix:
+                estimate = await connection.fetchval('''SELECT reltuples::bigint FROM pg_class WHERE oid = 'public."Fuzzy systems"'::regclass;''')
+                if estimate >= 0:
+                    page["total"] = estimate
+                    page["total_is_estimate"] = True
+
+            if count in ("exact", "estimate") and "total" not in page:
+                if prefix:
+                    page["total"] = await connection.fetchval('SELECT count(*) FROM "Fuzzy systems" WHERE "Name" COLLATE "C" LIKE $1;', like_prefix(prefix))
+                else:
+                    page["total"] = await connection.fetchval('SELECT count(*) FROM "Fuzzy systems";')
+                page["total_is_estimate"] = False
+
+        return page
+
+    async def Delete_all_data(self):
+        async with self.pool.acquire() as connection:
+            await connection.execute('DELETE FROM public."Fuzzy systems";')
+
+    async def Delete_one_data(self, system_name):
+        async with self.pool.acquire() as connection:
+            await connection.execute('DELETE FROM public."Fuzzy systems" WHERE "Name" = $1;', system_name)
+
+    async def Get_change_seq(self):
+        async with self.pool.acquire() as connection:
+            return await connection.fetchval('SELECT coalesce(max("Seq"), 0) FROM public."Change log";')
+
+    async def Get_changes(self, after=0, limit=1000):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch('''
+            SELECT "Seq", "Operation", "Name", extract(epoch FROM "Changed")::float8 FROM public."Change log"
+            WHERE "Seq" > $1 ORDER BY "Seq" LIMIT $2;
+            ''', after, limit)
+            oldest = await connection.fetchval('SELECT min("Seq") FROM public."Change log";')
+
+        return changes_page([tuple(row) for row in rows], oldest, after)
+
+    async def Get_control_surface(self, system_name):
+        async with self.pool.acquire() as connection:
+            return await connection.fetchval('''
+            SELECT "Data" FROM public."Control surfaces"
+            WHERE "System_ID" = (SELECT "ID" FROM public."Fuzzy systems" WHERE "Name" = $1 ORDER BY "ID" DESC LIMIT 1);
+            ''', system_name)
+
+    async def Put_control_surface(self, system_name, resolution, max_error, data):
+        async with self.pool.acquire() as connection:
+            status = await connection.execute('''
+            INSERT INTO public."Control surfaces" ("System_ID", "Resolution", "Max error", "Data")
+            SELECT "ID", $1, $2, $3 FROM public."Fuzzy systems" WHERE "Name" = $4 ORDER BY "ID" DESC LIMIT 1
+            ON CONFLICT ("System_ID") DO UPDATE
+            SET "Resolution" = EXCLUDED."Resolution", "Max error" = EXCLUDED."Max error",
+                "Data" = EXCLUDED."Data", "Created" = now();
+            ''', [int(r) for r in resolution], max_error, data, system_name)
+
+        return status.split()[-1] != "0"
+
+
+class AsyncChangeListener:
+    # Event-loop counterpart of change_feed.ChangeListener, on a dedicated asyncpg connection.
+    def __init__(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, reconnect_delay=5.0):
+        self.connect_options = {"database": DB_NAME, "user": DB_USER, "password": DB_PASSWORD, "host": DB_HOST, "port": int(DB_PORT)}
+        self.reconnect_delay = reconnect_delay
+        self.seq = 0
+        self.connected = False
+        self.connections = 0
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def _announce(self, seq, connected=True):
+        self.seq = max(self.seq, seq)
+        self.connected = connected
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._announce(int(payload))
+
+    async def _run(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(**self.connect_options)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda connection: closed.set())
+                await connection.add_listener(CHANGE_CHANNEL, self._on_notify)
+                self.connections += 1
+                self._announce(0)
+                await closed.wait()
+                raise ConnectionError("listener connection closed")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Change listener error: {e}")
+                self._announce(0, connected=False)
+                await asyncio.sleep(self.reconnect_delay)
+
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+    async def wait(self, after, timeout):
+        if not self.connected:
+            timeout = min(timeout, 1.0)
+        deadline = time.monotonic() + timeout
+
+        while self.seq <= after:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+
+        return True
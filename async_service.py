@@ -0,0 +1,799 @@
+import asyncio
+import contextlib
+import glob
+import gzip
+import io
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from API_list import parse_page_cursor, Create_indexes, Create_control_surfaces_table, Create_change_log, Trim_change_log, FuzzySystemParser, IngestError, Put_fml_files
+from async_db import AsyncFuzzySystemDatabase, AsyncChangeListener, create_pool, pool_stats
+from batch_inference import run_batch, iter_array_chunks, iter_csv_chunks, iter_npy_chunks, iter_ndjson_chunks
+from change_feed import ChangeFollower, catch_up_async, follow_changes_async, wait_for_changes_async, change_events_async
+from codegen import generate_module, module_file_name
+from connection_pool import init_pool, get_pool
+from control_surface import ControlSurface
+from inference import compile_system
+from metrics import REGISTRY, HTTP_IN_PROGRESS, FML_UPLOADS, observe_request, pool_metrics, cache_metrics
+from service_formats import GZIP_MIMETYPES, BATCH_OUTPUTS, EXPORT_FORMATS, ExportEncoder
+from system_caches import SystemCaches
+
+# ASGI counterpart of knowledgeBase_service. Reads and deletes go through asyncpg; FML ingest and other
+# CPU-bound work reuse the synchronous code in Starlette's thread pool so the event loop never blocks.
+# Run with `python async_service.py` or `uvicorn async_service:app`.
+
+DB_CONFIG = ("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")
+BODY_QUEUE_CHUNKS = 16
+
+caches = SystemCaches()
+db = None
+change_listener = None
+parse_executor = None
+
+
+def error(message, status_code=500):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def not_found(message="No systems found"):
+    return JSONResponse({"message": message}, status_code=404)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+class RequestBodyReader(io.RawIOBase):
+    # Blocking file view of the request body for parsers running in the thread pool. A task on the event loop
+    # moves the body into a bounded queue, so a slow parser holds the client back instead of the body piling
+    # up in memory. Must not be read on the event loop thread.
+    def __init__(self, request, max_chunks=BODY_QUEUE_CHUNKS):
+        super().__init__()
+        self.loop = asyncio.get_running_loop()
+        self.chunks = asyncio.Queue(maxsize=max_chunks)
+        self.pending = memoryview(b"")
+        self.finished = False
+        self.task = self.loop.create_task(self._pump(request))
+
+    async def _pump(self, request):
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await self.chunks.put(chunk)
+            await self.chunks.put(b"")
+        except ClientDisconnect:
+            await self.chunks.put(ConnectionError("client disconnected before sending the whole body"))
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            if self.finished:
+                return 0
+            chunk = asyncio.run_coroutine_threadsafe(self.chunks.get(), self.loop).result()
+            if isinstance(chunk, Exception):
+                self.finished = True
+                raise chunk
+            if not chunk:
+                self.finished = True
+                return 0
+            self.pending = memoryview(chunk)
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    async def wait_consumed(self):
+        await asyncio.wait([self.task])
+
+    async def aclose(self):
+        # Stops reading a body the parser gave up on, and wakes a reader that is still waiting for it.
+        self.task.cancel()
+        await asyncio.wait([self.task])
+        while not self.chunks.empty():
+            self.chunks.get_nowait()
+        self.chunks.put_nowait(ConnectionError("request body closed"))
+        self.close()
+
+
+class UploadStreamingResponse(StreamingResponse):
+    # Before ASGI spec 2.4 StreamingResponse polls `receive` for a disconnect while it streams, which would take
+    # body messages away from the RequestBodyReader. It only starts listening once the body has been read.
+    def __init__(self, content, body, **kwargs):
+        super().__init__(content, **kwargs)
+        self.request_body = body
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.request_body.aclose()
+
+    async def listen_for_disconnect(self, receive):
+        await self.request_body.wait_consumed()
+        await super().listen_for_disconnect(receive)
+
+
+async def open_upload_stream(request):
+    # Returns the document stream and, for a raw body, the RequestBodyReader behind it, which the caller closes.
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    body = None
+
+    if content_type == 'multipart/form-data':
+        form = await request.form()
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            return None, None
+        compressed = upload.content_type in GZIP_MIMETYPES or (upload.filename or '').endswith('.gz')
+        stream = upload.file
+    else:
+        compressed = request.headers.get('content-encoding') == 'gzip' or content_type in GZIP_MIMETYPES
+        # Unbuffered, so the parser gets each piece of the body as soon as it arrives.
+        stream = body = RequestBodyReader(request)
+
+    if compressed:
+        return gzip.GzipFile(fileobj=stream, mode='rb'), body
+    return stream, body
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/').strip('"') == etag for tag in tags)
+
+
+async def get_compiled_system(system_name):
+    system, generation = caches.lookup_system(system_name)
+
+    if system is None:
+        data = await db.Get_system(system_name)
+        if data is None:
+            return None
+        system = await run_in_threadpool(compile_system, data, caches.resolution)
+        caches.compiled_cache.put(system_name, system, generation)
+
+    return system
+
+
+async def get_control_surface(system_name):
+    surface, generation = caches.lookup_surface(system_name)
+
+    if surface is None:
+        data = await db.Get_control_surface(system_name)
+        if data is not None:
+            surface = caches.surface_cache.put(system_name, ControlSurface.from_bytes(data), generation)
+
+    return surface
+
+
+async def get_fml_file(request):
+    system_name = request.path_params['system_name']
+    try:
+        raw = request.query_params.get('format') == 'xml'
+        cached = caches.fml_cache.get(system_name)
+
+        if cached is None:
+            generation = caches.fml_cache.generation
+            data = await db.Get_system(system_name)
+
+            if data is None:
+                return JSONResponse({"message": "No systems found"}, status_code=404 if raw else 200)
+
+            system = await run_in_threadpool(db.Create_fuzzy_system_xml, data)
+            cached = caches.fml_cache.put(system_name, system, generation)
+
+        system, etag = cached
+        headers = {"ETag": f'"{etag}"'}
+
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        if raw:
+            return Response(system, media_type="application/xml", headers=headers)
+        return JSONResponse({"system": system}, headers=headers)
+    except Exception as e:
+        return error(str(e))
+
+
+async def get_fml_files(request):
+    try:
+        data = await read_json(request)
+        names = data.get('names') if isinstance(data, dict) else None
+
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return error("names must be a list of system names.", 400)
+
+        names = list(dict.fromkeys(names))
+        systems = {}
+        misses = []
+
+        for system_name in names:
+            cached = caches.fml_cache.get(system_name)
+            if cached is None:
+                misses.append(system_name)
+            else:
+                systems[system_name] = cached[0]
+
+        if misses:
+            generation = caches.fml_cache.generation
+            for system_name, data in (await db.Get_systems(misses)).items():
+                system = await run_in_threadpool(db.Create_fuzzy_system_xml, data)
+                caches.fml_cache.put(system_name, system, generation)
+                systems[system_name] = system
+
+        missing = [system_name for system_name in names if system_name not in systems]
+
+        return JSONResponse({"systems": systems, "missing": missing})
+    except Exception as e:
+        return error(str(e))
+
+
+async def infer(request):
+    try:
+        data = await read_json(request)
+        inputs = data.get('inputs') if isinstance(data, dict) else None
+
+        if not isinstance(inputs, (dict, list)):
+            return error("inputs must be an object of variable values or a list of input rows.", 400)
+
+        system = await get_compiled_system(request.path_params['system_name'])
+
+        if system is None:
+            return not_found()
+
+        if isinstance(inputs, dict):
+            return JSONResponse({"outputs": await run_in_threadpool(system.infer, inputs)})
+
+        outputs = await run_in_threadpool(system.evaluate, inputs)
+        return JSONResponse({"input_names": system.input_names, "output_names": system.output_names, "outputs": outputs.tolist()})
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def infer_batch(request):
+    try:
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', 10000))
+        except ValueError:
+            chunk_size = None
+        output = request.query_params.get('output', 'ndjson')
+
+        if chunk_size is None or chunk_size < 1:
+            return error("chunk_size must be a positive integer.", 400)
+        if output not in BATCH_OUTPUTS:
+            return error("output must be 'ndjson' or 'csv'.", 400)
+
+        system = await get_compiled_system(request.path_params['system_name'])
+
+        if system is None:
+            return not_found()
+
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+        if content_type == 'application/json':
+            data = await read_json(request)
+            chunks = iter_array_chunks(data.get('inputs', []) if isinstance(data, dict) else data, chunk_size)
+            return StreamingResponse(iterate_in_threadpool(run_batch(system, chunks, output=output)), media_type=BATCH_OUTPUTS[output])
+        if content_type not in ('text/csv', 'application/x-npy', 'application/octet-stream', 'application/x-ndjson'):
+            return error("Send inputs as text/csv, application/x-npy, application/x-ndjson or application/json.", 415)
+
+        # The input is read while the outputs stream back, one chunk at a time.
+        body = RequestBodyReader(request)
+        stream = io.BufferedReader(body)
+        if content_type == 'text/csv':
+            chunks = iter_csv_chunks(stream, system.input_names, chunk_size)
+        elif content_type == 'application/x-ndjson':
+            chunks = iter_ndjson_chunks(stream, chunk_size)
+        else:
+            chunks = iter_npy_chunks(stream, chunk_size)
+
+        return UploadStreamingResponse(iterate_in_threadpool(run_batch(system, chunks, output=output)), body,
+                                       media_type=BATCH_OUTPUTS[output])
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def build_control_surface(request):
+    system_name = request.path_params['system_name']
+    try:
+        data = await read_json(request) or {}
+        resolution = data.get('resolution', 33)
+        samples = data.get('samples', 2000)
+
+        if not isinstance(samples, int) or samples < 1:
+            return error("samples must be a positive integer.", 400)
+
+        system = await get_compiled_system(system_name)
+
+        if system is None:
+            return not_found()
+
+        def build():
+            surface = ControlSurface.build(system, resolution)
+            surface.measure_error(system, samples)
+            return surface
+
+        surface = await run_in_threadpool(build)
+
+        if not await db.Put_control_surface(system_name, surface.shape, surface.max_error.tolist(), surface.to_bytes()):
+            return not_found()
+
+        # Not cached here: a concurrent rebuild may have stored a newer surface, so the next read loads it with
+        # the generation taken before that fetch, like every other cache entry.
+        caches.invalidate_surface(system_name)
+        return JSONResponse(surface.describe(), status_code=201)
+    except (TypeError, ValueError) as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def get_control_surface_info(request):
+    try:
+        surface = await get_control_surface(request.path_params['system_name'])
+
+        if surface is None:
+            return not_found("No control surface found")
+
+        return JSONResponse(surface.describe())
+    except Exception as e:
+        return error(str(e))
+
+
+async def infer_control_surface(request):
+    try:
+        data = await read_json(request)
+        inputs = data.get('inputs') if isinstance(data, dict) else None
+
+        if not isinstance(inputs, (dict, list)):
+            return error("inputs must be an object of variable values or a list of input rows.", 400)
+
+        surface = await get_control_surface(request.path_params['system_name'])
+
+        if surface is None:
+            return not_found("No control surface found")
+
+        if isinstance(inputs, dict):
+            return JSONResponse({"outputs": surface.infer(inputs)})
+
+        outputs = await run_in_threadpool(surface.interpolate, inputs)
+        return JSONResponse({"input_names": surface.input_names, "output_names": surface.output_names, "outputs": outputs.tolist()})
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def codegen(request):
+    system_name = request.path_params['system_name']
+    try:
+        resolution = request.query_params.get('resolution')
+        resolution = int(resolution) if resolution is not None else None
+
+        if resolution is not None and resolution < 2:
+            return error("resolution must be an integer of at least 2.", 400)
+
+        if resolution is None or resolution == caches.resolution:
+            system = await get_compiled_system(system_name)
+        else:
+            data = await db.Get_system(system_name)
+            system = None if data is None else await run_in_threadpool(compile_system, data, resolution)
+
+        if system is None:
+            return not_found()
+
+        return Response(await run_in_threadpool(generate_module, system), media_type="text/x-python",
+                        headers={"Content-Disposition": f'attachment; filename="{module_file_name(system_name)}"'})
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def get_systems_list(request):
+    try:
+        args = request.query_params
+
+        if not args:
+            version = await db.Get_change_seq()
+            headers = {"ETag": f'"systems-{version}"'}
+
+            if etag_matches(request, f"systems-{version}"):
+                return Response(status_code=304, headers=headers)
+
+            systems = await db.Get_List()
+            if not systems:
+                return JSONResponse({"message": "No systems found", "version": version}, status_code=204, headers=headers)
+            return JSONResponse({"systems": systems, "count": len(systems), "version": version}, headers=headers)
+
+        try:
+            limit = int(args.get('limit', 100))
+        except ValueError:
+            limit = None
+        order = args.get('order', 'asc')
+        total = args.get('count')
+        after = args.get('after')
+
+        if limit is None or not 1 <= limit <= 10000:
+            return error("limit must be an integer between 1 and 10000.", 400)
+        if order not in ('asc', 'desc'):
+            return error("order must be 'asc' or 'desc'.", 400)
+        if total not in (None, 'exact', 'estimate'):
+            return error("count must be 'exact' or 'estimate'.", 400)
+        if after is not None and parse_page_cursor(after) is None:
+            return error("after must be a next_cursor returned by a previous page.", 400)
+
+        page = await db.Get_page(limit=limit, after=after, prefix=args.get('prefix'),
+                                 descending=(order == 'desc'), count=total)
+        page["count"] = len(page["systems"])
+        if page["count"] == 0 and "total" not in page:
+            return JSONResponse({"message": "No systems found"}, status_code=204)
+        return JSONResponse(page)
+    except Exception as e:
+        return error(str(e))
+
+
+async def put_fml_file(request):
+    try:
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+
+        if content_type == 'application/json':
+            data = await read_json(request) or {}
+            file_path = data.get('file_path')
+            FML_UPLOADS.inc("path")
+
+            if not file_path or not os.path.exists(file_path):
+                return error("File does not exist.", 404)
+
+            parser = FuzzySystemParser(file_path)
+            system_name = await run_in_threadpool(parser.Put_fml_file, *DB_CONFIG, bulk=data.get('bulk', True),
+                                                  optimize=data.get('optimize', False))
+            caches.invalidate_system(system_name)
+
+            response = {"message": f"File {os.path.basename(file_path)} was successfully added to the knowledge base"}
+        else:
+            source, body = await open_upload_stream(request)
+
+            if source is None:
+                return error("Expected a 'file' part in the multipart upload.", 400)
+
+            FML_UPLOADS.inc("multipart" if content_type == 'multipart/form-data' else "body")
+
+            parser = FuzzySystemParser(source)
+            try:
+                system_name = await run_in_threadpool(parser.Put_fml_file, *DB_CONFIG, bulk=request.query_params.get('bulk', '1') != '0',
+                                                      optimize=request.query_params.get('optimize', '0') != '0')
+            finally:
+                if body is not None:
+                    await body.aclose()
+            caches.invalidate_system(system_name)
+
+            response = {"message": f"System '{system_name}' was successfully added to the knowledge base"}
+
+        if parser.report and "optimization" in parser.report:
+            response["optimization"] = parser.report["optimization"]
+        return JSONResponse(response, status_code=201)
+
+    except IngestError as e:
+        return JSONResponse({"error": str(e), "report": e.report}, status_code=422)
+    except (ET.ParseError, ValueError, OSError, EOFError) as e:
+        return error(f"Invalid FML document: {e}", 400)
+    except Exception as e:
+        return error(str(e))
+
+
+async def put_fml_files(request):
+    try:
+        data = await read_json(request) or {}
+
+        file_paths = list(data.get('file_paths', []))
+        directory = data.get('directory')
+        mode = data.get('mode', 'best_effort')
+
+        if mode not in ('best_effort', 'all_or_nothing'):
+            return error("mode must be 'best_effort' or 'all_or_nothing'.", 400)
+
+        if directory:
+            if not os.path.isdir(directory):
+                return error("Directory does not exist.", 404)
+            file_paths.extend(sorted(glob.glob(os.path.join(directory, data.get('pattern', '*.xml')))))
+
+        if not file_paths:
+            return error("No files to upload.", 400)
+
+        FML_UPLOADS.inc("batch", amount=len(file_paths))
+
+        results = await run_in_threadpool(
+            Put_fml_files,
+            *DB_CONFIG,
+            file_paths,
+            atomic=(mode == 'all_or_nothing'),
+            insert_workers=int(os.environ.get("KB_INSERT_WORKERS", 4)),
+            bulk=data.get('bulk', True),
+            optimize=data.get('optimize', False),
+            executor=parse_executor
+        )
+
+        for result in results:
+            if result["status"] == "inserted":
+                caches.invalidate_system(result["system_name"])
+
+        inserted = sum(1 for result in results if result["status"] == "inserted")
+        failed = sum(1 for result in results if result["status"] == "failed")
+        summary = {"mode": mode, "inserted": inserted, "failed": failed, "files": results}
+
+        if inserted == len(results):
+            return JSONResponse(summary, status_code=201)
+        if inserted == 0:
+            return JSONResponse(summary, status_code=422)
+        return JSONResponse(summary, status_code=207)
+
+    except Exception as e:
+        return error(str(e))
+
+
+async def export_stream(names, prefix, itersize, export_format):
+    encoder = ExportEncoder(export_format, db.Create_fuzzy_system_xml)
+
+    chunk = encoder.start()
+    if chunk:
+        yield chunk
+
+    async for system_name, data in db.Iter_systems(names=names, prefix=prefix, itersize=itersize):
+        chunk = await run_in_threadpool(encoder.encode, system_name, data)
+        if chunk:
+            yield chunk
+
+    yield encoder.finish()
+
+
+async def export_systems(request):
+    try:
+        export_format = request.query_params.get('format', 'ndjson')
+
+        if export_format not in EXPORT_FORMATS:
+            return error(f"format must be one of: {', '.join(EXPORT_FORMATS)}.", 400)
+
+        try:
+            itersize = int(request.query_params.get('itersize', 100))
+        except ValueError:
+            itersize = 0
+        if itersize < 1:
+            return error("itersize must be a positive integer.", 400)
+
+        names = request.query_params.getlist('name') or None
+        chunks = export_stream(names, request.query_params.get('prefix'), itersize, export_format)
+
+        headers = {"Content-Disposition": 'attachment; filename="fuzzy_systems.tar.gz"'} if export_format == "tar" else None
+        return StreamingResponse(chunks, media_type=EXPORT_FORMATS[export_format], headers=headers)
+
+    except Exception as e:
+        return error(str(e))
+
+
+async def delete_systems_list(request):
+    try:
+        await db.Delete_all_data()
+        caches.invalidate_all()
+        return JSONResponse({"message": "All data deleted successfully"})
+    except Exception as e:
+        print(f"Error occurred while deleting data: {e}")
+        return JSONResponse({"message": "Failed to delete data"}, status_code=500)
+
+
+async def delete_one_system(request):
+    system_name = request.path_params['system_name']
+    try:
+        await db.Delete_one_data(system_name)
+        caches.invalidate_system(system_name)
+        return JSONResponse({"message": f"System '{system_name}' deleted successfully"})
+    except Exception as e:
+        print(f"Error occurred while deleting data: {e}")
+        return JSONResponse({"message": f"Failed to delete system '{system_name}'"}, status_code=500)
+
+
+async def get_changes_page(after):
+    return await db.Get_changes(after, limit=int(os.environ.get("KB_CHANGES_PAGE", 1000)))
+
+
+async def changes(request):
+    try:
+        try:
+            after = int(request.query_params['after']) if 'after' in request.query_params else None
+            timeout = float(request.query_params.get('timeout', 0))
+        except ValueError:
+            return error("after must be an integer and timeout a number.", 400)
+
+        if after is None:
+            return JSONResponse({"changes": [], "last": await db.Get_change_seq(), "reset": False})
+        if not 0 <= timeout <= 60:
+            return error("timeout must be between 0 and 60 seconds.", 400)
+
+        return JSONResponse(await wait_for_changes_async(change_listener, get_changes_page, after, timeout))
+    except Exception as e:
+        return error(str(e))
+
+
+async def changes_stream(request):
+    try:
+        after = request.headers.get('last-event-id', request.query_params.get('after'))
+        try:
+            after = int(after) if after is not None else await db.Get_change_seq()
+        except ValueError:
+            return error("after must be an integer.", 400)
+
+        events = change_events_async(
+            change_listener,
+            get_changes_page,
+            after,
+            heartbeat=float(os.environ.get("KB_SSE_HEARTBEAT", 15)),
+            max_seconds=float(os.environ.get("KB_SSE_MAX_SECONDS", 300))
+        )
+        return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    except Exception as e:
+        return error(str(e))
+
+
+async def get_pool_stats(request):
+    return JSONResponse({"async": pool_stats(db.pool), "sync": get_pool(*DB_CONFIG).stats()})
+
+
+async def cache_stats(request):
+    return JSONResponse(caches.stats())
+
+
+async def metrics(request):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def collect_pool_metrics():
+    pools = {"sync": get_pool(*DB_CONFIG).stats()}
+    if db is not None:
+        stats = pool_stats(db.pool)
+        stats["saturation"] = stats["in_use"] / stats["maxconn"]
+        pools["async"] = stats
+    return pool_metrics(pools)
+
+
+def collect_cache_metrics():
+    return cache_metrics(caches.cache_stats())
+
+
+REGISTRY.add_collector(collect_pool_metrics)
+REGISTRY.add_collector(collect_cache_metrics)
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware, so streamed responses are timed to their last chunk
+    # without being buffered.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response = {"status": "500", "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = str(message["status"])
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            # The router adds the matched endpoint to the scope; the template keeps path parameters out of the labels.
+            route = ROUTE_PATHS.get(scope.get("endpoint"), "unmatched")
+            observe_request(route, scope["method"], response["status"], time.perf_counter() - started, response["size"])
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global db, change_listener, parse_executor
+
+    pool = await create_pool(
+        *DB_CONFIG,
+        min_size=int(os.environ.get("KB_ASYNC_POOL_MIN", 2)),
+        max_size=int(os.environ.get("KB_ASYNC_POOL_MAX", 50)),
+        max_inactive_lifetime=float(os.environ.get("KB_POOL_MAX_LIFETIME", 300)),
+        command_timeout=float(os.environ["KB_ASYNC_COMMAND_TIMEOUT"]) if "KB_ASYNC_COMMAND_TIMEOUT" in os.environ else None
+    )
+    db = AsyncFuzzySystemDatabase(pool, *DB_CONFIG)
+
+    # The synchronous pool only serves ingest, which runs in the thread pool.
+    init_pool(
+        *DB_CONFIG,
+        minconn=0,
+        maxconn=int(os.environ.get("KB_POOL_MAX", 20)),
+        max_lifetime=float(os.environ.get("KB_POOL_MAX_LIFETIME", 1800)),
+        health_check_after=float(os.environ.get("KB_POOL_HEALTH_CHECK_AFTER", 30)),
+        acquire_timeout=float(os.environ.get("KB_POOL_ACQUIRE_TIMEOUT", 30))
+    )
+    await run_in_threadpool(Create_indexes, *DB_CONFIG)
+    await run_in_threadpool(Create_control_surfaces_table, *DB_CONFIG)
+    await run_in_threadpool(Create_change_log, *DB_CONFIG)
+    await run_in_threadpool(Trim_change_log, *DB_CONFIG, keep=int(os.environ.get("KB_CHANGE_LOG_KEEP", 100000)))
+    change_listener = AsyncChangeListener(*DB_CONFIG).start()
+    changes_follower = ChangeFollower(change_listener, caches.apply_change, caches.invalidate_all)
+
+    store = caches.open_store(os.environ.get("KB_COMPILED_STORE"))
+    if store is not None:
+        changes_follower.after = store.seq
+        await catch_up_async(changes_follower, get_changes_page)
+        if caches.store is None:
+            print(f"Ignoring compiled store {store.path}: the change log no longer reaches back to seq {store.seq}")
+
+    follower = asyncio.get_running_loop().create_task(follow_changes_async(changes_follower, get_changes_page, db.Get_change_seq))
+
+    # Batch uploads parse their documents here, one per core, as in the synchronous service.
+    workers = os.environ.get("KB_PARSE_WORKERS")
+    parse_executor = ProcessPoolExecutor(max_workers=int(workers) if workers else None)
+
+    try:
+        yield
+    finally:
+        follower.cancel()
+        try:
+            await follower
+        except asyncio.CancelledError:
+            pass
+        await change_listener.stop()
+        await run_in_threadpool(parse_executor.shutdown, cancel_futures=True)
+        await pool.close()
+
+
+routes = [
+    Route('/get_fml_file/{system_name}', get_fml_file, methods=['GET']),
+    Route('/get_fml_files', get_fml_files, methods=['POST']),
+    Route('/infer/{system_name}', infer, methods=['POST']),
+    Route('/infer_batch/{system_name}', infer_batch, methods=['POST']),
+    Route('/control_surface/{system_name}', build_control_surface, methods=['PUT']),
+    Route('/control_surface/{system_name}', get_control_surface_info, methods=['GET']),
+    Route('/control_surface/{system_name}/infer', infer_control_surface, methods=['POST']),
+    Route('/codegen/{system_name}', codegen, methods=['GET']),
+    Route('/get_systems_list', get_systems_list, methods=['GET']),
+    Route('/put_fml_file', put_fml_file, methods=['PUT']),
+    Route('/put_fml_files', put_fml_files, methods=['PUT']),
+    Route('/export_systems', export_systems, methods=['GET']),
+    Route('/delete_systems_list', delete_systems_list, methods=['DELETE']),
+    Route('/delete_one_system/{system_name}', delete_one_system, methods=['DELETE']),
+    Route('/changes', changes, methods=['GET']),
+    Route('/changes/stream', changes_stream, methods=['GET']),
+    Route('/pool_stats', get_pool_stats, methods=['GET']),
+    Route('/cache_stats', cache_stats, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+]
+ROUTE_PATHS = {route.endpoint: route.path for route in routes}
+
+app = Starlette(routes=routes, lifespan=lifespan, middleware=[Middleware(MetricsMiddleware)])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("KB_HOST", "127.0.0.1"), port=int(os.environ.get("KB_PORT", 5000)))
@@ -0,0 +1,198 @@
+import csv
+import io
+import itertools
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from metrics import BATCH_INFERENCE_ROWS, BATCH_INFERENCE_DURATION
+
+
+# Systems a worker process has already received, keyed by batch_key, so a chunk only has to carry the key.
+WORKER_SYSTEMS = 8
+worker_systems = OrderedDict()
+
+batch_keys = weakref.WeakKeyDictionary()
+batch_generations = itertools.count(1)
+# For every system and executor, the worker PIDs known to hold that system.
+batch_holders = weakref.WeakKeyDictionary()
+
+
+def batch_key(system):
+    # A new key for every loaded system object, so a reloaded system is never confused with an older one.
+    key = batch_keys.get(system)
+    if key is None:
+        key = batch_keys[system] = (system.system_name, next(batch_generations))
+    return key
+
+
+def evaluate_chunk(key, chunk, system=None):
+    # Returns this worker's PID with the outputs, or with None when the system was neither sent nor held.
+    if system is None:
+        system = worker_systems.get(key)
+        if system is None:
+            return os.getpid(), None
+        worker_systems.move_to_end(key)
+    else:
+        worker_systems[key] = system
+        while len(worker_systems) > WORKER_SYSTEMS:
+            worker_systems.popitem(last=False)
+    return os.getpid(), system.evaluate(chunk)
+
+
+def chunk_outputs(executor, key, system, holders, chunk, future):
+    pid, outputs = future.result()
+    if outputs is None:
+        # The worker dropped the system from its cache since it was last sent.
+        holders.discard(pid)
+        pid, outputs = executor.submit(evaluate_chunk, key, chunk, system).result()
+    holders.add(pid)
+    return outputs
+
+
+def iter_batch_outputs(system, chunks, executor=None, window=4, workers=None):
+    if executor is None:
+        for chunk in chunks:
+            yield system.evaluate(chunk)
+        return
+
+    key = batch_key(system)
+    holders = batch_holders.setdefault(system, weakref.WeakKeyDictionary()).setdefault(executor, set())
+    workers = workers or window
+    pending = deque()
+    try:
+        for chunk in chunks:
+            # The system travels with the chunks until every worker is known to hold it; after that only the key does.
+            attached = system if len(holders) < workers else None
+            pending.append((chunk, executor.submit(evaluate_chunk, key, chunk, attached)))
+            if len(pending) >= window:
+                yield chunk_outputs(executor, key, system, holders, *pending.popleft())
+        while pending:
+            yield chunk_outputs(executor, key, system, holders, *pending.popleft())
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def iter_array_chunks(matrix, chunk_size):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    for start in range(0, len(matrix), chunk_size):
+        yield matrix[start:start + chunk_size]
+
+
+def iter_csv_chunks(stream, input_names, chunk_size):
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    columns = None
+    rows = []
+
+    for record in csv.reader(text):
+        if not record or record[0].lstrip().startswith("#"):
+            continue
+
+        if columns is None:
+            try:
+                [float(value) for value in record]
+                columns = list(range(len(record)))
+            except ValueError:
+                header = [name.strip() for name in record]
+                missing = [name for name in input_names if name not in header]
+                if missing:
+                    raise ValueError(f"CSV header is missing input columns: {', '.join(missing)}")
+                columns = [header.index(name) for name in input_names]
+                continue
+
+        rows.append([float(record[idx]) for idx in columns])
+        if len(rows) >= chunk_size:
+            yield np.asarray(rows, dtype=np.float64)
+            rows = []
+
+    if rows:
+        yield np.asarray(rows, dtype=np.float64)
+
+
+def _read_exact(stream, size):
+    data = bytearray()
+    while len(data) < size:
+        block = stream.read(size - len(data))
+        if not block:
+            break
+        data.extend(block)
+    return bytes(data)
+
+
+def iter_npy_chunks(stream, chunk_size):
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+
+    if fortran_order or dtype.hasobject or len(shape) not in (1, 2):
+        raise ValueError("NPY input must be a C-ordered numeric array with one row per input vector")
+
+    rows = shape[0]
+    columns = shape[1] if len(shape) == 2 else 1
+    row_bytes = columns * dtype.itemsize
+
+    for start in range(0, rows, chunk_size):
+        count = min(chunk_size, rows - start)
+        data = _read_exact(stream, count * row_bytes)
+        if len(data) != count * row_bytes:
+            raise ValueError("NPY input ended before the declared number of rows")
+        yield np.frombuffer(data, dtype=dtype).reshape(count, columns).astype(np.float64)
+
+
+def iter_ndjson_chunks(stream, chunk_size):
+    rows = []
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        rows.append(json.loads(line))
+        if len(rows) >= chunk_size:
+            yield np.asarray(rows, dtype=np.float64)
+            rows = []
+
+    if rows:
+        yield np.asarray(rows, dtype=np.float64)
+
+
+def format_csv_rows(outputs):
+    buffer = io.StringIO()
+    np.savetxt(buffer, outputs, delimiter=",", fmt="%.17g")
+    return buffer.getvalue()
+
+
+def format_ndjson_rows(outputs):
+    return "".join(json.dumps(row) + "\n" for row in outputs.tolist())
+
+
+def run_batch(system, chunks, executor=None, window=4, output="ndjson", workers=None):
+    start = time.perf_counter()
+    rows = 0
+
+    if output == "csv":
+        yield ",".join(system.output_names) + "\n"
+
+    try:
+        for outputs in iter_batch_outputs(system, chunks, executor, window, workers):
+            rows += len(outputs)
+            yield format_csv_rows(outputs) if output == "csv" else format_ndjson_rows(outputs)
+    except Exception as e:
+        yield f"# error: {e}\n" if output == "csv" else json.dumps({"error": str(e)}) + "\n"
+        return
+
+    seconds = time.perf_counter() - start
+    summary = {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds > 0 else 0.0}
+    BATCH_INFERENCE_ROWS.inc(amount=rows)
+    BATCH_INFERENCE_DURATION.observe(seconds)
+
+    if output == "csv":
+        yield f"# rows={rows},seconds={seconds:.6f},rows_per_second={summary['rows_per_second']:.1f}\n"
+    else:
+        yield json.dumps({"summary": summary}) + "\n"
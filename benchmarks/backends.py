@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from API_list import FuzzySystemDatabase, FuzzySystemParser, Get_List, Get_page, Delete_one_data
+from connection_pool import get_pool
+
+# The two stores the benchmarks run against. PostgresBackend is the real storage layer on a scratch database;
+# StandInBackend keeps systems in memory in the shape Get_system returns, so parsing, rendering and the HTTP
+# stack can be measured without PostgreSQL and compared against the real thing.
+
+DEFAULT_DB = ["knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432"]
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--backend", choices=["postgres", "standin"], default="postgres")
+    parser.add_argument("--db", nargs=5, metavar=("NAME", "USER", "PASSWORD", "HOST", "PORT"), default=DEFAULT_DB,
+                        help="a scratch database with the knowledge base schema; benchmark systems are removed afterwards")
+
+
+def open_backend(args):
+    return StandInBackend() if args.backend == "standin" else PostgresBackend(args.db)
+
+
+class PostgresBackend:
+    name = "postgres"
+
+    def __init__(self, db_config):
+        self.db_config = tuple(db_config)
+        self.db = FuzzySystemDatabase(*self.db_config)
+
+    def ingest(self, path):
+        return FuzzySystemParser(path).Put_fml_file(*self.db_config, bulk=True)
+
+    def list(self):
+        return Get_List(*self.db_config)
+
+    def page(self, limit=100, prefix=None):
+        return Get_page(*self.db_config, limit=limit, prefix=prefix)
+
+    def delete(self, system_name):
+        return Delete_one_data(*self.db_config, system_name)
+
+    def close(self):
+        get_pool(*self.db_config).close()
+
+
+def term_document(term):
+    params = [float(value) if value is not None else None for value in term["params"]]
+    return {"term_name": term["name"], "complement": term["complement"], "param1": params[0], "param2": params[1],
+            "param3": params[2], "param4": params[3], "shape": term["shape"]}
+
+
+def variable_document(variable):
+    return {"variable_name": variable["name"], "domain_left": variable["domain_left"], "domain_right": variable["domain_right"],
+            "scale": variable["scale"], "default_value": variable["default_value"], "accumulation": variable["accumulation"],
+            "defuzzifier": variable["defuzzifier"], "type": variable["type"],
+            "terms": [term_document(term) for term in variable["terms"]]}
+
+
+def rule_document(rule):
+    return {"rule_name": rule["name"], "connector": rule["connector"], "rule_or_method": rule["orMethod"],
+            "rule_and_method": rule["andMethod"], "weight": rule["weight"],
+            "antecedent_terms": rule["antecedent terms"], "antecedent_variables": rule["antecedent variables"],
+            "antecedent_modifiers": rule["antecedent modifiers"] or [None],
+            "consequent_terms": rule["consequent terms"], "consequent_variables": rule["consequent variables"]}
+
+
+def system_document(system_name, network_address, fml_items):
+    # Builds what Get_system would return for the same document after a round trip through PostgreSQL.
+    knowledge_base = {"system_name": system_name, "network_address": network_address, "variables": []}
+    rule_base = {"mrb_name": "", "and_method": "", "or_method": "", "activation_method": "", "rules": []}
+    seen_rule_base = False
+
+    for kind, item in fml_items:
+        if kind == 'variable':
+            knowledge_base["variables"].append(variable_document(item))
+        elif kind == 'mrb' and not seen_rule_base:
+            seen_rule_base = True
+            rule_base.update(mrb_name=item["name"], and_method=item["andMethod"], or_method=item["orMethod"],
+                             activation_method=item["activationMethod"])
+        elif kind == 'rule' and seen_rule_base:
+            rule_base["rules"].append(rule_document(item))
+
+    return [knowledge_base, rule_base]
+
+
+class StandInDatabase(FuzzySystemDatabase):
+    # Rendering (Create_fuzzy_system_xml, Get_file) is inherited unchanged; only the reads are served from memory.
+    def __init__(self, backend):
+        super().__init__(None, None, None, None, None)
+        self.backend = backend
+
+    def Get_system(self, system_name):
+        with self.backend.lock:
+            return self.backend.systems.get(system_name)
+
+    def Get_systems(self, system_names):
+        with self.backend.lock:
+            return {name: self.backend.systems[name] for name in system_names if name in self.backend.systems}
+
+    def Iter_systems(self, names=None, prefix=None, itersize=100):
+        with self.backend.lock:
+            systems = sorted(self.backend.systems.items())
+        for system_name, data in systems:
+            if (names is None or system_name in names) and (not prefix or system_name.startswith(prefix)):
+                yield system_name, data
+
+
+class StandInParser(FuzzySystemParser):
+    backend = None
+
+    def insert_into_db(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, system_name, network_address, fml_items, bulk=False, batch_size=1000,
+                       optimize=False):
+        self.backend.store(system_name, system_document(system_name, network_address, fml_items))
+        return None
+
+
+class StandInBackend:
+    name = "standin"
+
+    def __init__(self):
+        self.systems = {}
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.db = StandInDatabase(self)
+
+    def store(self, system_name, data):
+        with self.lock:
+            self.systems[system_name] = data
+            self.seq += 1
+
+    def ingest(self, path):
+        parser = StandInParser(path)
+        parser.backend = self
+        return parser.Put_fml_file(*DEFAULT_DB)
+
+    def list(self):
+        with self.lock:
+            return list(self.systems)
+
+    def page(self, limit=100, prefix=None):
+        names = sorted(name for name in self.list() if not prefix or name.startswith(prefix))
+        page = {"systems": names[:limit], "next_cursor": None}
+        if len(names) > limit:
+            page["next_cursor"] = names[limit - 1]
+        return page
+
+    def delete(self, system_name):
+        with self.lock:
+            if self.systems.pop(system_name, None) is not None:
+                self.seq += 1
+        return True
+
+    def delete_all(self):
+        with self.lock:
+            self.systems.clear()
+            self.seq += 1
+        return True
+
+    def close(self):
+        pass
+
+    def install(self, service):
+        # Points knowledgeBase_service at this store, for the in-process HTTP benchmark only. The DB
+        # config arguments the routes pass along are ignored.
+        parser_class = type("ServiceStandInParser", (StandInParser,), {"backend": self})
+        service.db = self.db
+        service.FuzzySystemParser = parser_class
+        service.Get_List = lambda *config: self.list()
+        service.Get_change_seq = lambda *config: self.seq
+        service.Delete_one_data = lambda *config: self.delete(config[-1])
+        service.Delete_all_data = lambda *config: self.delete_all()
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import compile_system
+from batch_inference import iter_array_chunks, iter_batch_outputs
+from benchmarks.results import summarize, environment, public_config, save_results
+
+
+def synthetic_system(inputs, terms, rules, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def variable(name, var_type):
+        centres = np.linspace(0.0, 1.0, terms)
+        width = 1.0 / max(terms - 1, 1)
+        return {
+            "variable_name": name,
+            "domain_left": 0.0,
+            "domain_right": 1.0,
+            "default_value": 0.0,
+            "accumulation": "MAX",
+            "defuzzifier": "COG",
+            "type": var_type,
+            "terms": [{
+                "term_name": f"t{t}",
+                "complement": False,
+                "param1": float(centre - width),
+                "param2": float(centre),
+                "param3": float(centre + width),
+                "param4": None,
+                "shape": "triangularShape"
+            } for t, centre in enumerate(centres)]
+        }
+
+    variables = [variable(f"x{i}", "input") for i in range(inputs)] + [variable("y", "output")]
+    rule_list = []
+    for r in range(rules):
+        clause_vars = rng.choice(inputs, size=min(2, inputs), replace=False)
+        rule_list.append({
+            "rule_name": f"r{r}",
+            "connector": "and",
+            "rule_or_method": "MAX",
+            "rule_and_method": None,
+            "weight": 1.0,
+            "antecedent_variables": [f"x{v}" for v in clause_vars],
+            "antecedent_terms": [f"t{rng.integers(terms)}" for _ in clause_vars],
+            "antecedent_modifiers": [None for _ in clause_vars],
+            "consequent_variables": ["y"],
+            "consequent_terms": [f"t{rng.integers(terms)}"]
+        })
+
+    return [
+        {"system_name": "bench", "network_address": "", "variables": variables},
+        {"mrb_name": "rb", "and_method": "MIN", "or_method": "MAX", "activation_method": "MIN", "rules": rule_list}
+    ]
+
+
+def measure(system, X, chunk_size, workers, repeat):
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    samples = []
+    try:
+        if executor is not None:
+            list(executor.map(abs, range(workers)))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = 0
+            for outputs in iter_batch_outputs(system, iter_array_chunks(X, chunk_size), executor, window=2 * max(workers, 1), workers=workers):
+                rows += len(outputs)
+            samples.append(time.perf_counter() - start)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    seconds = summarize(samples)
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds["p50"]}
+
+
+def run(args):
+    data = synthetic_system(args.inputs, args.terms, args.rules)
+    X = np.random.default_rng(1).uniform(0.0, 1.0, (args.rows, args.inputs))
+    results = {"benchmark": "batch_inference", "environment": environment(), "config": public_config(args), "engines": {}}
+
+    # Keyed rather than listed, so compare.py can match every run with the same run in another file.
+    for engine in args.engines:
+        system = compile_system(data, sparse=(engine == "sparse"))
+        results["engines"][engine] = {
+            f"workers_{workers}": {f"chunk_{chunk_size}": measure(system, X, chunk_size, workers, args.repeat) for chunk_size in args.chunk_sizes}
+            for workers in args.workers
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch inference throughput")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--inputs", type=int, default=3)
+    parser.add_argument("--terms", type=int, default=5)
+    parser.add_argument("--rules", type=int, default=125)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--engines", nargs="+", choices=["dense", "sparse"], default=["dense", "sparse"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    save_results(args.output, run(args))
+
+
+if __name__ == "__main__":
+    main()
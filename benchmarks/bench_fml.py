@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from API_list import FuzzySystemParser
+from benchmarks.backends import add_backend_arguments, open_backend
+from benchmarks.fml_generator import add_size_arguments, size_arguments, write_synthetic_fml, write_corpus
+from benchmarks.results import summarize, environment, public_config, save_results
+
+
+def measure(call, repeat, warmup=1, setup=None, teardown=None):
+    # setup runs before every call and its result is passed in; neither setup nor teardown is timed.
+    samples = []
+    for i in range(warmup + repeat):
+        argument = setup(i) if setup is not None else None
+        start = time.perf_counter()
+        result = call(argument) if setup is not None else call()
+        seconds = time.perf_counter() - start
+        if teardown is not None:
+            teardown(result)
+        if i >= warmup:
+            samples.append(seconds)
+    return {"seconds": summarize(samples)}
+
+
+def run(args):
+    backend = open_backend(args)
+    sizes = size_arguments(args)
+    prefix = f"bench_fml_{os.getpid()}_"
+    results = {"benchmark": "fml", "environment": environment(), "config": public_config(args), "cases": {}}
+    cases = results["cases"]
+    stored = []
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "document.xml")
+            write_synthetic_fml(path, f"{prefix}document", **sizes)
+            results["document_bytes"] = os.path.getsize(path)
+
+            cases["parse"] = measure(lambda: sum(1 for _ in FuzzySystemParser(path).iter_fml()), args.repeat)
+
+            def ingest_setup(i):
+                ingest_path = os.path.join(directory, f"ingest_{i}.xml")
+                write_synthetic_fml(ingest_path, f"{prefix}ingest_{i}", **sizes)
+                return ingest_path
+
+            cases["ingest"] = measure(backend.ingest, args.repeat, setup=ingest_setup, teardown=backend.delete)
+
+            corpus = write_corpus(directory, args.systems, prefix, **sizes)
+            for system_name, corpus_path in corpus.items():
+                backend.ingest(corpus_path)
+                stored.append(system_name)
+
+        names = list(corpus)
+        data = backend.db.Get_system(names[0])
+        cases["render"] = measure(lambda: backend.db.Create_fuzzy_system_xml(data), args.repeat)
+        cases["get_system"] = measure(lambda: backend.db.Get_system(names[0]), args.repeat)
+        cases["get_file"] = measure(lambda: backend.db.Get_file(names[0]), args.repeat)
+        cases["get_systems"] = measure(lambda: backend.db.Get_systems(names), args.repeat)
+        cases["iter_systems"] = measure(lambda: sum(1 for _ in backend.db.Iter_systems(prefix=prefix)), args.repeat)
+        cases["get_list"] = measure(backend.list, args.repeat)
+        cases["get_page"] = measure(lambda: backend.page(limit=args.page_size, prefix=prefix), args.repeat)
+    finally:
+        for system_name in stored:
+            backend.delete(system_name)
+        backend.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for FML parsing, ingest, rendering and retrieval")
+    add_backend_arguments(parser)
+    add_size_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--systems", type=int, default=20, help="systems stored for the retrieval queries")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    save_results(args.output, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+from fml_client import FmlClient
+from benchmarks.backends import add_backend_arguments, StandInBackend
+from benchmarks.fml_generator import add_size_arguments, size_arguments, write_corpus
+from benchmarks.results import summarize, environment, public_config, save_results
+
+# Load harness for the five FML routes. Each phase runs a fixed list of requests over `concurrency`
+# keep-alive connections and reports throughput and latency percentiles for that route.
+
+EXPECTED_STATUS = {
+    "put_fml_file": (201,),
+    "get_systems_list": (200, 204),
+    "get_fml_file": (200,),
+    "delete_one_system": (200,),
+    "delete_systems_list": (200,),
+}
+
+
+def start_service(args):
+    import knowledgeBase_service as service
+
+    if args.backend == "standin":
+        StandInBackend().install(service)
+    else:
+        service.DB_CONFIG = tuple(args.db)
+        service.db = service.FuzzySystemDatabase(*args.db)
+        service.prepare_database()
+
+    server = make_server("127.0.0.1", 0, service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    return server
+
+
+def run_phase(host, port, route, calls, concurrency):
+    work = queue.Queue()
+    for call in calls:
+        work.put(call)
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker():
+        client = FmlClient(host, port)
+        try:
+            while True:
+                try:
+                    call = work.get_nowait()
+                except queue.Empty:
+                    return
+                start = time.perf_counter()
+                try:
+                    status = call(client).status
+                except Exception as e:
+                    status = type(e).__name__
+                seconds = time.perf_counter() - start
+                with lock:
+                    latencies.append(seconds)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(concurrency, len(calls)) or 1)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    return phase_result(route, latencies, statuses, seconds)
+
+
+def phase_result(route, latencies, statuses, seconds):
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) not in EXPECTED_STATUS[route])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": seconds,
+        "requests_per_second": len(latencies) / seconds if seconds else None,
+        "latency_seconds": summarize(latencies),
+    }
+
+
+def run(args):
+    server = None
+    if args.url:
+        host, _, port = args.url.rpartition(":")
+        host, port = host or "127.0.0.1", int(port)
+    else:
+        server = start_service(args)
+        host, port = "127.0.0.1", server.server_port
+
+    prefix = f"bench_http_{os.getpid()}_"
+    results = {"benchmark": "http", "environment": environment(), "config": public_config(args),
+               "target": args.url or f"in-process ({args.backend})", "routes": {}}
+    routes = results["routes"]
+    uploaded = []
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            corpus = write_corpus(directory, args.systems, prefix, **size_arguments(args))
+            names = uploaded = list(corpus)
+
+            routes["put_fml_file"] = run_phase(host, port, "put_fml_file",
+                                               [lambda client, path=path: client.put_fml_file(path) for path in corpus.values()],
+                                               args.concurrency)
+
+            warmup = [lambda client: client.get_systems_list()] * args.warmup
+            run_phase(host, port, "get_systems_list", warmup, args.concurrency)
+            routes["get_systems_list"] = run_phase(host, port, "get_systems_list",
+                                                   [lambda client: client.get_systems_list()] * args.requests, args.concurrency)
+
+            documents = [lambda client, name=name: client.get_fml_file(name) for name in itertools.islice(itertools.cycle(names), args.requests)]
+            run_phase(host, port, "get_fml_file", documents[:args.warmup], args.concurrency)
+            routes["get_fml_file"] = run_phase(host, port, "get_fml_file", documents, args.concurrency)
+
+            routes["delete_one_system"] = run_phase(host, port, "delete_one_system",
+                                                    [lambda client, name=name: client.delete_one_system(name) for name in names],
+                                                    args.concurrency)
+            uploaded = []
+
+            if (args.backend == "standin" and not args.url) or args.allow_delete_all:
+                routes["delete_systems_list"] = run_delete_all(host, port, list(corpus.values())[:2], args.delete_all_rounds)
+            else:
+                routes["delete_systems_list"] = {"skipped": "deletes every system; pass --allow-delete-all on a scratch database"}
+    finally:
+        if uploaded:
+            client = FmlClient(host, port)
+            for name in uploaded:
+                client.delete_one_system(name)
+            client.close()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    return results
+
+
+def run_delete_all(host, port, paths, rounds):
+    # Every round stores a couple of systems untimed, then times the one request that removes them.
+    client = FmlClient(host, port)
+    latencies = []
+    statuses = {}
+    try:
+        for _ in range(rounds):
+            for path in paths:
+                client.put_fml_file(path)
+            start = time.perf_counter()
+            status = str(client.delete_systems_list().status)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        client.close()
+
+    return phase_result("delete_systems_list", latencies, statuses, sum(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test for the FML routes")
+    parser.add_argument("--url", help="host:port of a running service; without it the Flask service is started in-process")
+    add_backend_arguments(parser)
+    add_size_arguments(parser)
+    parser.add_argument("--systems", type=int, default=50, help="documents uploaded, read and deleted")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per read route")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delete-all-rounds", type=int, default=20)
+    parser.add_argument("--allow-delete-all", action="store_true", help="also time /delete_systems_list against a real database")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    save_results(args.output, run(args))
+
+
+if __name__ == "__main__":
+    main()
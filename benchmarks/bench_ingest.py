@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from API_list import FuzzySystemParser, Delete_one_data
+from benchmarks.backends import DEFAULT_DB
+from benchmarks.bench_fml import measure
+from benchmarks.fml_generator import add_size_arguments, size_arguments, write_synthetic_fml
+from benchmarks.results import environment, public_config, save_results
+
+
+def run(args):
+    db_config = tuple(args.db)
+    sizes = size_arguments(args)
+    prefix = f"bench_ingest_{os.getpid()}_"
+    results = {"benchmark": "ingest", "environment": environment(), "config": public_config(args), "cases": {}}
+    cases = results["cases"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "parse_only.xml")
+        write_synthetic_fml(path, f"{prefix}parse_only", **sizes)
+        results["document_bytes"] = os.path.getsize(path)
+        cases["parse_only"] = measure(lambda: sum(1 for _ in FuzzySystemParser(path).iter_fml()), args.repeat, warmup=0)
+
+        for mode in ("row_by_row", "bulk"):
+            def setup(i, mode=mode):
+                ingest_path = os.path.join(directory, f"{mode}_{i}.xml")
+                write_synthetic_fml(ingest_path, f"{prefix}{mode}_{i}", **sizes)
+                return ingest_path
+
+            def ingest(ingest_path, mode=mode):
+                return FuzzySystemParser(ingest_path).Put_fml_file(*db_config, bulk=(mode == "bulk"), batch_size=args.batch_size)
+
+            cases[mode] = measure(ingest, args.repeat, warmup=0, setup=setup,
+                                  teardown=lambda system_name: Delete_one_data(*db_config, system_name))
+
+    parse, row_by_row, bulk = (cases[name]["seconds"]["p50"] for name in ("parse_only", "row_by_row", "bulk"))
+    results["speedup"] = row_by_row / bulk
+    results["db_speedup"] = (row_by_row - parse) / max(bulk - parse, 1e-9)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare row-by-row and bulk FML ingestion")
+    parser.add_argument("--db", nargs=5, metavar=("NAME", "USER", "PASSWORD", "HOST", "PORT"), default=DEFAULT_DB)
+    add_size_arguments(parser, variables=50, terms=5, rules=50000, shapes=1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    save_results(args.output, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.results import load_results
+
+# Compares two result files written by the benchmarks and exits with status 1 when a timing got slower
+# or a throughput got lower by more than the threshold.
+
+TIMING_KEYS = ("min", "mean", "p50", "p95", "p99", "max")
+
+
+def flatten(results, path=()):
+    if isinstance(results, dict):
+        for key, value in results.items():
+            if key not in ("environment", "config"):
+                yield from flatten(value, path + (key,))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        yield path, results
+
+
+def direction(path):
+    # +1 when a larger value is better, -1 when a smaller one is, None for counts and sizes.
+    if path[-1].endswith("per_second"):
+        return 1
+    if path[-1] in TIMING_KEYS or path[-1] == "seconds":
+        return -1
+    return None
+
+
+def compare(baseline, current, threshold):
+    baseline_values = dict(flatten(baseline))
+    rows = []
+    for path, value in flatten(current):
+        better = direction(path)
+        previous = baseline_values.get(path)
+        if better is None or not previous:
+            continue
+        change = (value - previous) / previous
+        regressed = change * better < -threshold
+        rows.append(("/".join(path), previous, value, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change treated as a regression")
+    parser.add_argument("--all", action="store_true", help="list unchanged metrics as well")
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.current), args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, previous, value, change, regressed in rows:
+        if args.all or regressed or abs(change) > args.threshold:
+            print(f"{name:<{width}}  {previous:>14.6g}  {value:>14.6g}  {change:+8.1%}  {'REGRESSION' if regressed else ''}")
+
+    regressions = sum(1 for row in rows if row[4])
+    print(f"{len(rows)} metrics compared, {regressions} regressions over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
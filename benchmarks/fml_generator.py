@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from API_list import FUZZY_TERM_SHAPES
+
+# Synthetic FML documents of a chosen size. The output is deterministic, so runs with the same arguments
+# parse, store and render exactly the same document.
+
+SHAPE_NAMES = tuple(FUZZY_TERM_SHAPES)
+
+
+def shape_params(shape, centre, width):
+    if shape == 'triangularShape':
+        return centre - width, centre, centre + width
+    if shape == 'trapezoidShape':
+        return centre - width, centre - width / 2, centre + width / 2, centre + width
+    if shape == 'piShape':
+        return centre - width, centre + width
+    if shape == 'leftLinearShape':
+        return centre, centre + width
+    return centre, width / 2
+
+
+def write_synthetic_fml(path, system_name, variables, terms, rules, shapes=1, outputs=1, clauses=2):
+    # The last `outputs` variables are outputs; every rule reads `clauses` inputs and sets the first output.
+    if not 1 <= shapes <= len(SHAPE_NAMES):
+        raise ValueError(f"shapes must be between 1 and {len(SHAPE_NAMES)}")
+    if not 1 <= outputs < variables:
+        raise ValueError("there must be at least one input and one output variable")
+
+    inputs = variables - outputs
+    width = 1.0 / max(terms - 1, 1)
+
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f'<fuzzySystem name="{system_name}" networkAddress="127.0.0.1"><knowledgeBase>')
+        for v in range(variables):
+            var_type = "output" if v >= inputs else "input"
+            file.write(f'<fuzzyVariable name="v{v}" domainleft="0.0" domainright="1.0" scale="" '
+                       f'defaultValue="0.0" accumulation="MAX" defuzzifier="COG" type="{var_type}">')
+            for t in range(terms):
+                shape = SHAPE_NAMES[(v + t) % shapes]
+                params = shape_params(shape, t * width, width)
+                attributes = " ".join(f'{name}="{value}"' for name, value in zip(FUZZY_TERM_SHAPES[shape], params))
+                file.write(f'<fuzzyTerm name="t{t}" complement="false"><{shape} {attributes}/></fuzzyTerm>')
+            file.write('</fuzzyVariable>')
+        file.write('</knowledgeBase><mamdaniRuleBase name="rb" andMethod="MIN" orMethod="MAX" activationMethod="MIN">')
+        for r in range(rules):
+            file.write(f'<rule name="r{r}" connector="and" orMethod="MAX" weight="1.0"><antecedent>')
+            for c in range(min(clauses, inputs)):
+                file.write(f'<clause><variable>v{(r + c) % inputs}</variable><term>t{(r // (c + 1)) % terms}</term></clause>')
+            file.write(f'</antecedent><consequent><then><clause><variable>v{inputs}</variable>'
+                       f'<term>t{(r // 3) % terms}</term></clause></then></consequent></rule>')
+        file.write('</mamdaniRuleBase></fuzzySystem>')
+
+
+def write_corpus(directory, count, prefix, **sizes):
+    paths = {}
+    for i in range(count):
+        system_name = f"{prefix}{i}"
+        path = os.path.join(directory, f"{system_name}.xml")
+        write_synthetic_fml(path, system_name, **sizes)
+        paths[system_name] = path
+    return paths
+
+
+def add_size_arguments(parser, variables=10, terms=5, rules=200, shapes=3):
+    parser.add_argument("--variables", type=int, default=variables)
+    parser.add_argument("--terms", type=int, default=terms)
+    parser.add_argument("--rules", type=int, default=rules)
+    parser.add_argument("--shapes", type=int, default=shapes, help=f"distinct term shapes to cycle through, 1-{len(SHAPE_NAMES)}")
+    parser.add_argument("--outputs", type=int, default=1)
+    parser.add_argument("--clauses", type=int, default=2, help="antecedent clauses per rule")
+
+
+def size_arguments(args):
+    return {"variables": args.variables, "terms": args.terms, "rules": args.rules, "shapes": args.shapes,
+            "outputs": args.outputs, "clauses": args.clauses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic FML documents")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--prefix", default="synthetic_")
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for path in write_corpus(args.directory, args.count, args.prefix, **size_arguments(args)).values():
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
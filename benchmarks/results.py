@@ -0,0 +1,68 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list.
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "min": ordered[0],
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def public_config(args):
+    # Everything needed to rerun the benchmark, minus the database password.
+    config = dict(vars(args))
+    if config.get("db"):
+        config["db"] = [value if i != 2 else "***" for i, value in enumerate(config["db"])]
+    config.pop("output", None)
+    return config
+
+
+def save_results(path, results):
+    text = json.dumps(results, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+    print(text)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_etag(document):
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()[:32]
+
+
+class LruCache:
+    def __init__(self, max_entries=256, max_bytes=None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def sizeof(self, value):
+        return 0
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation=None):
+        size = self.sizeof(value)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return value
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class RenderedFmlCache(LruCache):
+    def sizeof(self, entry):
+        return len(entry[0])
+
+    def put(self, system_name, document, generation=None):
+        return super().put(system_name, (document, content_etag(document)), generation)
+
+
+class CompiledSystemCache(LruCache):
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        super().__init__(max_entries, max_bytes)
+
+    def sizeof(self, system):
+        return system.nbytes
+
+
+class ControlSurfaceCache(LruCache):
+    def __init__(self, max_entries=256, max_bytes=256 * 1024 * 1024):
+        super().__init__(max_entries, max_bytes)
+
+    def sizeof(self, surface):
+        return surface.nbytes
@@ -0,0 +1,240 @@
+import asyncio
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from API_list import CHANGE_CHANNEL
+from service_formats import sse_event
+
+
+class ChangeListener:
+    # One LISTEN connection per process. Request threads block in wait() until the change log moves past the
+    # sequence number they have already seen; without a live connection they wake every second and poll.
+    def __init__(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, reconnect_delay=5.0):
+        self.DB_NAME = DB_NAME
+        self.DB_USER = DB_USER
+        self.DB_PASSWORD = DB_PASSWORD
+        self.DB_HOST = DB_HOST
+        self.DB_PORT = DB_PORT
+        self.reconnect_delay = reconnect_delay
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.connected = False
+        self.connections = 0
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+            self.thread.start()
+        return self
+
+    def _announce(self, seq, connected=True):
+        with self.condition:
+            self.seq = max(self.seq, seq)
+            self.connected = connected
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(
+                    dbname=self.DB_NAME,
+                    user=self.DB_USER,
+                    password=self.DB_PASSWORD,
+                    host=self.DB_HOST,
+                    port=self.DB_PORT
+                )
+                connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANGE_CHANNEL};")
+                with self.condition:
+                    self.connections += 1
+                self._announce(0)
+
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    seq = 0
+                    while connection.notifies:
+                        seq = max(seq, int(connection.notifies.pop(0).payload))
+                    if seq:
+                        self._announce(seq)
+
+            except Exception as e:
+                print(f"Change listener error: {e}")
+                self._announce(0, connected=False)
+                time.sleep(self.reconnect_delay)
+
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def wait(self, after, timeout):
+        with self.condition:
+            if not self.connected:
+                timeout = min(timeout, 1.0)
+            return self.condition.wait_for(lambda: self.seq > after, timeout=timeout)
+
+
+class ChangeFollower:
+    # A process's position in the change log and what a page of it does to the caches; follow_changes and
+    # follow_changes_async only differ in how they wait and fetch.
+    def __init__(self, listener, on_change, on_reset):
+        self.listener = listener
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.after = None
+        self.connections = 1
+
+    def reconnected(self):
+        # Notifications sent while the listener was reconnecting are lost, so nothing cached can be trusted.
+        if self.listener.connections <= self.connections:
+            return False
+        self.connections = self.listener.connections
+        return True
+
+    def reset(self, after):
+        # `after` is read before the caches are dropped, so a change committed in between is still replayed.
+        self.on_reset()
+        self.after = after
+
+    def apply(self, page):
+        if page["reset"]:
+            self.on_reset()
+        for change in page["changes"]:
+            self.on_change(change)
+        self.after = page["last"]
+
+
+def catch_up(follower, get_changes):
+    # Replays the log from follower.after to its current end, e.g. over a compiled store before a process serves
+    # from it. A log trimmed past that point resets the follower, which drops the store.
+    while True:
+        page = get_changes(follower.after)
+        follower.apply(page)
+        if not page["changes"]:
+            return follower.after
+
+
+async def catch_up_async(follower, get_changes):
+    while True:
+        page = await get_changes(follower.after)
+        follower.apply(page)
+        if not page["changes"]:
+            return follower.after
+
+
+def follow_changes(follower, get_changes, current_seq, poll_interval=30.0):
+    # Applies every logged change to this process's caches, whichever process made it; under the pre-fork
+    # server that is how a write handled by one worker reaches the others.
+    while True:
+        try:
+            if follower.after is None:
+                follower.after = current_seq()
+            elif follower.reconnected():
+                follower.reset(current_seq())
+
+            follower.listener.wait(follower.after, poll_interval)
+            follower.apply(get_changes(follower.after))
+
+        except Exception as e:
+            print(f"Change follower error: {e}")
+            time.sleep(follower.listener.reconnect_delay)
+
+
+async def follow_changes_async(follower, get_changes, current_seq, poll_interval=30.0):
+    while True:
+        try:
+            if follower.after is None:
+                follower.after = await current_seq()
+            elif follower.reconnected():
+                follower.reset(await current_seq())
+
+            await follower.listener.wait(follower.after, poll_interval)
+            follower.apply(await get_changes(follower.after))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Change follower error: {e}")
+            await asyncio.sleep(follower.listener.reconnect_delay)
+
+
+def wait_for_changes(listener, get_changes, after, timeout):
+    page = get_changes(after)
+    deadline = time.monotonic() + timeout
+
+    while not page["changes"] and not page["reset"]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        listener.wait(after, remaining)
+        page = get_changes(after)
+
+    return page
+
+
+async def wait_for_changes_async(listener, get_changes, after, timeout):
+    page = await get_changes(after)
+    deadline = time.monotonic() + timeout
+
+    while not page["changes"] and not page["reset"]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await listener.wait(after, remaining)
+        page = await get_changes(after)
+
+    return page
+
+
+def page_events(page):
+    events = [sse_event("reset", {"last": page["last"]})] if page["reset"] else []
+    events.extend(sse_event("change", change, change["seq"]) for change in page["changes"])
+    return events
+
+
+def change_events(listener, get_changes, after, heartbeat=15.0, max_seconds=300.0):
+    # Ends after max_seconds so a draining worker is not held open; EventSource clients reconnect with Last-Event-ID.
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield sse_event("hello", {"last": after}, retry=3000)
+
+    while time.monotonic() < deadline:
+        page = get_changes(after)
+        if page["changes"] or page["reset"]:
+            yield from page_events(page)
+            after = page["last"]
+            last_sent = time.monotonic()
+            continue
+
+        listener.wait(after, max(0.0, min(heartbeat, deadline - time.monotonic())))
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+
+
+async def change_events_async(listener, get_changes, after, heartbeat=15.0, max_seconds=300.0):
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield sse_event("hello", {"last": after}, retry=3000)
+
+    while time.monotonic() < deadline:
+        page = await get_changes(after)
+        if page["changes"] or page["reset"]:
+            for event in page_events(page):
+                yield event
+            after = page["last"]
+            last_sent = time.monotonic()
+            continue
+
+        await listener.wait(after, max(0.0, min(heartbeat, deadline - time.monotonic())))
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
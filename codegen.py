@@ -0,0 +1,156 @@
+import inspect
+import re
+
+import numpy as np
+
+import inference
+
+HELPERS = (
+    inference._rise,
+    inference._fall,
+    inference._gaussian,
+    inference._pi,
+    inference.membership,
+    inference.apply_modifiers,
+    inference.combine_clauses,
+    inference.accumulate,
+    inference.defuzzify,
+)
+
+CONSTANTS = (
+    "input_defaults",
+    "in_term_var",
+    "in_term_shape",
+    "in_term_params",
+    "in_term_complement",
+    "rule_operator",
+    "rule_weight",
+    "rule_clause_start",
+    "rule_clause_count",
+    "clause_term",
+    "clause_modifier",
+    "operator_blocks",
+    "cons_rule",
+    "slot_cons_start",
+    "slot_cons_count",
+    "slot_term",
+    "output_slot_range",
+    "out_term_curves",
+    "output_universe",
+    "output_accumulation",
+    "output_defuzzifier",
+    "output_default",
+    "activation",
+)
+
+PREDICT_SOURCE = '''
+def input_matrix(batch):
+    if isinstance(batch, dict):
+        unknown = set(batch) - set(INPUT_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown input variables: {', '.join(sorted(unknown))}")
+        columns = [np.atleast_1d(np.asarray(batch.get(name, default), dtype=np.float64)) for name, default in zip(INPUT_NAMES, INPUT_DEFAULTS)]
+        rows = max(len(column) for column in columns)
+        return np.stack([np.broadcast_to(column, (rows,)) for column in columns], axis=1)
+
+    matrix = np.asarray(batch, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    if matrix.ndim != 2 or matrix.shape[1] != len(INPUT_NAMES):
+        raise ValueError(f"Expected rows of {len(INPUT_NAMES)} inputs ({', '.join(INPUT_NAMES)})")
+    return matrix
+
+
+def firing_strengths(X):
+    mu = membership(X[:, IN_TERM_VAR], IN_TERM_SHAPE, IN_TERM_PARAMS, IN_TERM_COMPLEMENT)
+    clauses = apply_modifiers(mu[:, CLAUSE_TERM], CLAUSE_MODIFIER)
+
+    firing = np.ones((X.shape[0], len(RULE_OPERATOR)), dtype=np.float64)
+    for operator, rule_start, rule_stop in OPERATOR_BLOCKS:
+        if operator == RULE_ALWAYS:
+            continue
+        clause_start = RULE_CLAUSE_START[rule_start]
+        clause_stop = RULE_CLAUSE_START[rule_stop - 1] + RULE_CLAUSE_COUNT[rule_stop - 1]
+        firing[:, rule_start:rule_stop] = combine_clauses(
+            operator,
+            clauses[:, clause_start:clause_stop],
+            RULE_CLAUSE_START[rule_start:rule_stop] - clause_start,
+            RULE_CLAUSE_COUNT[rule_start:rule_stop]
+        )
+
+    return firing * RULE_WEIGHT
+
+
+def predict(batch):
+    X = input_matrix(batch)
+    firing = firing_strengths(X)
+    outputs = np.empty((X.shape[0], len(OUTPUT_NAMES)), dtype=np.float64)
+
+    for o in range(len(OUTPUT_NAMES)):
+        slot_start, slot_stop = OUTPUT_SLOT_RANGE[o]
+        if slot_start == slot_stop:
+            outputs[:, o] = OUTPUT_DEFAULT[o]
+            continue
+
+        cons_start = SLOT_CONS_START[slot_start]
+        cons_stop = SLOT_CONS_START[slot_stop - 1] + SLOT_CONS_COUNT[slot_stop - 1]
+        consequent_firing = firing[:, CONS_RULE[cons_start:cons_stop]]
+        starts = SLOT_CONS_START[slot_start:slot_stop] - cons_start
+
+        if OUTPUT_ACCUMULATION[o] == 0:
+            strength = np.maximum.reduceat(consequent_firing, starts, axis=1)
+        else:
+            strength = np.add.reduceat(consequent_firing, starts, axis=1)
+
+        curves = OUT_TERM_CURVES[SLOT_TERM[slot_start:slot_stop]]
+        if ACTIVATION == 0:
+            implied = np.minimum(strength[:, :, None], curves[None, :, :])
+        else:
+            implied = strength[:, :, None] * curves[None, :, :]
+
+        aggregated = accumulate(OUTPUT_ACCUMULATION[o], implied, axis=1)
+        outputs[:, o] = defuzzify(OUTPUT_DEFUZZIFIER[o], aggregated, OUTPUT_UNIVERSE[o], OUTPUT_DEFAULT[o])
+
+    return outputs
+
+
+def predict_dict(inputs):
+    outputs = predict(inputs)
+    return {name: outputs[:, o] for o, name in enumerate(OUTPUT_NAMES)}
+'''
+
+
+def module_file_name(system_name):
+    return re.sub(r'\W', '_', system_name) + ".py"
+
+
+def array_literal(array):
+    array = np.asarray(array)
+    return f"np.array({array.tolist()!r}, dtype=np.dtype({array.dtype.str!r})).reshape({array.shape!r})"
+
+
+def generate_module(system):
+    lines = [
+        f"# Standalone evaluator for the fuzzy system {system.system_name!r}.",
+        "# Generated by the knowledge base service; requires only NumPy.",
+        "# predict(batch) takes rows of inputs in INPUT_NAMES order, or a dict of input columns,",
+        "# and returns one column per name in OUTPUT_NAMES.",
+        "import numpy as np",
+        "",
+        f"SYSTEM_NAME = {system.system_name!r}",
+        f"INPUT_NAMES = {system.input_names!r}",
+        f"OUTPUT_NAMES = {system.output_names!r}",
+        f"RULE_ALWAYS = {inference.RULE_ALWAYS!r}",
+        "",
+    ]
+    for name in CONSTANTS:
+        lines.append(f"{name.upper()} = {array_literal(getattr(system, name))}")
+    lines.append("")
+
+    for helper in HELPERS:
+        lines.append("")
+        lines.append(inspect.getsource(helper))
+
+    lines.append(PREDICT_SOURCE)
+
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from inference import CompiledSystem, compile_system
+from control_surface import ControlSurface
+
+# File layout: a fixed preamble (magic, format version, header length), a JSON header describing every
+# system and surface, then the raw arrays, each starting on an ALIGNMENT boundary so they can be mapped
+# straight into NumPy without copying.
+MAGIC = b"FZCSTORE"
+VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct("<8sIQ")
+
+
+def _align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_store(path, systems, surfaces=(), resolution=None, seq=None):
+    # `seq` is the change log position the systems were read at; services replay the log from there on top of the store.
+    header = {"version": VERSION, "created": time.time(), "resolution": resolution, "seq": seq, "systems": {}, "surfaces": {}}
+    blobs = []
+    offset = 0
+
+    def place(array):
+        nonlocal offset
+        array = np.asarray(array, order="C")
+        entry = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        blobs.append((offset, array))
+        offset = _align(offset + array.nbytes)
+        return entry
+
+    for system in systems:
+        header["systems"][system.system_name] = {
+            "input_names": system.input_names,
+            "output_names": system.output_names,
+            "arrays": {name: place(array) for name, array in system.arrays().items()},
+        }
+
+    for surface in surfaces:
+        header["surfaces"][surface.system_name] = {
+            "input_names": surface.input_names,
+            "output_names": surface.output_names,
+            "arrays": {
+                "lows": place(surface.lows),
+                "highs": place(surface.highs),
+                "table": place(surface.table),
+                "max_error": place(surface.max_error if surface.max_error is not None else np.full(len(surface.output_names), np.nan)),
+            },
+        }
+
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = _align(PREAMBLE.size + len(encoded))
+
+    # Written beside the target and renamed over it, so workers that already mapped the old file keep it.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, len(encoded)))
+        file.write(encoded)
+        for blob_offset, array in blobs:
+            file.seek(data_start + blob_offset)
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(temporary, path)
+
+    return header
+
+
+class CompiledStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < PREAMBLE.size:
+            raise ValueError(f"{path} is not a compiled system store")
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled system store")
+        if version != VERSION:
+            raise ValueError(f"Unsupported compiled system store version {version} in {path}")
+
+        self.header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length].decode("utf-8"))
+        self._data_start = _align(PREAMBLE.size + header_length)
+        self._systems = {}
+        self._surfaces = {}
+        self._lock = threading.Lock()
+
+    @property
+    def resolution(self):
+        return self.header["resolution"]
+
+    @property
+    def seq(self):
+        return self.header.get("seq")
+
+    def names(self):
+        return list(self.header["systems"])
+
+    def _array(self, entry):
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._data_start + entry["offset"]).reshape(shape)
+
+    def get(self, system_name):
+        with self._lock:
+            system = self._systems.get(system_name)
+            if system is None:
+                entry = self.header["systems"].get(system_name)
+                if entry is None:
+                    return None
+                arrays = {name: self._array(array) for name, array in entry["arrays"].items()}
+                system = self._systems[system_name] = CompiledSystem(system_name, entry["input_names"], entry["output_names"], arrays)
+            return system
+
+    def surface(self, system_name):
+        with self._lock:
+            surface = self._surfaces.get(system_name)
+            if surface is None:
+                entry = self.header["surfaces"].get(system_name)
+                if entry is None:
+                    return None
+                arrays = {name: self._array(array) for name, array in entry["arrays"].items()}
+                max_error = None if np.isnan(arrays["max_error"]).all() else arrays["max_error"]
+                surface = self._surfaces[system_name] = ControlSurface(system_name, entry["input_names"], entry["output_names"],
+                                                                       arrays["lows"], arrays["highs"], arrays["table"], max_error)
+            return surface
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.header["version"],
+            "created": self.header["created"],
+            "resolution": self.resolution,
+            "seq": self.seq,
+            "bytes": len(self._mmap),
+            "systems": len(self.header["systems"]),
+            "surfaces": len(self.header["surfaces"]),
+            "loaded_systems": len(self._systems),
+            "loaded_surfaces": len(self._surfaces),
+        }
+
+
+def build_store(db, path, resolution=101, names=None, prefix=None, surfaces=False, seq=None):
+    systems = []
+    control_surfaces = []
+    skipped = {}
+
+    for system_name, data in db.Iter_systems(names=names, prefix=prefix):
+        try:
+            systems.append(compile_system(data, resolution))
+        except ValueError as e:
+            skipped[system_name] = str(e)
+            continue
+
+        if surfaces:
+            surface = db.Get_control_surface(system_name)
+            if surface is not None:
+                control_surfaces.append(ControlSurface.from_bytes(surface))
+
+    write_store(path, systems, control_surfaces, resolution, seq)
+
+    return {"path": path, "seq": seq, "systems": len(systems), "surfaces": len(control_surfaces), "skipped": skipped,
+            "bytes": os.path.getsize(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a memory-mapped store of compiled fuzzy systems")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="compile systems from the database into a store file")
+    build.add_argument("output")
+    build.add_argument("--db", nargs=5, metavar=("NAME", "USER", "PASSWORD", "HOST", "PORT"),
+                       default=["knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432"])
+    build.add_argument("--resolution", type=int, default=int(os.environ.get("KB_INFERENCE_RESOLUTION", 101)))
+    build.add_argument("--names", nargs="+")
+    build.add_argument("--prefix")
+    build.add_argument("--surfaces", action="store_true", help="include stored control surfaces")
+
+    info = commands.add_parser("info", help="describe an existing store file")
+    info.add_argument("path")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from API_list import FuzzySystemDatabase, Create_change_log, Get_change_seq
+
+        # Read before any system, so a change made during the build is replayed over the store rather than missed.
+        Create_change_log(*args.db)
+        seq = Get_change_seq(*args.db)
+        result = build_store(FuzzySystemDatabase(*args.db), args.output, args.resolution, args.names, args.prefix, args.surfaces, seq)
+    else:
+        store = CompiledStore(args.path)
+        result = dict(store.stats(), names=store.names())
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
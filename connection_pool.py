@@ -0,0 +1,248 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+from metrics import TimedCursor
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT,
+                 minconn=1, maxconn=10, max_lifetime=1800.0, health_check_after=30.0, acquire_timeout=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool size must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self.DB_NAME = DB_NAME
+        self.DB_USER = DB_USER
+        self.DB_PASSWORD = DB_PASSWORD
+        self.DB_HOST = DB_HOST
+        self.DB_PORT = DB_PORT
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []
+        self._born = {}
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "created": 0,
+            "recycled": 0,
+            "broken": 0,
+            "in_use_max": 0,
+        }
+
+        for _ in range(minconn):
+            connection = self._connect()
+            self._idle.append((connection, time.monotonic()))
+
+    def _connect(self):
+        connection = psycopg2.connect(
+            dbname=self.DB_NAME,
+            user=self.DB_USER,
+            password=self.DB_PASSWORD,
+            host=self.DB_HOST,
+            port=self.DB_PORT,
+            cursor_factory=TimedCursor
+        )
+        self._born[id(connection)] = time.monotonic()
+        with self._lock:
+            self._stats["created"] += 1
+        return connection
+
+    def _discard(self, connection):
+        self._born.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection):
+        born = self._born.get(id(connection), 0.0)
+        return time.monotonic() - born > self.max_lifetime
+
+    def _healthy(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        with self._available:
+            while True:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._in_use < self.maxconn:
+                    connection, idle_since = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no connection available within {timeout} seconds "
+                                      f"({self._in_use}/{self.maxconn} in use)")
+                waited = True
+                self._waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_use += 1
+            self._stats["in_use_max"] = max(self._stats["in_use_max"], self._in_use)
+
+        try:
+            if connection is not None and self._expired(connection):
+                self._discard(connection)
+                with self._lock:
+                    self._stats["recycled"] += 1
+                connection = None
+            elif connection is not None and not self._healthy(connection, idle_since):
+                self._discard(connection)
+                with self._lock:
+                    self._stats["broken"] += 1
+                connection = None
+
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            with self._available:
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+        wait = time.monotonic() - start
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds_total"] += wait
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+            if waited:
+                self._stats["waited"] += 1
+
+        return connection
+
+    def putconn(self, connection):
+        keep = not connection.closed and not self._closed
+        if keep and connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                keep = False
+                with self._lock:
+                    self._stats["broken"] += 1
+        if keep and self._expired(connection):
+            keep = False
+            with self._lock:
+                self._stats["recycled"] += 1
+
+        if not keep:
+            self._discard(connection)
+
+        with self._available:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((connection, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        connection = self.getconn(timeout)
+        try:
+            yield connection
+        except Exception:
+            if not connection.closed:
+                try:
+                    connection.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            self.putconn(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["size"] = self._in_use + len(self._idle)
+            stats["waiting"] = self._waiting
+            stats["minconn"] = self.minconn
+            stats["maxconn"] = self.maxconn
+            stats["saturation"] = self._in_use / self.maxconn
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["acquired"] if stats["acquired"] else 0.0
+        return stats
+
+    def close(self):
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def init_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, **options):
+    key = (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, str(DB_PORT))
+    pool = ConnectionPool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, **options)
+    with _pools_lock:
+        previous = _pools.get(key)
+        _pools[key] = pool
+    if previous is not None:
+        previous.close()
+    return pool
+
+
+def get_pool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT):
+    key = (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, str(DB_PORT))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, minconn=0)
+            _pools[key] = pool
+    return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
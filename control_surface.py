@@ -0,0 +1,126 @@
+import io
+import itertools
+
+import numpy as np
+
+MAX_SURFACE_INPUTS = 3
+MAX_SURFACE_POINTS = 4_000_000
+
+
+class ControlSurface:
+    def __init__(self, system_name, input_names, output_names, lows, highs, table, max_error=None):
+        self.system_name = system_name
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.table = np.asarray(table, dtype=np.float64)
+        self.max_error = None if max_error is None else np.asarray(max_error, dtype=np.float64)
+        self.shape = self.table.shape[:-1]
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + self.lows.nbytes + self.highs.nbytes
+
+    @classmethod
+    def build(cls, system, resolution=33, chunk_size=50000):
+        dimensions = len(system.input_names)
+        if not 1 <= dimensions <= MAX_SURFACE_INPUTS:
+            raise ValueError(f"Control surfaces support 1 to {MAX_SURFACE_INPUTS} inputs, system has {dimensions}")
+
+        resolution = [resolution] * dimensions if np.isscalar(resolution) else list(resolution)
+        if len(resolution) != dimensions or any(int(r) < 2 for r in resolution):
+            raise ValueError(f"resolution must be an integer >= 2 or a list of {dimensions} such integers")
+        resolution = [int(r) for r in resolution]
+        if np.prod(resolution) > MAX_SURFACE_POINTS:
+            raise ValueError(f"A surface may hold at most {MAX_SURFACE_POINTS} grid points")
+
+        lows, highs = system.input_domains[:, 0], system.input_domains[:, 1]
+        axes = [np.linspace(low, high, r) for low, high, r in zip(lows, highs, resolution)]
+        grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, dimensions)
+
+        table = np.concatenate([system.evaluate(grid[start:start + chunk_size]) for start in range(0, len(grid), chunk_size)])
+        table = table.reshape(*resolution, len(system.output_names))
+
+        return cls(system.system_name, system.input_names, system.output_names, lows, highs, table)
+
+    def input_matrix(self, inputs):
+        if isinstance(inputs, dict):
+            missing = [name for name in self.input_names if name not in inputs]
+            if missing:
+                raise ValueError(f"Missing input variables: {', '.join(missing)}")
+            return np.asarray([[inputs[name] for name in self.input_names]], dtype=np.float64)
+
+        matrix = np.asarray(inputs, dtype=np.float64)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.input_names):
+            raise ValueError(f"Expected rows of {len(self.input_names)} inputs ({', '.join(self.input_names)})")
+        return matrix
+
+    def interpolate(self, inputs):
+        X = self.input_matrix(inputs)
+        cells = np.asarray(self.shape) - 1
+
+        span = np.where(self.highs > self.lows, self.highs - self.lows, 1.0)
+        position = np.clip((X - self.lows) / span, 0.0, 1.0) * cells
+        index = np.minimum(np.floor(position).astype(np.int64), cells - 1)
+        fraction = position - index
+
+        result = np.zeros((len(X), self.table.shape[-1]), dtype=np.float64)
+        for corner in itertools.product((0, 1), repeat=len(self.shape)):
+            corner = np.asarray(corner)
+            weight = np.prod(np.where(corner == 1, fraction, 1.0 - fraction), axis=1)
+            result += weight[:, None] * self.table[tuple((index + corner).T)]
+
+        return result
+
+    def infer(self, inputs):
+        outputs = self.interpolate(inputs)
+        return {name: float(outputs[0, o]) for o, name in enumerate(self.output_names)}
+
+    def measure_error(self, system, samples=2000, seed=0):
+        # Cell midpoints are where multilinear interpolation strays furthest from the grid values.
+        axes = [np.linspace(low, high, r)[:-1] + (high - low) / (2 * (r - 1)) for low, high, r in zip(self.lows, self.highs, self.shape)]
+        midpoints = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(self.shape))
+
+        rng = np.random.default_rng(seed)
+        if len(midpoints) > samples:
+            midpoints = midpoints[rng.choice(len(midpoints), samples, replace=False)]
+        random_points = rng.uniform(self.lows, self.highs, (samples, len(self.shape)))
+        points = np.concatenate([midpoints, random_points])
+
+        self.max_error = np.abs(system.evaluate(points) - self.interpolate(points)).max(axis=0)
+        return self.max_error
+
+    def describe(self):
+        return {
+            "system_name": self.system_name,
+            "input_names": self.input_names,
+            "output_names": self.output_names,
+            "resolution": list(self.shape),
+            "bytes": int(self.nbytes),
+            "max_error": None if self.max_error is None else dict(zip(self.output_names, self.max_error.tolist())),
+        }
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            system_name=np.asarray(self.system_name),
+            input_names=np.asarray(self.input_names),
+            output_names=np.asarray(self.output_names),
+            lows=self.lows,
+            highs=self.highs,
+            table=self.table,
+            max_error=self.max_error if self.max_error is not None else np.full(len(self.output_names), np.nan),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            max_error = arrays["max_error"]
+            return cls(str(arrays["system_name"]), arrays["input_names"].tolist(), arrays["output_names"].tolist(),
+                       arrays["lows"], arrays["highs"], arrays["table"],
+                       None if np.isnan(max_error).all() else max_error)
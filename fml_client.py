@@ -0,0 +1,353 @@
+import hashlib
+import http.client
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+import urllib.parse
+
+# HTTP client for the knowledge base service. One keep-alive connection is reused for every request;
+# RequestWorker runs the calls on a background thread and hands the results back to Tk through a queue.
+
+CHUNK_SIZE = 64 * 1024
+# RemoteDisconnected is a ConnectionResetError. PUT stores a new version of the system and a resent DELETE
+# would report "not found" for a delete that succeeded, so only reads are ever resent.
+RETRY_ERRORS = (ConnectionResetError, BrokenPipeError)
+RETRY_METHODS = ("GET", "HEAD")
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class Reply:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class FmlClient:
+    def __init__(self, host="127.0.0.1", port=5000, timeout=60.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+        self.aborted = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            return self.connection
+
+    def _discard(self, connection):
+        with self._lock:
+            if self.connection is connection:
+                self.connection = None
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            connection, self.connection = self.connection, None
+        if connection is not None:
+            connection.close()
+
+    def abort(self):
+        # Safe to call from another thread: shutting the socket down makes the blocked read fail at once, and
+        # request() raises RequestCancelled instead of retrying until clear_abort() is called.
+        with self._lock:
+            self.aborted = True
+            connection = self.connection
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def clear_abort(self):
+        with self._lock:
+            self.aborted = False
+
+    def request(self, method, path, body=None, headers=None, sink=None):
+        # With a sink, a successful response body is copied into it chunk by chunk instead of held in memory.
+        for attempt in range(2):
+            if self.aborted:
+                raise RequestCancelled()
+            connection = self._connect()
+            # http.client opens the socket on the first request, so an open one has already served a response.
+            reused = connection.sock is not None
+            response = None
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                reply_headers = {name.lower(): value for name, value in response.getheaders()}
+                if sink is not None and 200 <= response.status < 300:
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        sink.write(chunk)
+                    reply = Reply(response.status, reply_headers, b"")
+                else:
+                    reply = Reply(response.status, reply_headers, response.read())
+                if response.will_close:
+                    self._discard(connection)
+                return reply
+            except RETRY_ERRORS:
+                self._discard(connection)
+                if self.aborted:
+                    raise RequestCancelled()
+                # The server may close an idle keep-alive connection at any time; retry once on a fresh one.
+                if attempt or not reused or response is not None or method not in RETRY_METHODS:
+                    raise
+                if not (body is None or hasattr(body, "seek")):
+                    raise
+                if body is not None:
+                    body.seek(0)
+                if sink is not None:
+                    sink.seek(0)
+                    sink.truncate()
+            except BaseException:
+                self._discard(connection)
+                if self.aborted:
+                    raise RequestCancelled()
+                raise
+
+    def get_systems_list(self, etag=None):
+        return self.request("GET", "/get_systems_list", headers={"If-None-Match": etag} if etag else None)
+
+    def get_fml_file(self, system_name):
+        return self.request("GET", f"/get_fml_file/{urllib.parse.quote(system_name, safe='')}")
+
+    def download_fml_file(self, system_name, sink, etag=None):
+        return self.request("GET", f"/get_fml_file/{urllib.parse.quote(system_name, safe='')}?format=xml", sink=sink,
+                            headers={"If-None-Match": etag} if etag else None)
+
+    def get_changes(self, after, timeout=25):
+        return self.request("GET", f"/changes?after={int(after)}&timeout={timeout}")
+
+    def delete_one_system(self, system_name):
+        return self.request("DELETE", f"/delete_one_system/{urllib.parse.quote(system_name, safe='')}")
+
+    def delete_systems_list(self):
+        return self.request("DELETE", "/delete_systems_list")
+
+    def put_fml_file(self, file_path):
+        content_type = "application/gzip" if file_path.endswith(".gz") else "application/xml"
+        with open(file_path, "rb") as file:
+            headers = {"Content-Type": content_type, "Content-Length": str(os.path.getsize(file_path))}
+            return self.request("PUT", "/put_fml_file", body=file, headers=headers)
+
+
+class ClientCache:
+    # On-disk copy of the systems list and of downloaded documents, revalidated with the server's ETags.
+    # A document file is named after the system and its ETag, so a newer version never overwrites a file
+    # that a viewer still has open.
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self.index = {"list": None, "documents": {}}
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+            if isinstance(index, dict) and isinstance(index.get("documents"), dict):
+                self.index = index
+        except (OSError, ValueError):
+            pass
+
+        self._sweep()
+
+    def _save(self):
+        temporary = self.index_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, ensure_ascii=False)
+        os.replace(temporary, self.index_path)
+
+    def _sweep(self):
+        keep = {entry["file"] for entry in self.index["documents"].values()}
+        for name in os.listdir(self.directory):
+            if name.endswith((".xml", ".part")) and name not in keep:
+                self._remove(os.path.join(self.directory, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_list(self):
+        with self._lock:
+            cached = self.index["list"]
+            return dict(cached, systems=list(cached["systems"])) if cached else None
+
+    def put_list(self, systems, version, etag):
+        with self._lock:
+            self.index["list"] = {"systems": list(systems), "version": version, "etag": etag}
+            self._save()
+
+    def document(self, system_name):
+        with self._lock:
+            entry = self.index["documents"].get(system_name)
+            if entry is None:
+                return None, None
+            path = os.path.join(self.directory, entry["file"])
+            return (path, entry["etag"]) if os.path.exists(path) else (None, None)
+
+    def new_download(self):
+        return tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False)
+
+    def put_document(self, system_name, download_path, etag):
+        digest = hashlib.sha1(system_name.encode("utf-8")).hexdigest()[:16]
+        version = hashlib.sha1((etag or download_path).encode("utf-8")).hexdigest()[:12]
+        file_name = f"{digest}-{version}.xml"
+        path = os.path.join(self.directory, file_name)
+
+        with self._lock:
+            if os.path.exists(path):
+                self._remove(download_path)
+            else:
+                os.replace(download_path, path)
+            previous = self.index["documents"].get(system_name)
+            self.index["documents"][system_name] = {"file": file_name, "etag": etag}
+            self._save()
+
+        if previous is not None and previous["file"] != file_name:
+            self._remove(os.path.join(self.directory, previous["file"]))
+        return path
+
+    def drop_document(self, system_name):
+        with self._lock:
+            entry = self.index["documents"].pop(system_name, None)
+            if entry is not None:
+                self._save()
+        if entry is not None:
+            self._remove(os.path.join(self.directory, entry["file"]))
+
+    def apply_changes(self, page):
+        # Returns the updated list, or None when the client fell behind the server's change log and must reload.
+        # A "surface" entry only means a control surface was rebuilt; the document and the list are unchanged.
+        changes = [change for change in page["changes"] if change["operation"] != "surface"]
+        for change in changes:
+            self.drop_document(change["system_name"])
+
+        with self._lock:
+            cached = self.index["list"]
+            if page["reset"] or cached is None:
+                self.index["list"] = None
+                self._save()
+                return None
+
+            systems = cached["systems"]
+            for change in changes:
+                if change["operation"] == "insert":
+                    if change["system_name"] not in systems:
+                        systems.append(change["system_name"])
+                else:
+                    systems[:] = [name for name in systems if name != change["system_name"]]
+
+            # The server's tag no longer describes this list; the next start revalidates it in full.
+            self.index["list"] = {"systems": systems, "version": page["last"], "etag": None}
+            self._save()
+            return list(systems)
+
+
+class Job:
+    def __init__(self, worker, call, on_done, on_error):
+        self.worker = worker
+        self.call = call
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.worker.current is self:
+            self.worker.client.abort()
+
+
+class RequestWorker:
+    def __init__(self, root, client, poll_interval=50):
+        self.root = root
+        self.client = client
+        self.poll_interval = poll_interval
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.current = None
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, name="fml-client", daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_interval, self._poll)
+
+    @property
+    def busy(self):
+        return self.pending > 0
+
+    def submit(self, call, on_done, on_error=None):
+        job = Job(self, call, on_done, on_error)
+        self.pending += 1
+        self.jobs.put(job)
+        return job
+
+    def cancel_all(self):
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            job.cancelled.set()
+            self.results.put((job, None, RequestCancelled()))
+        current = self.current
+        if current is not None:
+            current.cancel()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancelled.is_set():
+                self.results.put((job, None, RequestCancelled()))
+                continue
+
+            self.client.clear_abort()
+            self.current = job
+            try:
+                result, error = job.call(self.client), None
+            except Exception as e:
+                result, error = None, e
+            finally:
+                self.current = None
+
+            if job.cancelled.is_set():
+                result, error = None, RequestCancelled()
+            self.results.put((job, result, error))
+
+    def _poll(self):
+        # Runs on the Tk thread, so callbacks may touch widgets.
+        while True:
+            try:
+                job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if error is None:
+                job.on_done(result)
+            elif job.on_error is not None:
+                job.on_error(error)
+
+        self.root.after(self.poll_interval, self._poll)
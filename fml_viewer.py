@@ -0,0 +1,98 @@
+import tkinter as tk
+
+# Helpers for showing large FML documents without freezing Tk: ChunkedTextLoader feeds a text widget a
+# slice per event-loop tick, and LazyTree only creates Treeview rows for nodes the user has expanded.
+
+TEXT_CHUNK_CHARS = 64 * 1024
+VALUE_PREVIEW_CHARS = 200
+PLACEHOLDER = "\0placeholder"
+
+
+class ChunkedTextLoader:
+    def __init__(self, widget, path, chunk_chars=TEXT_CHUNK_CHARS, on_finish=None):
+        self.widget = widget
+        self.chunk_chars = chunk_chars
+        self.on_finish = on_finish
+        self.file = open(path, "r", encoding="utf-8", errors="replace")
+        self.after_id = None
+        self.done = False
+
+    def start(self):
+        self.widget.delete(1.0, tk.END)
+        self._step()
+        return self
+
+    def _step(self):
+        chunk = self.file.read(self.chunk_chars)
+        if not chunk:
+            self.finish()
+            return
+        self.widget.insert(tk.END, chunk)
+        self.after_id = self.widget.after(1, self._step)
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+        self.file.close()
+        if self.on_finish is not None:
+            self.on_finish()
+
+    cancel = finish
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else str(tag)
+
+
+def describe_element(element):
+    name = local_name(element.tag)
+    label = element.get("name") or element.get("id")
+    text = (element.text or "").strip()
+    if not text:
+        text = " ".join(f"{key}={value}" for key, value in element.attrib.items() if key != "name")
+    if len(text) > VALUE_PREVIEW_CHARS:
+        text = text[:VALUE_PREVIEW_CHARS] + "..."
+    return f"{name} {label}" if label else name, text
+
+
+class LazyTree:
+    def __init__(self, treeview):
+        self.treeview = treeview
+        self.elements = {}
+        treeview.bind("<<TreeviewOpen>>", self._expand)
+
+    def clear(self):
+        self.treeview.delete(*self.treeview.get_children())
+        self.elements.clear()
+
+    def load(self, root_element):
+        self.clear()
+        item = self._insert("", root_element)
+        self.treeview.item(item, open=True)
+        self._populate(item)
+
+    def _insert(self, parent, element):
+        text, value = describe_element(element)
+        item = self.treeview.insert(parent, tk.END, text=text, values=(value,))
+        self.elements[item] = element
+        if len(element):
+            # A dummy child makes Tk draw the expand arrow; the real children are added on first open.
+            self.treeview.insert(item, tk.END, iid=item + PLACEHOLDER, text="...")
+        return item
+
+    def _populate(self, item):
+        placeholder = item + PLACEHOLDER
+        if not self.treeview.exists(placeholder):
+            return
+        self.treeview.delete(placeholder)
+        for child in self.elements[item]:
+            self._insert(item, child)
+
+    def _expand(self, event):
+        item = self.treeview.focus()
+        if item in self.elements:
+            self._populate(item)
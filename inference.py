@@ -0,0 +1,577 @@
+import numpy as np
+
+SHAPES = {
+    "triangularShape": 0,
+    "trapezoidShape": 1,
+    "leftLinearShape": 2,
+    "rightLinearShape": 3,
+    "gaussianShape": 4,
+    "leftGaussianShape": 5,
+    "rightGaussianShape": 6,
+    "piShape": 7,
+}
+
+MODIFIERS = {
+    None: 0,
+    "not": 1,
+    "very": 2,
+    "extremely": 3,
+    "more_or_less": 4,
+    "somewhat": 5,
+    "slightly": 6,
+    "plus": 7,
+    "intensify": 8,
+}
+
+RULE_OPERATORS = {
+    ("and", "MIN"): 0,
+    ("and", "PROD"): 1,
+    ("and", "BDIF"): 2,
+    ("or", "MAX"): 3,
+    ("or", "PROBOR"): 4,
+    ("or", "BSUM"): 5,
+}
+RULE_ALWAYS = -1
+AND_OPERATORS = (0, 1, 2)
+NOT_MODIFIER = MODIFIERS["not"]
+SPARSE_RULE_THRESHOLD = 128
+
+ACTIVATIONS = {"MIN": 0, "PROD": 1}
+ACCUMULATIONS = {"MAX": 0, "SUM": 1, "BSUM": 2, "PROBOR": 3}
+DEFUZZIFIERS = {"COG": 0, "COA": 1, "MOM": 2, "LM": 3, "RM": 4, "SOM": 3, "LOM": 4}
+
+
+def _rise(x, low, high):
+    width = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ramp = np.clip((x - low) / width, 0.0, 1.0)
+    return np.where(width > 0, ramp, (x >= high).astype(np.float64))
+
+
+def _fall(x, low, high):
+    width = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ramp = np.clip((high - x) / width, 0.0, 1.0)
+    return np.where(width > 0, ramp, (x <= low).astype(np.float64))
+
+
+def _gaussian(x, mean, sigma):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        mu = np.exp(-0.5 * ((x - mean) / sigma) ** 2)
+    return np.where(sigma > 0, mu, (x == mean).astype(np.float64))
+
+
+def _pi(x, centre, width):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.clip(np.abs(x - centre) / width, 0.0, 1.0)
+    mu = np.where(t <= 0.5, 1.0 - 2.0 * t ** 2, 2.0 * (1.0 - t) ** 2)
+    return np.where(width > 0, mu, (x == centre).astype(np.float64))
+
+
+def membership(x, shapes, params, complements):
+    # x holds one column per term; each shape is evaluated once over all of its terms.
+    mu = np.empty(x.shape, dtype=np.float64)
+
+    for shape in np.unique(shapes):
+        idx = np.flatnonzero(shapes == shape)
+        xs = x[..., idx]
+        p1, p2, p3, p4 = (params[idx, k] for k in range(4))
+
+        if shape == 0:
+            values = np.minimum(_rise(xs, p1, p2), _fall(xs, p2, p3))
+        elif shape == 1:
+            values = np.minimum(_rise(xs, p1, p2), _fall(xs, p3, p4))
+        elif shape == 2:
+            values = _rise(xs, p1, p2)
+        elif shape == 3:
+            values = _fall(xs, p1, p2)
+        elif shape == 4:
+            values = _gaussian(xs, p1, p2)
+        elif shape == 5:
+            values = np.where(xs >= p1, 1.0, _gaussian(xs, p1, p2))
+        elif shape == 6:
+            values = np.where(xs <= p1, 1.0, _gaussian(xs, p1, p2))
+        else:
+            values = _pi(xs, p1, p2)
+
+        mu[..., idx] = values
+
+    if complements.any():
+        mu[..., complements] = 1.0 - mu[..., complements]
+
+    return mu
+
+
+def apply_modifiers(mu, modifiers):
+    for modifier in np.unique(modifiers):
+        if modifier == 0:
+            continue
+        idx = np.flatnonzero(modifiers == modifier)
+        values = mu[..., idx]
+
+        if modifier == 1:
+            values = 1.0 - values
+        elif modifier == 2:
+            values = values ** 2
+        elif modifier == 3:
+            values = values ** 3
+        elif modifier == 4:
+            values = np.sqrt(values)
+        elif modifier == 5:
+            values = np.cbrt(values)
+        elif modifier == 6:
+            values = values ** 0.75
+        elif modifier == 7:
+            values = values ** 1.25
+        else:
+            values = np.where(values <= 0.5, 2.0 * values ** 2, 1.0 - 2.0 * (1.0 - values) ** 2)
+
+        mu[..., idx] = values
+
+    return mu
+
+
+def combine_clauses(operator, clauses, starts, counts):
+    if operator == 0:
+        return np.minimum.reduceat(clauses, starts, axis=1)
+    if operator == 1:
+        return np.multiply.reduceat(clauses, starts, axis=1)
+    if operator == 2:
+        return np.maximum(np.add.reduceat(clauses, starts, axis=1) - (counts - 1), 0.0)
+    if operator == 3:
+        return np.maximum.reduceat(clauses, starts, axis=1)
+    if operator == 4:
+        return 1.0 - np.multiply.reduceat(1.0 - clauses, starts, axis=1)
+    return np.minimum(np.add.reduceat(clauses, starts, axis=1), 1.0)
+
+
+def accumulate(accumulation, implied, axis):
+    if accumulation == 0:
+        return implied.max(axis=axis)
+    if accumulation == 1:
+        return implied.sum(axis=axis)
+    if accumulation == 2:
+        return np.minimum(implied.sum(axis=axis), 1.0)
+    return 1.0 - np.prod(1.0 - implied, axis=axis)
+
+
+def defuzzify(defuzzifier, aggregated, universe, default_value):
+    peak = aggregated.max(axis=1)
+    fired = peak > 0
+
+    if defuzzifier == 0:
+        area = aggregated.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = (aggregated @ universe) / area
+    elif defuzzifier == 1:
+        cumulative = np.cumsum(aggregated, axis=1)
+        half = cumulative[:, -1:] / 2.0
+        values = universe[np.argmax(cumulative >= half, axis=1)]
+    else:
+        at_peak = aggregated >= (peak[:, None] - 1e-12)
+        if defuzzifier == 2:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = (at_peak.astype(np.float64) @ universe) / at_peak.sum(axis=1)
+        elif defuzzifier == 3:
+            values = universe[np.argmax(at_peak, axis=1)]
+        else:
+            values = universe[len(universe) - 1 - np.argmax(at_peak[:, ::-1], axis=1)]
+
+    return np.where(fired, values, default_value)
+
+
+def _ranges(starts, counts):
+    # Concatenation of arange(start, start + count) for every pair, without a Python loop.
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(total)
+
+
+def _csr(keys, values, size):
+    order = np.argsort(keys, kind="stable")
+    start = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=start[1:])
+    return start, np.asarray(values, dtype=np.int64)[order]
+
+
+def _method(value, table, default, what):
+    key = (value or default).upper()
+    if key not in table:
+        raise ValueError(f"Unsupported {what} '{value}'")
+    return table[key]
+
+
+class CompiledSystem:
+    def __init__(self, system_name, input_names, output_names, arrays):
+        self.system_name = system_name
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        for name, value in arrays.items():
+            setattr(self, name, value)
+        self.array_names = list(arrays)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.array_names}
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def input_matrix(self, inputs):
+        if isinstance(inputs, dict):
+            unknown = set(inputs) - set(self.input_names)
+            if unknown:
+                raise ValueError(f"Unknown input variables: {', '.join(sorted(unknown))}")
+            row = [inputs.get(name, default) for name, default in zip(self.input_names, self.input_defaults)]
+            return np.asarray([row], dtype=np.float64)
+
+        matrix = np.asarray(inputs, dtype=np.float64)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.input_names):
+            raise ValueError(f"Expected rows of {len(self.input_names)} inputs ({', '.join(self.input_names)})")
+        return matrix
+
+    def firing_strengths(self, X):
+        mu = membership(X[:, self.in_term_var], self.in_term_shape, self.in_term_params, self.in_term_complement)
+        clauses = apply_modifiers(mu[:, self.clause_term], self.clause_modifier)
+
+        firing = np.ones((X.shape[0], len(self.rule_operator)), dtype=np.float64)
+        for operator, rule_start, rule_stop in self.operator_blocks:
+            if operator == RULE_ALWAYS:
+                continue
+            clause_start = self.rule_clause_start[rule_start]
+            clause_stop = self.rule_clause_start[rule_stop - 1] + self.rule_clause_count[rule_stop - 1]
+            firing[:, rule_start:rule_stop] = combine_clauses(
+                operator,
+                clauses[:, clause_start:clause_stop],
+                self.rule_clause_start[rule_start:rule_stop] - clause_start,
+                self.rule_clause_count[rule_start:rule_stop]
+            )
+
+        return firing * self.rule_weight
+
+    def slot_strengths(self, X):
+        firing = self.firing_strengths(X)
+        strength = np.zeros((X.shape[0], len(self.slot_term)), dtype=np.float64)
+
+        for o in range(len(self.output_names)):
+            slot_start, slot_stop = self.output_slot_range[o]
+            if slot_start == slot_stop:
+                continue
+
+            cons_start = self.slot_cons_start[slot_start]
+            cons_stop = self.slot_cons_start[slot_stop - 1] + self.slot_cons_count[slot_stop - 1]
+            consequent_firing = firing[:, self.cons_rule[cons_start:cons_stop]]
+            starts = self.slot_cons_start[slot_start:slot_stop] - cons_start
+
+            if self.output_accumulation[o] == 0:
+                strength[:, slot_start:slot_stop] = np.maximum.reduceat(consequent_firing, starts, axis=1)
+            else:
+                strength[:, slot_start:slot_stop] = np.add.reduceat(consequent_firing, starts, axis=1)
+
+        return strength, None
+
+    def candidate_rules(self, mu):
+        # And-rules are filed under a pair of their terms and come back only when both are active; any
+        # other inactive clause then evaluates to zero. Or-rules are filed under every clause term.
+        term_count = mu.shape[1]
+        rows, terms = np.nonzero(mu > 0)
+
+        counts = self.term_rule_start[terms + 1] - self.term_rule_start[terms]
+        single_rows = np.repeat(rows, counts)
+        single_rules = self.term_rule[_ranges(self.term_rule_start[terms], counts)]
+
+        repeated = self.rule_multi_indexed[single_rules]
+        if repeated.any():
+            keys = np.unique(single_rows[repeated] * len(self.rule_operator) + single_rules[repeated])
+            single_rows = np.concatenate([single_rows[~repeated], keys // len(self.rule_operator)])
+            single_rules = np.concatenate([single_rules[~repeated], keys % len(self.rule_operator)])
+
+        anchored = self.pair_anchor[terms]
+        rows, terms = rows[anchored], terms[anchored]
+        entries = np.arange(len(rows))
+        partners = np.searchsorted(rows, rows, side="right") - entries - 1
+        first = np.repeat(entries, partners)
+        second = _ranges(entries + 1, partners)
+        pair_keys = terms[first] * term_count + terms[second]
+
+        position = np.minimum(np.searchsorted(self.pair_keys, pair_keys), max(len(self.pair_keys) - 1, 0))
+        found = self.pair_keys[position] == pair_keys if len(self.pair_keys) else np.zeros(len(pair_keys), dtype=bool)
+        position = position[found]
+        counts = self.pair_rule_start[position + 1] - self.pair_rule_start[position]
+        pair_rows = np.repeat(rows[first[found]], counts)
+        pair_rules = self.pair_rule[_ranges(self.pair_rule_start[position], counts)]
+
+        rows = np.concatenate([single_rows, pair_rows])
+        rules = np.concatenate([single_rules, pair_rules])
+
+        if len(self.always_rules):
+            rows = np.concatenate([rows, np.repeat(np.arange(mu.shape[0]), len(self.always_rules))])
+            rules = np.concatenate([rules, np.tile(self.always_rules, mu.shape[0])])
+
+        return rows, rules
+
+    def sparse_slot_strengths(self, X):
+        mu = membership(X[:, self.in_term_var], self.in_term_shape, self.in_term_params, self.in_term_complement)
+        rows, rules = self.candidate_rules(mu)
+
+        firing = np.ones(len(rules), dtype=np.float64)
+        for operator, rule_start, rule_stop in self.operator_blocks:
+            if operator == RULE_ALWAYS:
+                continue
+            pairs = np.flatnonzero((rules >= rule_start) & (rules < rule_stop))
+            counts = self.rule_clause_count[rules[pairs]]
+            clauses = _ranges(self.rule_clause_start[rules[pairs]], counts)
+            cells = np.repeat(rows[pairs] * mu.shape[1], counts) + self.clause_term[clauses]
+            values = apply_modifiers(mu.ravel()[cells], self.clause_modifier[clauses])
+            firing[pairs] = combine_clauses(operator, values[None, :], np.cumsum(counts) - counts, counts)[0]
+        firing *= self.rule_weight[rules]
+
+        fired = firing > 0
+        rows, rules, firing = rows[fired], rules[fired], firing[fired]
+
+        slot_count = len(self.slot_term)
+        counts = self.rule_slot_start[rules + 1] - self.rule_slot_start[rules]
+        slots = self.rule_slot[_ranges(self.rule_slot_start[rules], counts)]
+        keys = np.repeat(rows, counts) * slot_count + slots
+        values = np.repeat(firing, counts)
+
+        summed = self.slot_sum[slots]
+        strength = np.bincount(keys[summed], values[summed], minlength=X.shape[0] * slot_count).astype(np.float64, copy=False)
+        np.maximum.at(strength, keys[~summed], values[~summed])
+
+        return strength.reshape(X.shape[0], slot_count), np.unique(slots)
+
+    def evaluate(self, inputs):
+        X = self.input_matrix(inputs)
+        strength, active_slots = self.sparse_slot_strengths(X) if self.sparse else self.slot_strengths(X)
+        outputs = np.empty((X.shape[0], len(self.output_names)), dtype=np.float64)
+
+        for o in range(len(self.output_names)):
+            slot_start, slot_stop = self.output_slot_range[o]
+            if active_slots is None:
+                slots = np.arange(slot_start, slot_stop)
+            else:
+                # Slots no candidate rule reaches have zero strength and add nothing to the aggregate.
+                slots = active_slots[(active_slots >= slot_start) & (active_slots < slot_stop)]
+            if len(slots) == 0:
+                outputs[:, o] = self.output_default[o]
+                continue
+
+            curves = self.out_term_curves[self.slot_term[slots]]
+            if self.activation == 0:
+                implied = np.minimum(strength[:, slots, None], curves[None, :, :])
+            else:
+                implied = strength[:, slots, None] * curves[None, :, :]
+
+            aggregated = accumulate(self.output_accumulation[o], implied, axis=1)
+            outputs[:, o] = defuzzify(self.output_defuzzifier[o], aggregated, self.output_universe[o], self.output_default[o])
+
+        return outputs
+
+    def infer(self, inputs):
+        outputs = self.evaluate(inputs)
+        return {name: float(outputs[0, o]) for o, name in enumerate(self.output_names)}
+
+
+def compile_system(data, resolution=101, sparse=None):
+    knowledge_base, mamdani_rule_base = data
+
+    inputs = [var for var in knowledge_base["variables"] if (var["type"] or "").lower() == "input"]
+    outputs = [var for var in knowledge_base["variables"] if (var["type"] or "").lower() == "output"]
+    if not inputs or not outputs:
+        raise ValueError("A fuzzy system needs at least one input and one output variable")
+
+    def term_table(variables):
+        index = {}
+        var_idx, shapes, params, complements = [], [], [], []
+        for v, var in enumerate(variables):
+            for term in var["terms"]:
+                if term["shape"] not in SHAPES:
+                    raise ValueError(f"Unsupported shape '{term['shape']}' for term '{var['variable_name']}.{term['term_name']}'")
+                index[(var["variable_name"], term["term_name"])] = len(shapes)
+                var_idx.append(v)
+                shapes.append(SHAPES[term["shape"]])
+                params.append([float(term.get(f"param{k}") or 0.0) for k in range(1, 5)])
+                complements.append(bool(term.get("complement")))
+        return (index,
+                np.asarray(var_idx, dtype=np.int64),
+                np.asarray(shapes, dtype=np.int8),
+                np.asarray(params, dtype=np.float64).reshape(-1, 4),
+                np.asarray(complements, dtype=bool))
+
+    in_index, in_term_var, in_term_shape, in_term_params, in_term_complement = term_table(inputs)
+    out_index, out_term_var, out_term_shape, out_term_params, out_term_complement = term_table(outputs)
+
+    and_method = mamdani_rule_base.get("and_method") or "MIN"
+    or_method = mamdani_rule_base.get("or_method") or "MAX"
+    activation = _method(mamdani_rule_base.get("activation_method"), ACTIVATIONS, "MIN", "activation method")
+
+    rules = []
+    for rule in mamdani_rule_base["rules"]:
+        connector = (rule.get("connector") or "and").lower()
+        if connector == "and":
+            method = rule.get("rule_and_method") or and_method
+        else:
+            method = rule.get("rule_or_method") or or_method
+        operator = RULE_OPERATORS.get((connector, method.upper()))
+        if operator is None:
+            raise ValueError(f"Unsupported connector '{connector}' with method '{method}' in rule '{rule['rule_name']}'")
+
+        modifiers = rule.get("antecedent_modifiers") or []
+        clauses = []
+        for idx, (variable, term) in enumerate(zip(rule["antecedent_variables"] or [], rule["antecedent_terms"] or [])):
+            if (variable, term) not in in_index:
+                raise ValueError(f"Rule '{rule['rule_name']}' references unknown input term '{variable}.{term}'")
+            modifier = modifiers[idx] if idx < len(modifiers) else None
+            if modifier not in MODIFIERS:
+                raise ValueError(f"Unsupported modifier '{modifier}' in rule '{rule['rule_name']}'")
+            clauses.append((in_index[(variable, term)], MODIFIERS[modifier]))
+
+        consequents = []
+        for variable, term in zip(rule["consequent_variables"] or [], rule["consequent_terms"] or []):
+            if (variable, term) not in out_index:
+                raise ValueError(f"Rule '{rule['rule_name']}' references unknown output term '{variable}.{term}'")
+            consequents.append(out_index[(variable, term)])
+
+        rules.append((RULE_ALWAYS if not clauses else operator, float(rule.get("weight") or 1.0), clauses, consequents))
+
+    # Rules are grouped by operator so each group's clauses form one contiguous block for reduceat.
+    rules.sort(key=lambda rule: rule[0])
+
+    rule_operator = np.asarray([rule[0] for rule in rules], dtype=np.int8)
+    rule_weight = np.asarray([rule[1] for rule in rules], dtype=np.float64)
+    rule_clause_count = np.asarray([len(rule[2]) for rule in rules], dtype=np.int64)
+    rule_clause_start = np.concatenate([[0], np.cumsum(rule_clause_count)[:-1]]).astype(np.int64) if rules else np.zeros(0, dtype=np.int64)
+    clause_term = np.asarray([term for rule in rules for term, _ in rule[2]], dtype=np.int64)
+    clause_modifier = np.asarray([modifier for rule in rules for _, modifier in rule[2]], dtype=np.int8)
+
+    operator_blocks = []
+    for r, operator in enumerate(rule_operator):
+        if operator_blocks and operator_blocks[-1][0] == operator:
+            operator_blocks[-1][2] = r + 1
+        else:
+            operator_blocks.append([int(operator), r, r + 1])
+
+    output_accumulation = np.asarray([_method(var.get("accumulation"), ACCUMULATIONS, "MAX", "accumulation method") for var in outputs], dtype=np.int8)
+    output_defuzzifier = np.asarray([_method(var.get("defuzzifier"), DEFUZZIFIERS, "COG", "defuzzifier") for var in outputs], dtype=np.int8)
+    output_default = np.asarray([float(var.get("default_value") or 0.0) for var in outputs], dtype=np.float64)
+    output_universe = np.stack([np.linspace(float(var["domain_left"]), float(var["domain_right"]), resolution) for var in outputs])
+    out_term_curves = membership(output_universe[out_term_var].T, out_term_shape, out_term_params, out_term_complement).T.copy()
+
+    # A slot is one implied fuzzy set per output. Consequents sharing a term collapse into one slot
+    # whenever that is exact: MAX accumulation, or sum-type accumulation under PROD activation.
+    cons_rule, slot_cons_start, slot_cons_count, slot_term, output_slot_range = [], [], [], [], []
+    for o in range(len(outputs)):
+        pairs = [(term, r) for r, rule in enumerate(rules) for term in rule[3] if out_term_var[term] == o]
+        collapse = output_accumulation[o] == 0 or (activation == 1 and output_accumulation[o] in (1, 2))
+        slots = {}
+        for term, r in sorted(pairs):
+            slots.setdefault(term if collapse else (term, r), []).append(r)
+
+        first_slot = len(slot_term)
+        for key, slot_rules in slots.items():
+            slot_cons_start.append(len(cons_rule))
+            slot_cons_count.append(len(slot_rules))
+            slot_term.append(key if collapse else key[0])
+            cons_rule.extend(slot_rules)
+        output_slot_range.append((first_slot, len(slot_term)))
+
+    # Inverted (variable, term) -> rules index for sparse evaluation. "not" clauses are non-zero exactly
+    # when their term is inactive, so rules that can fire through one are evaluated for every row.
+    clause_rule = np.repeat(np.arange(len(rules), dtype=np.int64), rule_clause_count)
+    indexed = clause_modifier != NOT_MODIFIER
+    is_and = np.isin(rule_operator, AND_OPERATORS)
+    indexed_count = np.bincount(clause_rule[indexed], minlength=len(rules))
+    always_candidate = (rule_operator == RULE_ALWAYS) | np.where(is_and, indexed_count == 0, indexed_count < rule_clause_count)
+
+    # And-rules are filed under the two terms active over the smallest share of their domains.
+    samples = np.linspace(0.0, 1.0, 257)[:, None]
+    domains = np.asarray([[float(var["domain_left"]), float(var["domain_right"])] for var in inputs], dtype=np.float64)
+    sample_x = domains[in_term_var, 0] + samples * (domains[in_term_var, 1] - domains[in_term_var, 0])
+    term_activity = (membership(sample_x, in_term_shape, in_term_params, in_term_complement) > 0).mean(axis=0)
+
+    single_terms, single_rules, pair_keys, pair_rules = [], [], [], []
+    for r in np.flatnonzero(~always_candidate):
+        rule_clauses = np.arange(rule_clause_start[r], rule_clause_start[r] + rule_clause_count[r])
+        rule_terms = np.unique(clause_term[rule_clauses[indexed[rule_clauses]]])
+        if not is_and[r]:
+            single_terms.extend(clause_term[rule_clauses[indexed[rule_clauses]]])
+            single_rules.extend([r] * int(indexed_count[r]))
+        elif len(rule_terms) == 1:
+            single_terms.append(rule_terms[0])
+            single_rules.append(r)
+        else:
+            first, second = sorted(rule_terms[np.argsort(term_activity[rule_terms], kind="stable")[:2]])
+            pair_keys.append(first * len(in_term_var) + second)
+            pair_rules.append(r)
+
+    term_rule_start, term_rule = _csr(np.asarray(single_terms, dtype=np.int64), single_rules, len(in_term_var))
+    pair_keys, pair_index = np.unique(np.asarray(pair_keys, dtype=np.int64), return_inverse=True)
+    pair_rule_start, pair_rule = _csr(pair_index.astype(np.int64), pair_rules, len(pair_keys))
+    pair_anchor = np.zeros(len(in_term_var), dtype=bool)
+    pair_anchor[pair_keys // max(len(in_term_var), 1)] = True
+    pair_anchor[pair_keys % max(len(in_term_var), 1)] = True
+
+    cons_rule = np.asarray(cons_rule, dtype=np.int64)
+    cons_slot = np.repeat(np.arange(len(slot_term), dtype=np.int64), np.asarray(slot_cons_count, dtype=np.int64))
+    rule_slot_start, rule_slot = _csr(cons_rule, cons_slot, len(rules))
+    slot_sum = np.repeat(output_accumulation != 0, [stop - start for start, stop in output_slot_range])
+
+    if sparse is None:
+        sparse = len(rules) >= SPARSE_RULE_THRESHOLD
+
+    arrays = {
+        "input_domains": domains,
+        "input_defaults": np.asarray([float(var.get("default_value") or 0.0) for var in inputs], dtype=np.float64),
+        "in_term_var": in_term_var,
+        "in_term_shape": in_term_shape,
+        "in_term_params": in_term_params,
+        "in_term_complement": in_term_complement,
+        "out_term_var": out_term_var,
+        "out_term_curves": out_term_curves,
+        "output_universe": output_universe,
+        "output_accumulation": output_accumulation,
+        "output_defuzzifier": output_defuzzifier,
+        "output_default": output_default,
+        "rule_operator": rule_operator,
+        "rule_weight": rule_weight,
+        "rule_clause_start": rule_clause_start,
+        "rule_clause_count": rule_clause_count,
+        "clause_term": clause_term,
+        "clause_modifier": clause_modifier,
+        "operator_blocks": np.asarray(operator_blocks, dtype=np.int64).reshape(-1, 3),
+        "cons_rule": cons_rule,
+        "slot_cons_start": np.asarray(slot_cons_start, dtype=np.int64),
+        "slot_cons_count": np.asarray(slot_cons_count, dtype=np.int64),
+        "slot_term": np.asarray(slot_term, dtype=np.int64),
+        "output_slot_range": np.asarray(output_slot_range, dtype=np.int64).reshape(-1, 2),
+        "activation": np.asarray(activation, dtype=np.int8),
+        "term_rule_start": term_rule_start,
+        "term_rule": term_rule,
+        "rule_multi_indexed": ~is_and & (indexed_count > 1),
+        "pair_keys": pair_keys,
+        "pair_rule_start": pair_rule_start,
+        "pair_rule": pair_rule,
+        "pair_anchor": pair_anchor,
+        "always_rules": np.flatnonzero(always_candidate).astype(np.int64),
+        "rule_slot_start": rule_slot_start,
+        "rule_slot": rule_slot,
+        "slot_sum": np.asarray(slot_sum, dtype=bool),
+        "sparse": np.asarray(bool(sparse)),
+    }
+
+    return CompiledSystem(knowledge_base["system_name"],
+                          [var["variable_name"] for var in inputs],
+                          [var["variable_name"] for var in outputs],
+                          arrays)
+
+
+def load_compiled_system(db, system_name, resolution=101, sparse=None):
+    data = db.Get_system(system_name)
+    if data is None:
+        return None
+    return compile_system(data, resolution, sparse)
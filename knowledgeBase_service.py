@@ -1,24 +1,394 @@
 import time
-import win32serviceutil
-import win32service
-import win32event
 import threading
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from werkzeug.serving import make_server
 import os
-from API_list import Get_List, Delete_all_data, Delete_one_data, FuzzySystemParser, FuzzySystemDatabase
+import signal
+import glob
+import gzip
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from API_list import Get_List, Get_page, parse_page_cursor, Get_change_seq, Get_changes, Create_indexes, Create_control_surfaces_table, Create_change_log, Trim_change_log, Delete_all_data, Delete_one_data, FuzzySystemParser, FuzzySystemDatabase, IngestError, Put_fml_files
+from connection_pool import init_pool, get_pool, close_all_pools
+from inference import load_compiled_system
+from control_surface import ControlSurface
+from codegen import generate_module, module_file_name
+from system_caches import SystemCaches
+from service_formats import GZIP_MIMETYPES, BATCH_OUTPUTS, EXPORT_FORMATS, export_chunks
+from change_feed import ChangeListener, ChangeFollower, catch_up, follow_changes, wait_for_changes, change_events
+from batch_inference import run_batch, iter_array_chunks, iter_csv_chunks, iter_npy_chunks, iter_ndjson_chunks
+import prefork
+import tempfile
+from metrics import REGISTRY, HTTP_IN_PROGRESS, FML_UPLOADS, observe_request, counted_iter, pool_metrics, cache_metrics, reset_directory, archive_worker
+
+try:
+    import win32serviceutil
+    import win32service
+    import win32event
+except ImportError:
+    win32serviceutil = None
+
+DB_CONFIG = ("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")
 
 app = Flask(__name__)
+db = FuzzySystemDatabase(*DB_CONFIG)
+caches = SystemCaches()
+change_listener = ChangeListener(*DB_CONFIG)
+inference_workers = int(os.environ.get("KB_INFERENCE_WORKERS", 0)) or os.cpu_count() or 1
+parse_executor = None
+parse_executor_lock = threading.Lock()
+inference_executor = None
+inference_executor_lock = threading.Lock()
+metrics_directory = None
+
+def init_db_pool():
+    return init_pool(
+        *DB_CONFIG,
+        minconn=int(os.environ.get("KB_POOL_MIN", 2)),
+        maxconn=int(os.environ.get("KB_POOL_MAX", 20)),
+        max_lifetime=float(os.environ.get("KB_POOL_MAX_LIFETIME", 1800)),
+        health_check_after=float(os.environ.get("KB_POOL_HEALTH_CHECK_AFTER", 30)),
+        acquire_timeout=float(os.environ.get("KB_POOL_ACQUIRE_TIMEOUT", 30))
+    )
+
+def reset_pool_signals():
+    # Pool processes are forked from a pre-fork worker and would otherwise inherit its SIGTERM handler.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+def get_parse_executor():
+    global parse_executor
+    with parse_executor_lock:
+        if parse_executor is None:
+            workers = os.environ.get("KB_PARSE_WORKERS")
+            parse_executor = ProcessPoolExecutor(max_workers=int(workers) if workers else None, initializer=reset_pool_signals)
+    return parse_executor
+
+def get_inference_executor():
+    global inference_executor
+    with inference_executor_lock:
+        if inference_executor is None:
+            inference_executor = ProcessPoolExecutor(max_workers=inference_workers, initializer=reset_pool_signals)
+    return inference_executor
+
+def shutdown_executors():
+    global parse_executor, inference_executor
+    with parse_executor_lock:
+        executor, parse_executor = parse_executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+    with inference_executor_lock:
+        executor, inference_executor = inference_executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+def get_compiled_system(system_name):
+    system, generation = caches.lookup_system(system_name)
+
+    if system is None:
+        system = load_compiled_system(db, system_name, caches.resolution)
+        if system is not None:
+            caches.compiled_cache.put(system_name, system, generation)
+
+    return system
+
+def get_control_surface(system_name):
+    surface, generation = caches.lookup_surface(system_name)
+
+    if surface is None:
+        data = db.Get_control_surface(system_name)
+        if data is not None:
+            surface = caches.surface_cache.put(system_name, ControlSurface.from_bytes(data), generation)
+
+    return surface
+
+def start_change_follower():
+    # Writes handled by another worker (or another service on the same database) only reach this process's
+    # caches through the change log.
+    follower = ChangeFollower(change_listener, caches.apply_change, caches.invalidate_all)
+
+    # A compiled store is brought up to date from the change log position it was built at before anything is
+    # served from it, and the follower carries on from there.
+    store = caches.open_store(os.environ.get("KB_COMPILED_STORE"))
+    if store is not None:
+        follower.after = store.seq
+        catch_up(follower, get_changes_page)
+        if caches.store is None:
+            print(f"Ignoring compiled store {store.path}: the change log no longer reaches back to seq {store.seq}")
+
+    thread = threading.Thread(target=follow_changes, name="change-follower", daemon=True, args=(
+        follower, get_changes_page, lambda: Get_change_seq(*DB_CONFIG)
+    ))
+    thread.start()
+    return thread
+
+def collect_pool_metrics():
+    return pool_metrics({"sync": get_pool(*DB_CONFIG).stats()})
+
+def collect_cache_metrics():
+    return cache_metrics(caches.cache_stats())
+
+REGISTRY.add_collector(collect_pool_metrics)
+REGISTRY.add_collector(collect_cache_metrics)
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def finish_request(route, method, status, started, size):
+    HTTP_IN_PROGRESS.dec()
+    observe_request(route, method, status, time.perf_counter() - started, size)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_recorded = False
+    HTTP_IN_PROGRESS.inc()
+
+@app.after_request
+def record_request(response):
+    if "request_started" not in g:
+        return response
+    g.request_recorded = True
+    route, method, status, started = request_route(), request.method, str(response.status_code), g.request_started
+
+    if response.is_streamed:
+        # Streamed bodies are timed to the last chunk, after the view function has long returned.
+        response.response = counted_iter(response.response, lambda size: finish_request(route, method, status, started, size))
+    else:
+        finish_request(route, method, status, started, response.calculate_content_length())
+    return response
+
+@app.teardown_request
+def record_failed_request(exc):
+    if "request_started" in g and not g.request_recorded:
+        finish_request(request_route(), request.method, "500", g.request_started, None)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/get_fml_file/<system_name>', methods=['GET'])
 def get_fml_file(system_name):
     try:
-        db = FuzzySystemDatabase("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")
-        system = db.Get_file(system_name)
-        
-        if not system:
-            return jsonify({"message": "No systems found"}), 200
-        
-        return jsonify({"system": system}), 200
+        raw = request.args.get('format') == 'xml'
+        cached = caches.fml_cache.get(system_name)
+
+        if cached is None:
+            generation = caches.fml_cache.generation
+            system = db.Get_file(system_name)
+
+            if not system:
+                return jsonify({"message": "No systems found"}), 404 if raw else 200
+
+            cached = caches.fml_cache.put(system_name, system, generation)
+
+        system, etag = cached
+
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        elif raw:
+            # The bare document, so clients can stream it to disk instead of decoding a JSON string.
+            response = app.response_class(system, mimetype='application/xml')
+        else:
+            response = jsonify({"system": system})
+        response.set_etag(etag)
+
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/get_fml_files', methods=['POST'])
+def get_fml_files():
+    try:
+        data = request.get_json()
+        names = data.get('names') if data else None
+
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return jsonify({"error": "names must be a list of system names."}), 400
+
+        names = list(dict.fromkeys(names))
+        systems = {}
+        misses = []
+
+        for system_name in names:
+            cached = caches.fml_cache.get(system_name)
+            if cached is None:
+                misses.append(system_name)
+            else:
+                systems[system_name] = cached[0]
+
+        if misses:
+            generation = caches.fml_cache.generation
+            for system_name, system in db.Get_files(misses).items():
+                caches.fml_cache.put(system_name, system, generation)
+                systems[system_name] = system
+
+        missing = [system_name for system_name in names if system_name not in systems]
+
+        return jsonify({"systems": systems, "missing": missing}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/infer/<system_name>', methods=['POST'])
+def infer(system_name):
+    try:
+        data = request.get_json()
+        inputs = data.get('inputs') if data else None
+
+        if not isinstance(inputs, (dict, list)):
+            return jsonify({"error": "inputs must be an object of variable values or a list of input rows."}), 400
+
+        system = get_compiled_system(system_name)
+
+        if system is None:
+            return jsonify({"message": "No systems found"}), 404
+
+        if isinstance(inputs, dict):
+            return jsonify({"outputs": system.infer(inputs)}), 200
+
+        return jsonify({
+            "input_names": system.input_names,
+            "output_names": system.output_names,
+            "outputs": system.evaluate(inputs).tolist()
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/control_surface/<system_name>', methods=['PUT'])
+def build_control_surface(system_name):
+    try:
+        data = request.get_json(silent=True) or {}
+        resolution = data.get('resolution', 33)
+        samples = data.get('samples', 2000)
+
+        if not isinstance(samples, int) or samples < 1:
+            return jsonify({"error": "samples must be a positive integer."}), 400
+
+        system = get_compiled_system(system_name)
+
+        if system is None:
+            return jsonify({"message": "No systems found"}), 404
+
+        surface = ControlSurface.build(system, resolution)
+        surface.measure_error(system, samples)
+
+        if not db.Put_control_surface(system_name, surface.shape, surface.max_error.tolist(), surface.to_bytes()):
+            return jsonify({"message": "No systems found"}), 404
+
+        # Not cached here: a concurrent rebuild may have stored a newer surface, so the next read loads it with
+        # the generation taken before that fetch, like every other cache entry.
+        caches.invalidate_surface(system_name)
+        return jsonify(surface.describe()), 201
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/control_surface/<system_name>', methods=['GET'])
+def get_control_surface_info(system_name):
+    try:
+        surface = get_control_surface(system_name)
+
+        if surface is None:
+            return jsonify({"message": "No control surface found"}), 404
+
+        return jsonify(surface.describe()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/control_surface/<system_name>/infer', methods=['POST'])
+def infer_control_surface(system_name):
+    try:
+        data = request.get_json()
+        inputs = data.get('inputs') if data else None
+
+        if not isinstance(inputs, (dict, list)):
+            return jsonify({"error": "inputs must be an object of variable values or a list of input rows."}), 400
+
+        surface = get_control_surface(system_name)
+
+        if surface is None:
+            return jsonify({"message": "No control surface found"}), 404
+
+        if isinstance(inputs, dict):
+            return jsonify({"outputs": surface.infer(inputs)}), 200
+
+        return jsonify({
+            "input_names": surface.input_names,
+            "output_names": surface.output_names,
+            "outputs": surface.interpolate(inputs).tolist()
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/codegen/<system_name>', methods=['GET'])
+def codegen(system_name):
+    try:
+        resolution = request.args.get('resolution', type=int)
+
+        if resolution is not None and resolution < 2:
+            return jsonify({"error": "resolution must be an integer of at least 2."}), 400
+
+        if resolution is None or resolution == caches.resolution:
+            system = get_compiled_system(system_name)
+        else:
+            system = load_compiled_system(db, system_name, resolution)
+
+        if system is None:
+            return jsonify({"message": "No systems found"}), 404
+
+        return Response(generate_module(system), mimetype="text/x-python",
+                        headers={"Content-Disposition": f'attachment; filename="{module_file_name(system_name)}"'})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/infer_batch/<system_name>', methods=['POST'])
+def infer_batch(system_name):
+    try:
+        chunk_size = request.args.get('chunk_size', 10000, type=int)
+        output = request.args.get('output', 'ndjson')
+        parallel = request.args.get('parallel', '1') != '0'
+
+        if chunk_size is None or chunk_size < 1:
+            return jsonify({"error": "chunk_size must be a positive integer."}), 400
+        if output not in BATCH_OUTPUTS:
+            return jsonify({"error": "output must be 'ndjson' or 'csv'."}), 400
+
+        system = get_compiled_system(system_name)
+
+        if system is None:
+            return jsonify({"message": "No systems found"}), 404
+
+        if request.mimetype == 'text/csv':
+            chunks = iter_csv_chunks(request.stream, system.input_names, chunk_size)
+        elif request.mimetype in ('application/x-npy', 'application/octet-stream'):
+            chunks = iter_npy_chunks(request.stream, chunk_size)
+        elif request.mimetype == 'application/x-ndjson':
+            chunks = iter_ndjson_chunks(request.stream, chunk_size)
+        elif request.is_json:
+            data = request.get_json()
+            chunks = iter_array_chunks(data.get('inputs', []) if isinstance(data, dict) else data, chunk_size)
+        else:
+            return jsonify({"error": "Send inputs as text/csv, application/x-npy, application/x-ndjson or application/json."}), 415
+
+        executor = get_inference_executor() if parallel else None
+        window = 2 * inference_workers if executor else 1
+
+        return Response(stream_with_context(run_batch(system, chunks, executor, window, output, inference_workers)), mimetype=BATCH_OUTPUTS[output])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -26,30 +396,176 @@ def get_fml_file(system_name):
 @app.route('/get_systems_list', methods=['GET'])
 def get_systems_list():
     try:
-        systems = Get_List("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")
-        count = len(systems)
-        if count == 0:
+        if not request.args:
+            # Read before the list, so the tag can only be older than the list it labels, never newer.
+            version = Get_change_seq(*DB_CONFIG)
+            etag = f"systems-{version}"
+
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                systems = Get_List(*DB_CONFIG)
+                count = len(systems)
+                if count == 0:
+                    response = jsonify({"message": "No systems found", "version": version})
+                    response.status_code = 204
+                else:
+                    response = jsonify({"systems": systems, "count": count, "version": version})
+            response.set_etag(etag)
+            return response
+
+        limit = request.args.get('limit', 100, type=int)
+        order = request.args.get('order', 'asc')
+        total = request.args.get('count')
+        after = request.args.get('after')
+
+        if limit is None or not 1 <= limit <= 10000:
+            return jsonify({"error": "limit must be an integer between 1 and 10000."}), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({"error": "order must be 'asc' or 'desc'."}), 400
+        if total not in (None, 'exact', 'estimate'):
+            return jsonify({"error": "count must be 'exact' or 'estimate'."}), 400
+        if after is not None and parse_page_cursor(after) is None:
+            return jsonify({"error": "after must be a next_cursor returned by a previous page."}), 400
+
+        page = Get_page(*DB_CONFIG, limit=limit, after=after, prefix=request.args.get('prefix'),
+                        descending=(order == 'desc'), count=total)
+        page["count"] = len(page["systems"])
+        if page["count"] == 0 and "total" not in page:
             return jsonify({"message": "No systems found"}), 204
-        return jsonify({"systems": systems, "count": count}), 200
+        return jsonify(page), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def open_upload_stream():
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return None
+        compressed = upload.mimetype in GZIP_MIMETYPES or (upload.filename or '').endswith('.gz')
+        stream = upload.stream
+    else:
+        compressed = request.content_encoding == 'gzip' or request.mimetype in GZIP_MIMETYPES
+        stream = request.stream
+
+    if compressed:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
 @app.route('/put_fml_file', methods=['PUT'])
 def put_fml_file():
+    try:
+        if request.is_json:
+            data = request.get_json()
+
+            file_path = data.get('file_path')
+            FML_UPLOADS.inc("path")
+
+            if not os.path.exists(file_path):
+                return jsonify({"error": "File does not exist."}), 404
+
+            parser = FuzzySystemParser(file_path)
+            system_name = parser.Put_fml_file(*DB_CONFIG, bulk=data.get('bulk', True), optimize=data.get('optimize', False))
+            caches.invalidate_system(system_name)
+
+            response = {"message": f"File {os.path.basename(file_path)} was successfully added to the knowledge base"}
+            if parser.report and "optimization" in parser.report:
+                response["optimization"] = parser.report["optimization"]
+            return jsonify(response), 201
+
+        source = open_upload_stream()
+
+        if source is None:
+            return jsonify({"error": "Expected a 'file' part in the multipart upload."}), 400
+
+        FML_UPLOADS.inc("multipart" if request.mimetype == 'multipart/form-data' else "body")
+
+        parser = FuzzySystemParser(source)
+        system_name = parser.Put_fml_file(*DB_CONFIG, bulk=request.args.get('bulk', '1') != '0',
+                                          optimize=request.args.get('optimize', '0') != '0')
+        caches.invalidate_system(system_name)
+
+        response = {"message": f"System '{system_name}' was successfully added to the knowledge base"}
+        if parser.report and "optimization" in parser.report:
+            response["optimization"] = parser.report["optimization"]
+        return jsonify(response), 201
+
+    except IngestError as e:
+        return jsonify({"error": str(e), "report": e.report}), 422
+    except (ET.ParseError, ValueError, OSError, EOFError) as e:
+        return jsonify({"error": f"Invalid FML document: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/put_fml_files', methods=['PUT'])
+def put_fml_files():
     try:
         data = request.get_json()
 
-        file_path = data.get('file_path')
+        file_paths = list(data.get('file_paths', []))
+        directory = data.get('directory')
+        mode = data.get('mode', 'best_effort')
+
+        if mode not in ('best_effort', 'all_or_nothing'):
+            return jsonify({"error": "mode must be 'best_effort' or 'all_or_nothing'."}), 400
+
+        if directory:
+            if not os.path.isdir(directory):
+                return jsonify({"error": "Directory does not exist."}), 404
+            file_paths.extend(sorted(glob.glob(os.path.join(directory, data.get('pattern', '*.xml')))))
 
-        print("File path received:", file_path)
+        if not file_paths:
+            return jsonify({"error": "No files to upload."}), 400
 
-        if not os.path.exists(file_path):
-            return jsonify({"error": "File does not exist."}), 404
+        FML_UPLOADS.inc("batch", amount=len(file_paths))
 
-        parser = FuzzySystemParser(file_path)
-        parser.Put_fml_file("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")
+        results = Put_fml_files(
+            *DB_CONFIG,
+            file_paths,
+            atomic=(mode == 'all_or_nothing'),
+            executor=get_parse_executor(),
+            insert_workers=int(os.environ.get("KB_INSERT_WORKERS", 4)),
+            bulk=data.get('bulk', True),
+            optimize=data.get('optimize', False)
+        )
 
-        return jsonify({"message": f"File {os.path.basename(file_path)} was successfully added to the knowledge base"}), 201
+        for result in results:
+            if result["status"] == "inserted":
+                caches.invalidate_system(result["system_name"])
+
+        inserted = sum(1 for result in results if result["status"] == "inserted")
+        failed = sum(1 for result in results if result["status"] == "failed")
+        summary = {"mode": mode, "inserted": inserted, "failed": failed, "files": results}
+
+        if inserted == len(results):
+            return jsonify(summary), 201
+        if inserted == 0:
+            return jsonify(summary), 422
+        return jsonify(summary), 207
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/export_systems', methods=['GET'])
+def export_systems():
+    try:
+        export_format = request.args.get('format', 'ndjson')
+
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}."}), 400
+
+        itersize = request.args.get('itersize', type=int) if 'itersize' in request.args else 100
+        if itersize is None or itersize < 1:
+            return jsonify({"error": "itersize must be a positive integer."}), 400
+
+        names = request.args.getlist('name') or None
+        systems = db.Iter_systems(names=names, prefix=request.args.get('prefix'), itersize=itersize)
+
+        response = Response(stream_with_context(export_chunks(systems, export_format, db.Create_fuzzy_system_xml)), mimetype=EXPORT_FORMATS[export_format])
+        if export_format == "tar":
+            response.headers["Content-Disposition"] = 'attachment; filename="fuzzy_systems.tar.gz"'
+
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -57,7 +573,8 @@ def put_fml_file():
 @app.route('/delete_systems_list', methods=['DELETE'])
 def delete_systems_list():
     try:
-        result = Delete_all_data("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432")  
+        result = Delete_all_data(*DB_CONFIG)  
+        caches.invalidate_all()
         if result:
             return jsonify({"message": "All data deleted successfully"}), 200 
         else:
@@ -68,7 +585,8 @@ def delete_systems_list():
 @app.route('/delete_one_system/<system_name>', methods=['DELETE'])
 def delete_one_system(system_name):
     try:
-        result = Delete_one_data("knowledgeBase", "postgres", "Zhenik_14", "localhost", "5432", system_name)  
+        result = Delete_one_data(*DB_CONFIG, system_name)  
+        caches.invalidate_system(system_name)
         if result:
             return jsonify({"message": f"System '{system_name}' deleted successfully"}), 200  
         else:
@@ -76,33 +594,154 @@ def delete_one_system(system_name):
     except Exception as e:
         return jsonify({"error": str(e)}), 500  
 
-class MyService(win32serviceutil.ServiceFramework):
-    _svc_name_ = "knowledgeBase_service"
-    _svc_display_name_ = "knowledgeBase_service"
-    _svc_description_ = "Service for storing fuzzy logic systems"
-
-    def __init__(self, *args):
-        win32serviceutil.ServiceFramework.__init__(self, *args)
-        self.stop_event = win32event.CreateEvent(None, 0, 0, None)
-        self.running = True
-        self.flask_thread = None 
-
-    def SvcStop(self):
-        self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
-        win32event.SetEvent(self.stop_event)
-        self.running = False
-        if self.flask_thread is not None:
-            requests.get('http://localhost:5000/shutdown')
-
-    def SvcDoRun(self):
-        self.ReportServiceStatus(win32service.SERVICE_RUNNING)
-        self.flask_thread = threading.Thread(target=self.run_flask)
-        self.flask_thread.start()
-        while self.running:
-            time.sleep(1) 
-
-    def run_flask(self):
-        app.run(host='127.0.0.1', port=5000)
+@app.route('/pool_stats', methods=['GET'])
+def pool_stats():
+    return jsonify(get_pool(*DB_CONFIG).stats()), 200
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(caches.stats()), 200
+
+def get_changes_page(after):
+    return Get_changes(*DB_CONFIG, after=after, limit=int(os.environ.get("KB_CHANGES_PAGE", 1000)))
+
+@app.route('/changes', methods=['GET'])
+def changes():
+    try:
+        after = request.args.get('after', type=int)
+        timeout = request.args.get('timeout', 0, type=float)
+
+        if after is None:
+            if 'after' in request.args:
+                return jsonify({"error": "after must be an integer."}), 400
+            # Without a cursor the client only learns where to start listening from.
+            return jsonify({"changes": [], "last": Get_change_seq(*DB_CONFIG), "reset": False}), 200
+        if timeout is None or not 0 <= timeout <= 60:
+            return jsonify({"error": "timeout must be between 0 and 60 seconds."}), 400
+
+        return jsonify(wait_for_changes(change_listener, get_changes_page, after, timeout)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/changes/stream', methods=['GET'])
+def changes_stream():
+    try:
+        after = request.headers.get('Last-Event-ID', request.args.get('after'))
+        after = int(after) if after is not None else Get_change_seq(*DB_CONFIG)
+
+        events = change_events(
+            change_listener,
+            get_changes_page,
+            after,
+            heartbeat=float(os.environ.get("KB_SSE_HEARTBEAT", 15)),
+            max_seconds=float(os.environ.get("KB_SSE_MAX_SECONDS", 300))
+        )
+        return Response(stream_with_context(events), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+    except ValueError:
+        return jsonify({"error": "after must be an integer."}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/worker_stats', methods=['GET'])
+def worker_stats():
+    stats = prefork.worker_stats()
+    if stats is None:
+        return jsonify({"message": "Not running under the pre-fork server"}), 404
+    return jsonify(stats), 200
+
+def prepare_database():
+    init_db_pool()
+    Create_indexes(*DB_CONFIG)
+    Create_control_surfaces_table(*DB_CONFIG)
+    Create_change_log(*DB_CONFIG)
+    Trim_change_log(*DB_CONFIG, keep=int(os.environ.get("KB_CHANGE_LOG_KEEP", 100000)))
+
+def init_worker():
+    # Connections, the change listener and the compiled store mapping are opened after fork, never shared between workers.
+    REGISTRY.configure_multiprocess(metrics_directory)
+    init_db_pool()
+    change_listener.start()
+    start_change_follower()
+
+def exit_worker():
+    # Workers leave through os._exit, so pool processes forked from them (which hold the listening socket)
+    # are shut down here rather than left behind.
+    shutdown_executors()
+    REGISTRY.dump()
+
+def run_prefork():
+    global inference_workers, metrics_directory
+    workers = int(os.environ.get("KB_WORKERS", 0)) or os.cpu_count() or 1
+    if "KB_INFERENCE_WORKERS" not in os.environ:
+        inference_workers = max(1, (os.cpu_count() or 1) // workers)
+
+    # Each worker dumps its metrics here and /metrics merges the files, so any worker can answer for all of them.
+    metrics_directory = os.environ.get("KB_METRICS_DIR") or tempfile.mkdtemp(prefix="kb-metrics-")
+    reset_directory(metrics_directory)
+
+    prepare_database()
+    close_all_pools()
+
+    prefork.Arbiter(
+        app,
+        host=os.environ.get("KB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("KB_PORT", 5000)),
+        workers=workers,
+        init_worker=init_worker,
+        max_requests=int(os.environ.get("KB_MAX_REQUESTS", 0)),
+        max_requests_jitter=int(os.environ.get("KB_MAX_REQUESTS_JITTER", 0)),
+        graceful_timeout=float(os.environ.get("KB_GRACEFUL_TIMEOUT", 30)),
+        heartbeat_timeout=float(os.environ.get("KB_HEARTBEAT_TIMEOUT", 30)),
+        socket_timeout=float(os.environ.get("KB_SOCKET_TIMEOUT", 30)),
+        exit_worker=exit_worker,
+        on_worker_exit=lambda pid: archive_worker(metrics_directory, pid)
+    ).run()
+
+if win32serviceutil is not None:
+    class MyService(win32serviceutil.ServiceFramework):
+        _svc_name_ = "knowledgeBase_service"
+        _svc_display_name_ = "knowledgeBase_service"
+        _svc_description_ = "Service for storing fuzzy logic systems"
+
+        def __init__(self, *args):
+            win32serviceutil.ServiceFramework.__init__(self, *args)
+            self.stop_event = win32event.CreateEvent(None, 0, 0, None)
+            self.running = True
+            self.flask_thread = None
+            self.server = None
+            self.server_lock = threading.Lock()
+
+        def SvcStop(self):
+            self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
+            win32event.SetEvent(self.stop_event)
+            with self.server_lock:
+                self.running = False
+                server = self.server
+            # A shutdown requested before serve_forever starts makes it return immediately.
+            if server is not None:
+                server.shutdown()
+
+        def SvcDoRun(self):
+            self.ReportServiceStatus(win32service.SERVICE_RUNNING)
+            self.flask_thread = threading.Thread(target=self.run_flask)
+            self.flask_thread.start()
+            while self.running:
+                time.sleep(1)
+            self.flask_thread.join()
+
+        def run_flask(self):
+            prepare_database()
+            change_listener.start()
+            start_change_follower()
+            with self.server_lock:
+                if not self.running:
+                    return
+                self.server = make_server('127.0.0.1', 5000, app, threaded=True)
+            self.server.serve_forever()
+            self.server.server_close()
 
 if __name__ == "__main__":
-    win32serviceutil.HandleCommandLine(MyService)
+    if win32serviceutil is not None:
+        win32serviceutil.HandleCommandLine(MyService)
+    else:
+        run_prefork()
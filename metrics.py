@@ -0,0 +1,439 @@
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import psycopg2.extensions
+
+# A small Prometheus-compatible registry. Each process keeps its own metrics; when several pre-forked workers
+# serve the same port, every worker periodically writes a snapshot into a shared directory and /metrics
+# merges them, with the master folding the counters of exited workers into an archive file.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+ARCHIVE_FILE = "archive.json"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def reset(self):
+        with self._lock:
+            self.values.clear()
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(key), value if not isinstance(value, list) else list(value)] for key, value in self.values.items()]
+        return {"type": self.kind, "help": self.help, "labelnames": list(self.labelnames), "samples": samples}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1.0):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = float(value)
+
+    def inc(self, *labels, amount=1.0):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount=1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            # Per-bucket counts (the last slot is +Inf), then the sum and the count.
+            sample = self.values.get(key)
+            if sample is None:
+                sample = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    def time(self, *labels):
+        return Timer(self, labels)
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+class Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.directory = None
+        self._dump_thread = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def add_collector(self, collector):
+        # A collector returns {name: (type, help, labelnames, {labels tuple: value})} for values owned by other objects.
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        snapshot = {name: metric.snapshot() for name, metric in self.metrics.items()}
+        for collector in self.collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, (kind, help, labelnames, samples) in collected.items():
+                snapshot[name] = {"type": kind, "help": help, "labelnames": list(labelnames),
+                                  "samples": [[list(map(str, labels)), float(value)] for labels, value in samples.items()]}
+        return snapshot
+
+    def configure_multiprocess(self, directory, interval=5.0):
+        # Called in each forked worker: whatever the parent recorded before the fork is not this process's to report.
+        for metric in self.metrics.values():
+            metric.reset()
+        self.directory = directory
+        if self._dump_thread is None:
+            self._dump_thread = threading.Thread(target=self._dump_loop, args=(interval,), name="metrics-dump", daemon=True)
+            self._dump_thread.start()
+
+    def _dump_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"Could not write metrics snapshot: {e}")
+
+    def dump(self):
+        write_snapshot(os.path.join(self.directory, f"{os.getpid()}.json"), self.snapshot())
+
+    def collect(self):
+        if self.directory is None:
+            return self.snapshot()
+
+        self.dump()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            snapshot = read_snapshot(path)
+            if snapshot is not None:
+                pid = os.path.basename(path)[:-len(".json")]
+                snapshots.append((pid, snapshot))
+        return merge_snapshots(snapshots)
+
+    def render(self):
+        return render_snapshot(self.collect())
+
+
+def write_snapshot(path, snapshot):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_snapshots(snapshots, keep_gauges=True):
+    merged = {}
+
+    for pid, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            gauge = metric["type"] == "gauge"
+            if gauge and not keep_gauges:
+                continue
+
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {key: value for key, value in metric.items() if key != "samples"}
+                target["samples"] = {}
+                if gauge and pid != "archive":
+                    target["labelnames"] = target["labelnames"] + ["pid"]
+
+            for labels, value in metric["samples"]:
+                # Gauges describe one process at a time, so they are kept apart by pid instead of summed.
+                key = tuple(labels) + ((pid,) if gauge and pid != "archive" else ())
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = current + value
+
+    for metric in merged.values():
+        metric["samples"] = [[list(key), value] for key, value in metric["samples"].items()]
+    return merged
+
+
+def archive_worker(directory, pid):
+    # Keeps the counters and histograms of an exited worker so totals never go backwards after a recycle.
+    path = os.path.join(directory, f"{pid}.json")
+    snapshot = read_snapshot(path)
+    if snapshot is None:
+        return
+
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    archive = read_snapshot(archive_path) or {}
+    write_snapshot(archive_path, merge_snapshots([("archive", archive), ("archive", snapshot)], keep_gauges=False))
+    os.remove(path)
+
+
+def reset_directory(directory):
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def render_snapshot(snapshot):
+    lines = []
+
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+
+        for labels, value in sorted(metric["samples"]):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{format_labels(names, labels)} {format_value(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + [math.inf], value[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(names, labels, ('le', format_value(float(bound))))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(names, labels)} {format_value(value[-2])}")
+            lines.append(f"{name}_count{format_labels(names, labels)} {value[-1]}")
+
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter("kb_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+HTTP_DURATION = Histogram("kb_http_request_duration_seconds", "Time from request start to the last response byte.", ("route", "method"))
+HTTP_RESPONSE_SIZE = Histogram("kb_http_response_size_bytes", "Response body size.", ("route", "method"), buckets=SIZE_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("kb_http_requests_in_progress", "Requests currently being served.")
+DB_QUERY_DURATION = Histogram("kb_db_query_duration_seconds", "SQL statement execution time by calling function.", ("query", "statement"))
+DB_QUERY_ERRORS = Counter("kb_db_query_errors_total", "SQL statements that raised an error.", ("query", "statement"))
+XML_PARSE_DURATION = Histogram("kb_xml_parse_duration_seconds", "Time spent parsing FML documents, excluding the database work between items.")
+XML_RENDER_DURATION = Histogram("kb_xml_render_duration_seconds", "Time spent serializing stored systems to FML.")
+FML_UPLOADS = Counter("kb_fml_uploads_total", "FML documents received for ingest, by how they were sent.", ("source",))
+BATCH_INFERENCE_ROWS = Counter("kb_batch_inference_rows_total", "Input rows evaluated by batch inference.")
+BATCH_INFERENCE_DURATION = Histogram("kb_batch_inference_duration_seconds", "Time to evaluate and format a whole inference batch.")
+
+
+def observe_request(route, method, status, duration, size):
+    HTTP_REQUESTS.inc(route, method, status)
+    HTTP_DURATION.observe(duration, route, method)
+    if size is not None:
+        HTTP_RESPONSE_SIZE.observe(size, route, method)
+
+
+def counted_iter(chunks, finished):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        finished(size)
+
+
+def timed_iter(iterable, histogram, *labels):
+    # Only the time spent inside the wrapped iterator counts, not the consumer's work between items.
+    iterator = iter(iterable)
+    total = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - start
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        histogram.observe(total, *labels)
+
+
+SKIPPED_FRAMES = {__name__, "psycopg2.extras", "psycopg2.extensions"}
+
+
+def _query_origin():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") in SKIPPED_FRAMES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+
+
+def _statement(query):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    words = str(query).split(None, 1)
+    return words[0].upper() if words else ""
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        origin = _query_origin()
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception:
+            DB_QUERY_ERRORS.inc(origin, _statement(query))
+            raise
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, origin, _statement(query))
+
+    def executemany(self, query, vars_list):
+        origin = _query_origin()
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        except Exception:
+            DB_QUERY_ERRORS.inc(origin, _statement(query))
+            raise
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, origin, _statement(query))
+
+
+POOL_COUNTERS = {
+    "acquired": ("kb_db_pool_acquired_total", "Connections handed out by the pool."),
+    "waited": ("kb_db_pool_waited_total", "Acquisitions that had to wait for a free connection."),
+    "timeouts": ("kb_db_pool_timeouts_total", "Acquisitions that gave up waiting."),
+    "wait_seconds_total": ("kb_db_pool_wait_seconds_total", "Time spent waiting for a connection."),
+    "created": ("kb_db_pool_created_total", "Connections opened."),
+    "recycled": ("kb_db_pool_recycled_total", "Connections closed for age."),
+    "broken": ("kb_db_pool_broken_total", "Connections discarded after failing a health check."),
+}
+
+POOL_GAUGES = {
+    "size": ("kb_db_pool_size", "Open connections."),
+    "in_use": ("kb_db_pool_in_use", "Connections currently checked out."),
+    "idle": ("kb_db_pool_idle", "Open connections waiting to be used."),
+    "waiting": ("kb_db_pool_waiting", "Callers waiting for a connection."),
+    "maxconn": ("kb_db_pool_max", "Configured pool size limit."),
+    "saturation": ("kb_db_pool_saturation", "Fraction of the pool limit in use."),
+}
+
+CACHE_COUNTERS = {
+    "hits": ("kb_cache_hits_total", "Cache lookups that found an entry."),
+    "misses": ("kb_cache_misses_total", "Cache lookups that found nothing."),
+    "evictions": ("kb_cache_evictions_total", "Entries evicted to stay within the limits."),
+    "invalidations": ("kb_cache_invalidations_total", "Entries dropped because the system changed."),
+}
+
+CACHE_GAUGES = {
+    "entries": ("kb_cache_entries", "Entries currently cached."),
+    "bytes": ("kb_cache_bytes", "Approximate size of the cached entries."),
+}
+
+
+def stats_metrics(groups, label, counters, gauges):
+    collected = {}
+    for group, stats in groups.items():
+        for key, value in stats.items():
+            if value is None or (key not in counters and key not in gauges):
+                continue
+            kind = "counter" if key in counters else "gauge"
+            name, help = counters.get(key) or gauges[key]
+            collected.setdefault(name, (kind, help, (label,), {}))[3][(group,)] = value
+    return collected
+
+
+def pool_metrics(pools):
+    return stats_metrics(pools, "pool", POOL_COUNTERS, POOL_GAUGES)
+
+
+def cache_metrics(caches):
+    return stats_metrics(caches, "cache", CACHE_COUNTERS, CACHE_GAUGES)
@@ -0,0 +1,249 @@
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from multiprocessing.sharedctypes import RawArray
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+# Per-worker health slot in shared memory, written by the worker and read by the master and /worker_stats.
+SLOT_FIELDS = ("pid", "started", "heartbeat", "requests", "spawned")
+SLOT_SIZE = len(SLOT_FIELDS)
+PID, STARTED, HEARTBEAT, REQUESTS, SPAWNED = range(SLOT_SIZE)
+
+health_table = None
+heartbeat_timeout = None
+
+
+def worker_stats():
+    if health_table is None:
+        return None
+
+    now = time.time()
+    workers = []
+    for slot in range(len(health_table) // SLOT_SIZE):
+        values = health_table[slot * SLOT_SIZE:(slot + 1) * SLOT_SIZE]
+        worker = dict(zip(SLOT_FIELDS, values))
+        worker["slot"] = slot
+        worker["pid"] = int(worker["pid"])
+        worker["requests"] = int(worker["requests"])
+        worker["spawned"] = int(worker["spawned"])
+        worker["uptime"] = now - worker["started"] if worker["pid"] else 0.0
+        worker["heartbeat_age"] = now - worker["heartbeat"] if worker["pid"] else None
+        worker["healthy"] = bool(worker["pid"]) and worker["heartbeat_age"] < heartbeat_timeout
+        workers.append(worker)
+
+    return {"master": os.getppid(), "worker": os.getpid(), "workers": workers}
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    # Werkzeug closes the connection after every response, so a stopping worker has no idle keep-alive
+    # connections to close. The socket timeout bounds how long a slow or stalled client can hold a request
+    # thread, and with it how long draining can take.
+    timeout = 30.0
+
+
+class WorkerServer(ThreadedWSGIServer):
+    # Request threads are joined in server_close, which is what lets a stopping worker drain.
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, host, port, app, fd, slot, max_requests=0, socket_timeout=30.0):
+        WorkerRequestHandler.timeout = socket_timeout
+        super().__init__(host, port, self.application, handler=WorkerRequestHandler, fd=fd)
+        self.wsgi_app = app
+        self.slot = slot * SLOT_SIZE
+        self.max_requests = max_requests
+        self.requests = 0
+        self.draining = False
+        self._lock = threading.Lock()
+
+    def application(self, environ, start_response):
+        with self._lock:
+            self.requests += 1
+            health_table[self.slot + REQUESTS] = self.requests
+            if self.max_requests and self.requests >= self.max_requests:
+                self.stop()
+        return self.wsgi_app(environ, start_response)
+
+    def service_actions(self):
+        super().service_actions()
+        health_table[self.slot + HEARTBEAT] = time.time()
+
+    def stop(self):
+        if not self.draining:
+            self.draining = True
+            # shutdown() waits for serve_forever to return, so it cannot run on the serving thread itself.
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+def run_worker(listener, app, slot, init=None, max_requests=0, max_requests_jitter=0, socket_timeout=30.0, finish=None):
+    random.seed()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+    base = slot * SLOT_SIZE
+    health_table[base + PID] = os.getpid()
+    health_table[base + STARTED] = health_table[base + HEARTBEAT] = time.time()
+    health_table[base + REQUESTS] = 0
+
+    if init is not None:
+        init()
+
+    if max_requests:
+        max_requests += random.randint(0, max_requests_jitter)
+
+    host, port = listener.getsockname()[:2]
+    server = WorkerServer(host, port, app, listener.fileno(), slot, max_requests, socket_timeout)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+
+    print(f"Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever(poll_interval=0.5)
+    server.server_close()
+    if finish is not None:
+        finish()
+    print(f"Worker {os.getpid()} stopped after {server.requests} requests")
+
+
+class Arbiter:
+    def __init__(self, app, host="127.0.0.1", port=5000, workers=2, init_worker=None, max_requests=0, max_requests_jitter=0,
+                 graceful_timeout=30.0, heartbeat_timeout=30.0, socket_timeout=30.0, backlog=2048, exit_worker=None,
+                 on_worker_exit=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.init_worker = init_worker
+        self.exit_worker = exit_worker
+        # Runs in the master for every reaped worker, however it ended.
+        self.on_worker_exit = on_worker_exit
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.socket_timeout = socket_timeout
+        self.backlog = backlog
+
+        self.listener = None
+        self.children = {}
+        self.stopping = False
+        self.reload = False
+
+    def spawn(self, slot):
+        health_table[slot * SLOT_SIZE + SPAWNED] += 1
+        pid = os.fork()
+
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.listener, self.app, slot, self.init_worker, self.max_requests, self.max_requests_jitter, self.socket_timeout,
+                           self.exit_worker)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                status = 1
+            finally:
+                os._exit(status)
+
+        self.children[pid] = slot
+        return pid
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+
+            slot = self.children.pop(pid, None)
+            if slot is not None:
+                health_table[slot * SLOT_SIZE + PID] = 0
+                code = os.waitstatus_to_exitcode(status)
+                if code != 0 and not self.stopping:
+                    print(f"Worker {pid} exited with status {code}")
+                if self.on_worker_exit is not None:
+                    try:
+                        self.on_worker_exit(pid)
+                    except Exception as e:
+                        print(f"Worker exit hook failed for {pid}: {e}")
+
+    def kill_hung(self):
+        now = time.time()
+        for pid, slot in list(self.children.items()):
+            base = slot * SLOT_SIZE
+            if health_table[base + PID] == pid and now - health_table[base + HEARTBEAT] > self.heartbeat_timeout:
+                print(f"Worker {pid} missed its heartbeat for {now - health_table[base + HEARTBEAT]:.0f}s, killing it")
+                self.signal_worker(pid, signal.SIGKILL)
+
+    def signal_worker(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reload = True
+
+    def run(self):
+        global health_table, heartbeat_timeout
+        self.listener = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.listener.set_inheritable(True)
+        health_table = RawArray('d', self.workers * SLOT_SIZE)
+        heartbeat_timeout = self.heartbeat_timeout
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        print(f"Master {os.getpid()} listening on {self.host}:{self.port} with {self.workers} workers")
+
+        try:
+            while not self.stopping:
+                self.reap()
+                if self.reload:
+                    # Workers finish their in-flight requests and are replaced as they exit.
+                    self.reload = False
+                    for pid in list(self.children):
+                        self.signal_worker(pid, signal.SIGTERM)
+                self.kill_hung()
+
+                running = set(self.children.values())
+                for slot in range(self.workers):
+                    if slot not in running and not self.stopping:
+                        self.spawn(slot)
+
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stopping = True
+        print(f"Master {os.getpid()} draining {len(self.children)} workers")
+
+        for pid in list(self.children):
+            self.signal_worker(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            print(f"Worker {pid} did not drain in {self.graceful_timeout}s, killing it")
+            self.signal_worker(pid, signal.SIGKILL)
+        while self.children:
+            self.reap()
+            time.sleep(0.05)
+
+        self.listener.close()
@@ -0,0 +1,111 @@
+import io
+import json
+import re
+import tarfile
+import time
+
+GZIP_MIMETYPES = ('application/gzip', 'application/x-gzip')
+
+BATCH_OUTPUTS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "fml": "application/xml",
+    "tar": "application/gzip",
+}
+
+
+class ChunkBuffer(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def sse_event(event, data, event_id=None, retry=None):
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def export_file_name(system_name, taken=None):
+    # Different names can sanitize to the same file name; later ones get a counter so none is overwritten.
+    base = re.sub(r'[^\w.-]', '_', system_name)
+    file_name = base + ".xml"
+    if taken is not None:
+        counter = 1
+        while file_name in taken:
+            counter += 1
+            file_name = f"{base}-{counter}.xml"
+        taken.add(file_name)
+    return file_name
+
+
+class ExportEncoder:
+    def __init__(self, export_format, render):
+        self.export_format = export_format
+        self.render = render
+        self.buffer = ChunkBuffer()
+        self.archive = None
+        self.file_names = set()
+
+    def start(self):
+        if self.export_format == "fml":
+            return b'<?xml version="1.0" encoding="UTF-8"?>\n<fuzzySystems>\n'
+        if self.export_format == "tar":
+            self.archive = tarfile.open(fileobj=self.buffer, mode="w|gz")
+        return b""
+
+    def encode(self, system_name, data):
+        if self.export_format == "ndjson":
+            return json.dumps({"system_name": system_name, "system": self.render(data)}, ensure_ascii=False).encode("utf-8") + b"\n"
+        if self.export_format == "fml":
+            return self.render(data).encode("utf-8") + b"\n"
+
+        document = self.render(data).encode("utf-8")
+        info = tarfile.TarInfo(export_file_name(system_name, self.file_names))
+        info.size = len(document)
+        info.mtime = int(time.time())
+        self.archive.addfile(info, io.BytesIO(document))
+        return self.buffer.drain()
+
+    def finish(self):
+        if self.export_format == "fml":
+            return b"</fuzzySystems>\n"
+        if self.export_format == "tar":
+            self.archive.close()
+            return self.buffer.drain()
+        return b""
+
+
+def export_chunks(systems, export_format, render):
+    encoder = ExportEncoder(export_format, render)
+
+    chunk = encoder.start()
+    if chunk:
+        yield chunk
+
+    for system_name, data in systems:
+        chunk = encoder.encode(system_name, data)
+        if chunk:
+            yield chunk
+
+    yield encoder.finish()
@@ -0,0 +1,90 @@
+import os
+
+from caches import RenderedFmlCache, CompiledSystemCache, ControlSurfaceCache
+from compiled_store import CompiledStore
+
+
+class SystemCaches:
+    # What one service process keeps about stored systems, shared by knowledgeBase_service and async_service: the
+    # rendered FML, compiled system and control surface caches, the memory-mapped compiled store, and how a write
+    # or a logged change invalidates them. Loading a miss is left to the service, which owns the database access.
+    def __init__(self):
+        self.fml_cache = RenderedFmlCache(max_entries=int(os.environ.get("KB_FML_CACHE_SIZE", 256)))
+        self.compiled_cache = CompiledSystemCache(
+            max_entries=int(os.environ.get("KB_COMPILED_CACHE_SIZE", 1024)),
+            max_bytes=int(os.environ.get("KB_COMPILED_CACHE_BYTES", 256 * 1024 * 1024))
+        )
+        self.surface_cache = ControlSurfaceCache(
+            max_entries=int(os.environ.get("KB_SURFACE_CACHE_SIZE", 256)),
+            max_bytes=int(os.environ.get("KB_SURFACE_CACHE_BYTES", 256 * 1024 * 1024))
+        )
+        self.resolution = int(os.environ.get("KB_INFERENCE_RESOLUTION", 101))
+        self.store = None
+        self.store_stale = set()
+
+    def open_store(self, path):
+        if not path or not os.path.exists(path):
+            return None
+
+        store = CompiledStore(path)
+        if store.resolution != self.resolution:
+            print(f"Ignoring compiled store {path}: built at resolution {store.resolution}, serving {self.resolution}")
+            return None
+        if store.seq is None:
+            print(f"Ignoring compiled store {path}: it does not record the change log position it was built at")
+            return None
+
+        self.store_stale.clear()
+        self.store = store
+        print(f"Compiled store {path} mapped with {len(store.names())} systems")
+        return store
+
+    def lookup_system(self, system_name):
+        # Returns (system, None) on a hit, or (None, generation) to stamp the system the caller then loads.
+        store = self.store
+        if store is not None and system_name not in self.store_stale:
+            system = store.get(system_name)
+            if system is not None:
+                return system, None
+
+        generation = self.compiled_cache.generation
+        return self.compiled_cache.get(system_name), generation
+
+    def lookup_surface(self, system_name):
+        store = self.store
+        if store is not None and system_name not in self.store_stale:
+            surface = store.surface(system_name)
+            if surface is not None:
+                return surface, None
+
+        generation = self.surface_cache.generation
+        return self.surface_cache.get(system_name), generation
+
+    def invalidate_system(self, system_name):
+        self.store_stale.add(system_name)
+        self.fml_cache.invalidate(system_name)
+        self.compiled_cache.invalidate(system_name)
+        self.surface_cache.invalidate(system_name)
+
+    def invalidate_surface(self, system_name):
+        self.store_stale.add(system_name)
+        self.surface_cache.invalidate(system_name)
+
+    def invalidate_all(self):
+        self.store = None
+        self.fml_cache.clear()
+        self.compiled_cache.clear()
+        self.surface_cache.clear()
+
+    def apply_change(self, change):
+        if change["operation"] == "surface":
+            self.invalidate_surface(change["system_name"])
+        else:
+            self.invalidate_system(change["system_name"])
+
+    def cache_stats(self):
+        return {"fml": self.fml_cache.stats(), "compiled": self.compiled_cache.stats(), "surfaces": self.surface_cache.stats()}
+
+    def stats(self):
+        store = self.store
+        return dict(self.cache_stats(), store=dict(store.stats(), stale=len(self.store_stale)) if store is not None else None)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.backends import StandInBackend
+from benchmarks.fml_generator import SHAPE_NAMES, write_synthetic_fml
+
+# Systems are ingested into the benchmarks' in-memory stand-in, so the suite runs without PostgreSQL and
+# every test sees exactly the document Get_system would return.
+
+
+@pytest.fixture
+def standin():
+    return StandInBackend()
+
+
+@pytest.fixture
+def system_data(standin, tmp_path):
+    def make(system_name="system", variables=5, terms=4, rules=60, outputs=2, clauses=2):
+        path = tmp_path / f"{system_name}.xml"
+        write_synthetic_fml(path, system_name, variables=variables, terms=terms, rules=rules, shapes=len(SHAPE_NAMES),
+                            outputs=outputs, clauses=clauses)
+        standin.ingest(str(path))
+        return standin.db.Get_system(system_name)
+
+    return make
+
+
+@pytest.fixture
+def mixed_system_data(system_data):
+    # The generator only writes "and" rules without hedges; vary connectors and modifiers so "or" rules,
+    # "not" clauses and unconditional rules, which the sparse index cannot skip, are covered too.
+    def make(system_name="mixed", **sizes):
+        data = system_data(system_name, **sizes)
+        modifiers = ["not", "very", "somewhat", None, "extremely", "more_or_less", "slightly", "plus", "intensify"]
+        for r, rule in enumerate(data[1]["rules"]):
+            if r % 3 == 1:
+                rule["connector"] = "or"
+                rule["rule_or_method"] = "MAX"
+            count = len(rule["antecedent_variables"])
+            rule["antecedent_modifiers"] = [modifiers[(r + c) % len(modifiers)] for c in range(count)]
+        # A rule without an antecedent fires for every input.
+        data[1]["rules"][0].update(antecedent_variables=[], antecedent_terms=[], antecedent_modifiers=[])
+        return data
+
+    return make
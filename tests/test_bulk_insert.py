@@ -0,0 +1,125 @@
+import itertools
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+
+from API_list import FuzzySystemParser, IngestError
+from benchmarks.fml_generator import write_synthetic_fml
+
+TABLES = {'"Mamdani Rules Base"': "rule_bases", '"Fuzzy variables"': "variables", '"Fuzzy terms"': "terms", '"Rules"': "rules"}
+
+
+class FakeCursor:
+    # Just enough of a psycopg2 cursor for execute_values and savepoints: a statement holding a rejected row
+    # fails as a whole, and ROLLBACK TO SAVEPOINT puts the tables back as they were.
+    def __init__(self, reject=lambda table, row: None):
+        self.connection = SimpleNamespace(encoding="UTF8")
+        self.reject = reject
+        self.tables = {table: [] for table in TABLES.values()}
+        self.savepoints = []
+        self.pending = []
+        self.result = []
+        self.ids = itertools.count(1)
+        self.rows_by_id = {}
+
+    def mogrify(self, template, args):
+        self.pending.append(tuple(args))
+        return b"(...)"
+
+    def snapshot(self):
+        return {table: list(rows) for table, rows in self.tables.items()}
+
+    def savepoint_index(self, name):
+        return max(i for i, (savepoint, _) in enumerate(self.savepoints) if savepoint == name)
+
+    def execute(self, query, params=None):
+        query = query.decode() if isinstance(query, bytes) else query.strip()
+        rows, self.pending = self.pending or [tuple(params or ())], []
+
+        if query.startswith("SAVEPOINT "):
+            self.savepoints.append((query.split()[1], self.snapshot()))
+        elif query.startswith("RELEASE SAVEPOINT "):
+            del self.savepoints[self.savepoint_index(query.split()[2]):]
+        elif query.startswith("ROLLBACK TO SAVEPOINT "):
+            index = self.savepoint_index(query.split()[3])
+            self.tables = {table: list(saved) for table, saved in self.savepoints[index][1].items()}
+            del self.savepoints[index + 1:]
+        else:
+            table = next(table for name, table in TABLES.items() if name in query)
+            for row in rows:
+                error = self.reject(table, row)
+                if error:
+                    raise psycopg2.DataError(error)
+            self.tables[table].extend(rows)
+            self.result = [(next(self.ids),) for _ in rows]
+            self.rows_by_id.update((result[0], row) for result, row in zip(self.result, rows))
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def bulk_insert(path, cursor, batch_size):
+    parser = FuzzySystemParser(str(path))
+    items = parser.iter_fml()
+    next(items)
+    try:
+        return parser.bulk_insert_items(cursor, 1, items, batch_size=batch_size)
+    finally:
+        items.close()
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "bulk.xml"
+    write_synthetic_fml(path, "bulk", variables=6, terms=3, rules=40)
+    return path
+
+
+def test_bulk_insert_writes_every_row(document):
+    cursor = FakeCursor()
+    report = bulk_insert(document, cursor, batch_size=7)
+
+    assert report == {"variables": 6, "terms": 18, "rule_bases": 1, "rules": 40, "batches": 7}
+    assert {table: len(rows) for table, rows in cursor.tables.items()} == {"rule_bases": 1, "variables": 6, "terms": 18, "rules": 40}
+    assert cursor.savepoints == []
+
+
+def test_failed_batch_reports_only_the_bad_rows(document):
+    cursor = FakeCursor(lambda table, row: "value too long" if table == "rules" and row[0] in ("r5", "r12") else None)
+
+    with pytest.raises(IngestError) as raised:
+        bulk_insert(document, cursor, batch_size=1000)
+
+    report = raised.value.report
+    assert report["stage"] == "rules"
+    assert report["batch_rows"] == 40
+    assert [row["item"] for row in report["failed_rows"]] == ["r5", "r12"]
+    assert all(row["error"] == "value too long" for row in report["failed_rows"])
+    # Rows the search inserted one by one are rolled back with the batch; earlier stages are untouched.
+    assert cursor.tables["rules"] == []
+    assert len(cursor.tables["variables"]) == 6
+
+
+def test_failed_terms_are_labelled_by_variable(document):
+    cursor = FakeCursor()
+    cursor.reject = lambda table, row: "bad shape" if table == "terms" and (cursor.rows_by_id[row[6]][0], row[0]) == ("v1", "t2") else None
+
+    with pytest.raises(IngestError) as raised:
+        bulk_insert(document, cursor, batch_size=1000)
+
+    assert raised.value.report["stage"] == "terms"
+    assert [row["item"] for row in raised.value.report["failed_rows"]] == ["v1.t2"]
+    assert cursor.tables["terms"] == []
+
+
+def test_failed_rows_are_capped(document):
+    cursor = FakeCursor(lambda table, row: "rejected" if table == "rules" else None)
+
+    with pytest.raises(IngestError) as raised:
+        bulk_insert(document, cursor, batch_size=1000)
+
+    assert len(raised.value.report["failed_rows"]) == 20
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+import knowledgeBase_service as service
+from benchmarks.backends import StandInDatabase
+from caches import CompiledSystemCache, LruCache
+from compiled_store import write_store
+from control_surface import ControlSurface
+from inference import compile_system
+from system_caches import SystemCaches
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = LruCache()
+    generation = cache.generation
+    cache.invalidate("a")
+
+    assert cache.put("a", "stale", generation) == "stale"
+    assert cache.get("a") is None
+
+    cache.put("a", "fresh", cache.generation)
+    assert cache.get("a") == "fresh"
+
+
+def test_clear_drops_puts_of_any_key_loaded_before_it():
+    cache = LruCache()
+    generation = cache.generation
+    cache.clear()
+    cache.put("b", "stale", generation)
+
+    assert cache.get("b") is None
+
+
+def test_oversized_values_are_not_cached(system_data):
+    system = compile_system(system_data())
+    cache = CompiledSystemCache(max_bytes=system.nbytes - 1)
+    cache.put("system", system, cache.generation)
+
+    assert cache.get("system") is None
+
+
+@pytest.mark.parametrize("kind", ["system", "surface"])
+def test_lookup_generation_is_read_before_the_load(system_data, kind):
+    caches = SystemCaches()
+    system = compile_system(system_data(variables=3, outputs=1))
+    value = system if kind == "system" else ControlSurface.build(system, resolution=5)
+    lookup, cache = (caches.lookup_system, caches.compiled_cache) if kind == "system" else (caches.lookup_surface, caches.surface_cache)
+
+    cached, generation = lookup("system")
+    assert cached is None
+    # A write lands while the value is being loaded from the database.
+    caches.invalidate_system("system")
+    cache.put("system", value, generation)
+
+    assert lookup("system")[0] is None
+    cache.put("system", value, lookup("system")[1])
+    assert lookup("system")[0] is value
+
+
+class BlockingDatabase(StandInDatabase):
+    # Hands out the document as it was when the read started, then waits, like a slow query racing a write.
+    def __init__(self, backend):
+        super().__init__(backend)
+        self.loaded = threading.Event()
+        self.release = threading.Event()
+
+    def Get_system(self, system_name):
+        data = super().Get_system(system_name)
+        if not self.release.is_set():
+            self.loaded.set()
+            self.release.wait(10)
+        return data
+
+
+def test_invalidation_racing_a_load_keeps_the_new_version(standin, system_data, monkeypatch):
+    system_data("racing", variables=4)
+    db = BlockingDatabase(standin)
+    monkeypatch.setattr(service, "db", db)
+    monkeypatch.setattr(service, "caches", SystemCaches())
+
+    results = []
+    reader = threading.Thread(target=lambda: results.append(service.get_compiled_system("racing")))
+    reader.start()
+    assert db.loaded.wait(10)
+
+    # What put_fml_file does: store the new document, then invalidate.
+    system_data("racing", variables=6)
+    service.caches.invalidate_system("racing")
+    db.release.set()
+    reader.join(10)
+
+    assert len(results[0].input_names) == 2
+    assert service.caches.compiled_cache.stats()["entries"] == 0
+    assert len(service.get_compiled_system("racing").input_names) == 4
+    assert service.get_compiled_system("racing") is service.get_compiled_system("racing")
+
+
+def test_store_entries_go_stale_on_change(system_data, tmp_path):
+    system = compile_system(system_data(variables=3, outputs=1))
+    surface = ControlSurface.build(system, resolution=5)
+    caches = SystemCaches()
+    path = tmp_path / "systems.store"
+    write_store(path, [system], [surface], resolution=caches.resolution, seq=0)
+
+    assert caches.open_store(str(path)) is not None
+    assert caches.lookup_system("system")[0] is not None
+    assert caches.lookup_surface("system")[0] is not None
+
+    caches.apply_change({"operation": "surface", "system_name": "system"})
+    assert caches.lookup_surface("system")[0] is None
+    caches.apply_change({"operation": "insert", "system_name": "system"})
+    assert caches.lookup_system("system")[0] is None
+
+    caches.invalidate_all()
+    assert caches.store is None
+
+
+def test_store_without_seq_or_at_another_resolution_is_ignored(system_data, tmp_path):
+    system = compile_system(system_data(variables=3, outputs=1))
+    caches = SystemCaches()
+    write_store(tmp_path / "old.store", [system], resolution=caches.resolution)
+    write_store(tmp_path / "coarse.store", [system], resolution=caches.resolution - 1, seq=0)
+
+    assert caches.open_store(str(tmp_path / "old.store")) is None
+    assert caches.open_store(str(tmp_path / "coarse.store")) is None
+    assert caches.store is None
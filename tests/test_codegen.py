@@ -0,0 +1,75 @@
+import ast
+import importlib.util
+
+import numpy as np
+import pytest
+
+from codegen import generate_module, module_file_name
+from inference import compile_system
+
+
+def load_module(source, path):
+    path.write_text(source, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def data(mixed_system_data):
+    return mixed_system_data("generated-system", variables=5, terms=4, rules=40, clauses=2)
+
+
+@pytest.fixture
+def generated(data, tmp_path):
+    system = compile_system(data)
+    return system, load_module(generate_module(system), tmp_path / module_file_name(system.system_name))
+
+
+def inputs(system, rows=300, seed=0):
+    lows, highs = system.input_domains[:, 0], system.input_domains[:, 1]
+    X = np.random.default_rng(seed).uniform(lows - 0.1, highs + 0.1, (rows, len(system.input_names)))
+    return np.concatenate([X, [lows, highs]])
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_predict_matches_evaluate(data, generated, sparse):
+    _, module = generated
+    system = compile_system(data, sparse=sparse)
+    X = inputs(system)
+
+    np.testing.assert_allclose(module.predict(X), system.evaluate(X), rtol=0, atol=1e-12)
+
+
+def test_predict_dict_fills_defaults(generated):
+    system, module = generated
+    X = inputs(system, rows=20)
+    columns = {name: X[:, i] for i, name in enumerate(system.input_names[:-1])}
+
+    expected = X.copy()
+    expected[:, -1] = system.input_defaults[-1]
+    outputs = module.predict_dict(columns)
+
+    assert list(outputs) == system.output_names
+    np.testing.assert_allclose(np.stack([outputs[name] for name in system.output_names], axis=1), system.evaluate(expected),
+                               rtol=0, atol=1e-12)
+
+
+def test_predict_rejects_bad_input(generated):
+    system, module = generated
+
+    with pytest.raises(ValueError, match="Unknown input variables: nope"):
+        module.predict({"nope": [1.0]})
+    with pytest.raises(ValueError, match="Expected rows of"):
+        module.predict(np.zeros((2, len(system.input_names) + 1)))
+
+
+def test_module_only_imports_numpy(generated):
+    system, _ = generated
+    tree = ast.parse(generate_module(system))
+    imported = {alias.name for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))
+                for alias in node.names}
+
+    assert imported == {"numpy"}
+    assert module_file_name(system.system_name) == "generated_system.py"
@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from control_surface import MAX_SURFACE_INPUTS, ControlSurface
+from inference import compile_system
+
+
+@pytest.fixture
+def system(system_data):
+    return compile_system(system_data("surface", variables=3, terms=4, rules=30, outputs=1))
+
+
+def test_grid_points_reproduce_the_system(system):
+    surface = ControlSurface.build(system, resolution=9)
+    lows, highs = system.input_domains[:, 0], system.input_domains[:, 1]
+    grid = np.array(list(itertools.product(*(np.linspace(low, high, 9) for low, high in zip(lows, highs)))))
+
+    np.testing.assert_allclose(surface.interpolate(grid), system.evaluate(grid), rtol=0, atol=1e-12)
+
+
+def test_multilinear_tables_are_interpolated_exactly():
+    axes = [np.linspace(-1.0, 3.0, 5), np.linspace(0.0, 10.0, 7), np.linspace(2.0, 4.0, 3)]
+    x, y, z = np.meshgrid(*axes, indexing="ij")
+    table = np.stack([1 + 2 * x - y + 0.5 * x * y * z, x * y], axis=-1)
+    surface = ControlSurface("linear", ["x", "y", "z"], ["a", "b"], [-1.0, 0.0, 2.0], [3.0, 10.0, 4.0], table)
+
+    X = np.random.default_rng(0).uniform([-1.0, 0.0, 2.0], [3.0, 10.0, 4.0], (200, 3))
+    expected = np.stack([1 + 2 * X[:, 0] - X[:, 1] + 0.5 * X[:, 0] * X[:, 1] * X[:, 2], X[:, 0] * X[:, 1]], axis=1)
+
+    np.testing.assert_allclose(surface.interpolate(X), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_inputs_outside_the_domain_are_clamped(system):
+    surface = ControlSurface.build(system, resolution=9)
+    lows, highs = system.input_domains[:, 0], system.input_domains[:, 1]
+
+    np.testing.assert_array_equal(surface.interpolate(lows - 5.0), surface.interpolate(lows))
+    np.testing.assert_array_equal(surface.interpolate(highs + 5.0), surface.interpolate(highs))
+
+
+def test_max_error_bounds_every_cell_midpoint(system):
+    surface = ControlSurface.build(system, resolution=9)
+    max_error = surface.measure_error(system)
+
+    # 8 x 8 cells, fewer than the sample count, so every midpoint was measured.
+    axes = [np.linspace(low, high, 9)[:-1] + (high - low) / 16 for low, high in system.input_domains]
+    midpoints = np.array(list(itertools.product(*axes)))
+    error = np.abs(system.evaluate(midpoints) - surface.interpolate(midpoints)).max(axis=0)
+
+    assert np.all(np.isfinite(max_error))
+    assert np.all(error <= max_error)
+
+
+def test_finer_grids_have_smaller_errors(system):
+    coarse = ControlSurface.build(system, resolution=5).measure_error(system)
+    fine = ControlSurface.build(system, resolution=65).measure_error(system)
+
+    assert np.all(fine < coarse)
+
+
+def test_round_trip_keeps_table_and_error(system):
+    surface = ControlSurface.build(system, resolution=[5, 7])
+    surface.measure_error(system, samples=100)
+    restored = ControlSurface.from_bytes(surface.to_bytes())
+
+    assert restored.describe() == surface.describe()
+    np.testing.assert_array_equal(restored.table, surface.table)
+
+
+def test_build_rejects_unsupported_systems(system, system_data):
+    wide = compile_system(system_data("wide", variables=MAX_SURFACE_INPUTS + 2, outputs=1))
+
+    with pytest.raises(ValueError, match="support 1 to"):
+        ControlSurface.build(wide)
+    with pytest.raises(ValueError, match="resolution"):
+        ControlSurface.build(system, resolution=1)
+    with pytest.raises(ValueError, match="resolution"):
+        ControlSurface.build(system, resolution=[5, 5, 5])
+
+
+def test_infer_requires_every_input(system):
+    surface = ControlSurface.build(system, resolution=5)
+
+    with pytest.raises(ValueError, match="Missing input variables: v1"):
+        surface.infer({"v0": 0.5})
+    assert set(surface.infer({"v0": 0.5, "v1": 0.5})) == {"v2"}
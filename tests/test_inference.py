@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from inference import SPARSE_RULE_THRESHOLD, compile_system
+
+
+@pytest.fixture(params=[("generated", 300), ("mixed", 300), ("mixed", 15)], ids=lambda param: f"{param[0]}-{param[1]}")
+def data(request, system_data, mixed_system_data):
+    # With few rules per output term a rule the sparse index wrongly skips changes the aggregate, instead of
+    # being masked by another rule of the same strength.
+    kind, rules = request.param
+    make = system_data if kind == "generated" else mixed_system_data
+    return make(kind, variables=6, terms=5, rules=rules, clauses=3)
+
+
+def sample_inputs(system, rows=400, seed=0):
+    lows, highs = system.input_domains[:, 0], system.input_domains[:, 1]
+    X = np.random.default_rng(seed).uniform(lows, highs, (rows, len(system.input_names)))
+    # Domain edges, term peaks and points outside the domain, where few or no rules fire.
+    edges = np.array([lows, highs, (lows + highs) / 2, lows - 1.0, highs + 1.0])
+    return np.concatenate([X, edges, np.round(X[:50] * 4) / 4])
+
+
+def test_sparse_matches_dense(data):
+    sparse = compile_system(data, sparse=True)
+    dense = compile_system(data, sparse=False)
+    X = sample_inputs(dense)
+
+    np.testing.assert_allclose(sparse.evaluate(X), dense.evaluate(X), rtol=0, atol=1e-12)
+
+
+def test_sparse_matches_dense_for_single_rows(data):
+    sparse = compile_system(data, sparse=True)
+    dense = compile_system(data, sparse=False)
+
+    for row in sample_inputs(dense, rows=20, seed=1):
+        inputs = dict(zip(dense.input_names, row.tolist()))
+        assert sparse.infer(inputs) == pytest.approx(dense.infer(inputs), abs=1e-12)
+
+
+def test_outputs_without_rules_return_their_default(system_data):
+    system = compile_system(system_data(outputs=2), sparse=True)
+    outputs = system.evaluate(sample_inputs(system, rows=10))
+
+    # The generator only writes rules for the first output.
+    assert np.all(outputs[:, 1] == system.output_default[1])
+
+
+def test_sparse_is_chosen_by_rule_count(system_data):
+    assert not compile_system(system_data("small", rules=SPARSE_RULE_THRESHOLD - 1)).sparse
+    assert compile_system(system_data("large", rules=SPARSE_RULE_THRESHOLD)).sparse